@@ -1,10 +1,8 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, stream_with_context
 import os
 import sys
 import json
-from datetime import datetime
-import threading
-import time
+import hashlib
 
 # Load environment variables from .env file if it exists
 try:
@@ -19,12 +17,56 @@ except Exception as e:
 # Add the src directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+from smart_car_buying_assistant.job_store import JobStoreError, get_job_store
+from smart_car_buying_assistant.sessions import is_valid_session_id, new_session_id
+from smart_car_buying_assistant.assets import PageCache, get_asset_manifest
+from smart_car_buying_assistant.compression import CompressedCache, negotiate_encoding
+from smart_car_buying_assistant.report import REPORT_SECTIONS, select_sections, split_report
+from smart_car_buying_assistant.health import HealthMonitor, check_environment_vars
+from smart_car_buying_assistant.prewarm import Prewarmer
+from smart_car_buying_assistant.rate_limits import get_rate_limiter
+from smart_car_buying_assistant.routing import get_model_router
+from smart_car_buying_assistant.scheduling import client_id, get_scheduling_policy
+from smart_car_buying_assistant.feasibility import check_feasibility
+from smart_car_buying_assistant.prerender import is_current, render_results_page
+from smart_car_buying_assistant.streaming import live_events
+from smart_car_buying_assistant.tracing import get_trace_recorder, read_spilled_events
+from smart_car_buying_assistant.usage import usage_report
+
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Change this in production
 
-# Global variable to store crew results
-crew_results = {}
-crew_status = {}
+# Crews run in separate worker processes; the web tier only enqueues jobs
+# and reads their status from the shared job store
+job_store = get_job_store()
+
+# Dependency probes run in the background; endpoints only read cached results
+health_monitor = HealthMonitor(job_store)
+
+# Compressed bodies of finished results, so repeated downloads are not recompressed
+compressed_cache = CompressedCache()
+
+# CSS and JS are served from fingerprinted URLs; pages without per-session
+# content are rendered once
+asset_manifest = get_asset_manifest()
+page_cache = PageCache()
+app.jinja_env.globals['asset_url'] = asset_manifest.url
+
+# Searches started while the user is still filling in the form; shared with
+# embedded workers through the process-wide search cache, so enabled only
+# when this process runs one
+prewarmer = Prewarmer()
+
+def start_embedded_workers(store=None):
+    """Run crews in this process unless dedicated workers are deployed (EMBEDDED_WORKERS=0)
+
+    Returns the embedded worker, or None.  Prewarming is turned on with it.
+    """
+    embedded_workers = int(os.getenv('EMBEDDED_WORKERS', '1'))
+    if embedded_workers <= 0:
+        return None
+    from smart_car_buying_assistant.worker import start_embedded_worker
+    return start_embedded_worker(concurrency=embedded_workers, store=store or job_store, prewarmer=prewarmer)
 
 def make_json_serializable(obj):
     """Convert an object to JSON serializable format"""
@@ -37,49 +79,143 @@ def make_json_serializable(obj):
     else:
         return str(obj)
 
-def check_environment():
-    """Check if required environment variables are set"""
-    missing_vars = []
+def cacheable_json(payload, max_age=86400):
+    """Build a JSON response with an ETag, conditional GET support and compression
+
+    Only used for content that never changes once written (finished results).
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return cacheable_body(body, 'application/json', max_age)
+
+def cacheable_body(body, mimetype, max_age=86400):
+    """Response for a body that never changes once written, with an ETag and compression"""
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    encoding = negotiate_encoding(request.accept_encodings, len(body))
+    # Each encoded representation gets its own ETag, as required for caches
+    representation_etag = f"{etag}-{encoding}" if encoding else etag
     
-    # Check for OpenAI API key
-    if not os.getenv('OPENAI_API_KEY'):
-        missing_vars.append('OPENAI_API_KEY')
+    if request.if_none_match.contains(etag) or request.if_none_match.contains(representation_etag):
+        response = app.response_class(status=304)
+    else:
+        if encoding:
+            body = compressed_cache.get_or_compress(etag, body, encoding)
+        response = app.response_class(body, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
     
-    # Check for optional API keys (these are optional but recommended)
-    optional_vars = ['SERPER_API_KEY', 'BRAVE_API_KEY']
-    for var in optional_vars:
-        if not os.getenv(var):
-            print(f"⚠️  Warning: {var} not set. Some features may be limited.")
+    response.set_etag(representation_etag)
+    response.headers['Cache-Control'] = f'private, max-age={max_age}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def precompressed_response(static_body, cache_control):
+    """Serve a StaticBody in the best precompressed encoding the client accepts, with conditional GET"""
+    encoding = negotiate_encoding(request.accept_encodings, len(static_body.body))
+    if encoding not in static_body.encoded:
+        encoding = None
+    representation_etag = f"{static_body.etag}-{encoding}" if encoding else static_body.etag
     
-    if missing_vars:
-        error_msg = f"Missing required environment variables: {', '.join(missing_vars)}"
-        print(f"❌ {error_msg}")
-        return False, error_msg
+    if request.if_none_match.contains(static_body.etag) or request.if_none_match.contains(representation_etag):
+        response = app.response_class(status=304)
+    else:
+        body = static_body.encoded[encoding] if encoding else static_body.body
+        response = app.response_class(body, mimetype=static_body.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
     
-    return True, "Environment check passed"
+    response.set_etag(representation_etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+def render_cached_page(template_name):
+    """A page that is the same for every visitor; browsers revalidate it with its ETag"""
+    page = page_cache.get_or_render(template_name, lambda: render_template(template_name))
+    return precompressed_response(page, 'no-cache')
+
+def check_environment():
+    """Check if required environment variables are set (prints a report; used at startup)"""
+    env_ok, env_msg, missing_optional = check_environment_vars()
+    
+    # Optional API keys are recommended but not required
+    for var in missing_optional:
+        print(f"⚠️  Warning: {var} not set. Some features may be limited.")
+    
+    if not env_ok:
+        print(f"❌ {env_msg}")
+    
+    return env_ok, env_msg
 
 @app.route('/')
 def index():
     """Main page with the car buying assistant form"""
-    return render_template('index.html')
+    return render_cached_page('index.html')
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    """Fingerprinted CSS and JS; the URL changes with the content, so it is cached for a year"""
+    asset = asset_manifest.get(filename)
+    if asset is None:
+        return "Asset not found", 404
+    return precompressed_response(asset, 'public, max-age=31536000, immutable')
 
 @app.route('/health')
 def health_check():
-    """Health check endpoint"""
-    env_ok, env_msg = check_environment()
+    """Health check endpoint (cached dependency checks)"""
+    env_ok, env_msg = health_monitor.environment()
+    ready, report = health_monitor.readiness()
     
     return jsonify({
         'status': 'healthy' if env_ok else 'unhealthy',
         'environment': env_msg,
-        'crew_available': env_ok
+        'crew_available': env_ok,
+        'ready': ready,
+        'checks': report['checks']
     })
 
+@app.route('/livez')
+def liveness():
+    """Liveness probe: the web process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz')
+def readiness():
+    """Readiness probe: dependencies are healthy and workers can take more jobs"""
+    ready, report = health_monitor.readiness()
+    return jsonify(make_json_serializable(report)), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    """Usage totals, worker load, queue waits per priority class, and this process's model and rate limit stats"""
+    try:
+        totals = job_store.usage_totals()
+        workers = job_store.worker_stats()
+        queues = job_store.queue_stats()
+    except JobStoreError as e:
+        return jsonify({'error': f'Job store unavailable: {e}'}), 503
+    return jsonify({'usage': usage_report(totals), 'workers': workers, 'queues': queues,
+                    'models': get_model_router().snapshot(),
+                    'rate_limits': get_rate_limiter().snapshot()})
+
+@app.route('/prewarm', methods=['POST'])
+def prewarm():
+    """Start the searches for a state and car type before the form is submitted"""
+    data = request.get_json(silent=True) or {}
+    current_state = (data.get('current_state') or '').strip()
+    car_type = (data.get('car_type') or '').strip()
+    budget_range = (data.get('budget_range') or '').strip()
+    if not current_state or not car_type:
+        return jsonify({'error': 'current_state and car_type are required'}), 400
+    if max(len(current_state), len(car_type), len(budget_range)) > 100:
+        return jsonify({'error': 'Field too long'}), 400
+    return jsonify({'status': prewarmer.prewarm(current_state, car_type, budget_range)}), 202
+
 @app.route('/submit_requirements', methods=['POST'])
 def submit_requirements():
     """Handle form submission and start the crew process"""
     try:
-        # Check environment first
-        env_ok, env_msg = check_environment()
+        # Check environment first (cached by the health monitor)
+        env_ok, env_msg = health_monitor.environment()
         if not env_ok:
             return jsonify({'error': env_msg}), 400
         
@@ -94,306 +230,69 @@ def submit_requirements():
         # Validate required fields
         if not all([user_requirements, car_type, budget_range, current_state]):
             return jsonify({'error': 'All fields are required'}), 400
-        
-        # Create a unique session ID
-        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        # Initialize crew status
-        crew_status[session_id] = {
-            'status': 'starting',
-            'progress': 0,
-            'current_task': 'Initializing...',
-            'results': None,
-            'error': None
-        }
-        
-        # Start the crew process in a background thread
-        thread = threading.Thread(
-            target=run_crew_background,
-            args=(session_id, user_requirements, car_type, budget_range, current_state)
-        )
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({
-            'session_id': session_id,
-            'message': 'Crew process started successfully'
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
 
-def run_crew_background(session_id, user_requirements, car_type, budget_range, current_state):
-    """Run the crew process in the background"""
-    try:
-        # Update status
-        crew_status[session_id]['status'] = 'running'
-        crew_status[session_id]['progress'] = 10
-        crew_status[session_id]['current_task'] = 'Analyzing requirements...'
-        
-        # Import the crew here to avoid import errors at startup
-        # Try to use the robust crew first (handles missing API keys gracefully)
+        # A follow-up of an earlier session only reruns the tasks its edits invalidate
+        previous_session_id = data.get('previous_session_id')
+        if previous_session_id and not is_valid_session_id(previous_session_id):
+            return jsonify({'error': 'Invalid previous_session_id'}), 400
+
+        # API integrations queue as batch work behind people waiting on the form
+        scheduling = get_scheduling_policy()
+        client = client_id(request.headers.get('X-API-Key'), request.remote_addr)
         try:
-            from smart_car_buying_assistant.crew_robust import SmartCarBuyingAssistantCrewRobust
-            crew_class = SmartCarBuyingAssistantCrewRobust
-            print("✅ Using robust crew (handles missing API keys gracefully)")
-        except ImportError as e:
-            print(f"⚠️  Could not import robust crew: {e}")
-            
-            # Check if optional API keys are available
-            serper_key = os.getenv('SERPER_API_KEY')
-            brave_key = os.getenv('BRAVE_API_KEY')
-            
-            # Use simplified crew if search API keys are missing
-            if not serper_key or not brave_key:
-                print("⚠️  Search API keys not available, using simplified crew")
-                try:
-                    from smart_car_buying_assistant.crew_simple import SmartCarBuyingAssistantCrewSimple
-                    crew_class = SmartCarBuyingAssistantCrewSimple
-                    print("✅ Using simplified crew (no external API dependencies)")
-                except ImportError as e2:
-                    print(f"⚠️  Could not import simplified crew: {e2}")
-                    # Fallback to main crew
-                    try:
-                        from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
-                        crew_class = SmartCarBuyingAssistantCrew
-                        print("⚠️  Using main crew (some features may fail)")
-                    except ImportError as e3:
-                        raise Exception(f"Failed to import any CrewAI module: {e3}")
-            else:
-                # Use main crew if all API keys are available
-                try:
-                    from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
-                    crew_class = SmartCarBuyingAssistantCrew
-                    print("✅ Using main crew with full search capabilities")
-                except ImportError as e2:
-                    print(f"⚠️  Could not import main crew: {e2}")
-                    # Fallback to simplified crew
-                    try:
-                        from smart_car_buying_assistant.crew_simple import SmartCarBuyingAssistantCrewSimple
-                        crew_class = SmartCarBuyingAssistantCrewSimple
-                        print("✅ Using simplified crew as fallback")
-                    except ImportError as e3:
-                        raise Exception(f"Failed to import any CrewAI module: {e3}")
+            priority = scheduling.priority(client, data.get('priority'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Prepare inputs for the crew
-        inputs = {
+        # Reject impossible requests before they take a worker for minutes
+        feasible, feasibility_message, payload = check_feasibility({
             'user_requirements': user_requirements,
             'car_type': car_type,
             'budget_range': budget_range,
             'current_state': current_state
-        }
-        
-        # Update progress
-        crew_status[session_id]['progress'] = 20
-        crew_status[session_id]['current_task'] = 'Creating AI crew...'
-        
-        # Create the crew
-        try:
-            crew = crew_class().crew()
-        except Exception as e:
-            raise Exception(f"Failed to create crew: {e}")
-        
-        # Update progress
-        crew_status[session_id]['progress'] = 30
-        crew_status[session_id]['current_task'] = 'Researching vehicle market...'
-        
-        # Run the crew
-        try:
-            result = crew.kickoff(inputs=inputs)
-            print(f"✅ Crew execution completed successfully")
-        except Exception as e:
-            print(f"❌ Crew execution failed: {e}")
-            raise Exception(f"Crew execution failed: {e}")
-        
-        # Format the results according to the specified output format
-        try:
-            formatted_result = format_crew_results(result, user_requirements, car_type, budget_range, current_state)
-            crew_results[session_id] = formatted_result
-            crew_status[session_id]['status'] = 'completed'
-            crew_status[session_id]['progress'] = 100
-            crew_status[session_id]['current_task'] = 'Analysis complete!'
-            crew_status[session_id]['results'] = formatted_result
-            print(f"✅ Results formatted and stored successfully for session {session_id}")
-        except Exception as e:
-            print(f"❌ Error formatting results: {e}")
-            # Fallback to raw results if formatting fails
-            result_str = str(result) if result else "No results generated"
-            crew_results[session_id] = result_str
-            crew_status[session_id]['status'] = 'completed'
-            crew_status[session_id]['progress'] = 100
-            crew_status[session_id]['current_task'] = 'Analysis complete!'
-            crew_status[session_id]['results'] = result_str
+        })
+        if not feasible:
+            return jsonify({'error': feasibility_message, 'infeasible': True}), 422
         
-    except Exception as e:
-        crew_status[session_id]['status'] = 'error'
-        crew_status[session_id]['error'] = str(e)
-        crew_status[session_id]['current_task'] = f'Error: {str(e)}'
-        print(f"❌ Error in crew execution: {e}")
+        # Keep any prewarmed searches for this segment; the crew is about to use them
+        prewarmer.mark_used(payload['current_state'], car_type)
 
-def format_crew_results(result, user_requirements, car_type, budget_range, current_state):
-    """Format the crew results according to the specified output format"""
-    try:
-        # Get current date
-        current_date = datetime.now().strftime("%B %d, %Y")
-        
-        # Extract additional details from user requirements
-        # This is a simplified extraction - you may need to enhance this based on your actual input format
-        requirements_parts = user_requirements.split(',') if user_requirements else []
+        # Queue the crew job for the workers under a new random session ID
+        if previous_session_id:
+            payload['previous_session_id'] = previous_session_id
+        for attempt in range(3):
+            session_id = new_session_id()
+            try:
+                job_store.enqueue(session_id, payload, priority=priority, client=client,
+                                  weight=scheduling.weight(client))
+                break
+            except JobStoreError:
+                # Practically impossible with random IDs, but never overwrite a session
+                if attempt == 2:
+                    raise
         
-        # Default values
-        color = "Not specified"
-        mileage = "Not specified"
-        must_have_features = "Not specified"
-        nice_to_have_features = "Not specified"
-        payment_method = "Not specified"
-        intended_use = "Not specified"
-        purchase_date = "Not specified"
-        special_considerations = "Not specified"
-        
-        # Try to extract information from requirements
-        for part in requirements_parts:
-            part = part.strip().lower()
-            if 'color' in part or 'black' in part or 'white' in part or 'red' in part or 'blue' in part:
-                color = part.split(':')[-1].strip() if ':' in part else part
-            elif 'mileage' in part or 'miles' in part:
-                mileage = part.split(':')[-1].strip() if ':' in part else part
-            elif 'sunroof' in part or 'camera' in part or 'bluetooth' in part:
-                if 'must' in part or 'required' in part:
-                    must_have_features = part
-                else:
-                    nice_to_have_features = part
-            elif 'cash' in part or 'loan' in part or 'finance' in part:
-                payment_method = part
-            elif 'commute' in part or 'work' in part or 'family' in part:
-                intended_use = part
-            elif 'week' in part or 'month' in part or 'day' in part:
-                purchase_date = part
-            elif 'title' in part or 'clean' in part:
-                special_considerations = part
-        
-        # Start building the formatted output
-        formatted_output = f"""Comprehensive Car Buying Report
-Current Date: {current_date}
-
-Customer Profile
-State: {current_state}
-Vehicle Type: {car_type}
-Color: {color}
-Mileage: {mileage}
-Budget: {budget_range}
-Must-Have Features: {must_have_features}
-Nice-to-Have Features: {nice_to_have_features}
-Method of Payment: {payment_method}
-Intended Use: {intended_use}
-Desired Purchase Date: {purchase_date}
-Special Consideration: {special_considerations}
-
-"""
-        
-        # Add the crew results
-        if result:
-            result_str = str(result)
-            
-            # Try to extract and format specific sections
-            if "Top" in result_str and "Recommended" in result_str:
-                # Extract the top recommendations section
-                formatted_output += "Top 10 Recommended Vehicles\n"
-                # Add the table format
-                formatted_output += "| Rank | Vehicle Model | Price | Mileage | Location | Seller Type | Link |\n"
-                formatted_output += "|------|-----------------------------|--------|---------|------------------|------------------|------------------------------------------------|\n"
-                
-                # Try to extract vehicle information from the result
-                # This is a simplified approach - you may need to enhance this
-                lines = result_str.split('\n')
-                rank = 1
-                for line in lines:
-                    if any(keyword in line.lower() for keyword in ['nissan', 'toyota', 'honda', 'hyundai', 'mazda', 'subaru', 'ford', 'chevrolet', 'volkswagen', 'kia']):
-                        # Extract vehicle info (simplified)
-                        parts = line.split('|')
-                        if len(parts) >= 6:
-                            formatted_output += f"| {rank} | {parts[0].strip()} | {parts[1].strip()} | {parts[2].strip()} | {parts[3].strip()} | {parts[4].strip()} | {parts[5].strip()} |\n"
-                        else:
-                            formatted_output += f"| {rank} | {line.strip()} | $TBD | TBD | TBD | TBD | TBD |\n"
-                        rank += 1
-                        if rank > 10:
-                            break
-                
-                formatted_output += "\n"
-            
-            # Add the rest of the result content
-            formatted_output += result_str
-            
-            # Add standard sections if not present
-            if "Detailed Reasons" not in result_str:
-                formatted_output += "\n\nDetailed Reasons to Buy Each Vehicle\n"
-                formatted_output += "Detailed analysis of each recommended vehicle will be provided based on the research.\n"
-            
-            if "Out-of-State Registration" not in result_str:
-                formatted_output += "\n\nOut-of-State Registration Requirements\n"
-                formatted_output += "For vehicles purchased outside " + current_state + ", the following requirements must be met:\n"
-                formatted_output += "Documentation: Bill of sale, title transfer documentation, and any loan agreements if applicable.\n"
-                formatted_output += "Fees: Expect to pay registration fees and sales tax based on the purchase price.\n"
-                formatted_output += "Inspection: Some vehicles may require a smog check before registration.\n"
-                formatted_output += "Timeline: Registration should occur within 10 days of purchase to avoid penalties.\n"
-                formatted_output += "Process: Visit the " + current_state + " DMV website for step-by-step instructions.\n"
-            
-            if "Negotiation Strategies" not in result_str:
-                formatted_output += "\n\nNegotiation Strategies\n"
-                formatted_output += "| Vehicle Model | Negotiation Range | Suggested Offer Price |\n"
-                formatted_output += "|---------------------------|---------------------|-----------------------|\n"
-                formatted_output += "| [Vehicle] | [Range] | [Suggested Price] |\n"
-                formatted_output += "\nTips for Negotiation:\n"
-                formatted_output += "Research market values and be prepared to justify your offer.\n"
-                formatted_output += "Highlight any issues found during inspections as leverage.\n"
-                formatted_output += "Be ready to walk away if the deal doesn't meet your budget.\n"
-            
-            if "Inspection Checklists" not in result_str:
-                formatted_output += "\n\nInspection Checklists\n"
-                formatted_output += "Exterior Inspection\n"
-                formatted_output += "Body condition (dents, scratches)\n"
-                formatted_output += "Paint consistency\n"
-                formatted_output += "Tire tread and wear\n"
-                formatted_output += "Functional lights and signals\n"
-                formatted_output += "\nInterior Inspection\n"
-                formatted_output += "Seat condition\n"
-                formatted_output += "Dashboard functionality\n"
-                formatted_output += "Air conditioning and heating\n"
-                formatted_output += "Infotainment system operation\n"
-                formatted_output += "\nEngine and Mechanical Components\n"
-                formatted_output += "Fluid levels\n"
-                formatted_output += "Signs of leaks\n"
-                formatted_output += "Battery condition\n"
-                formatted_output += "Brake responsiveness\n"
-            
-            if "Final Recommendations" not in result_str:
-                formatted_output += "\n\nFinal Recommendations\n"
-                formatted_output += "Next Steps:\n"
-                formatted_output += "Research and contact sellers for preferred vehicles.\n"
-                formatted_output += "Schedule inspections and test drives.\n"
-                formatted_output += "Prepare negotiation strategies based on research.\n"
-                formatted_output += "Complete necessary paperwork for out-of-state registration if applicable.\n"
-                formatted_output += "Finalize purchase before the desired purchase date.\n"
-                formatted_output += "\nBy following this structured approach, you can confidently navigate the car buying process and select a vehicle that meets your needs and budget.\n"
-        else:
-            formatted_output += "No results generated from the crew analysis.\n"
-        
-        return formatted_output
+        message = 'Crew process queued successfully'
+        if feasibility_message:
+            message = f"{message}. {feasibility_message}"
+        return jsonify({
+            'session_id': session_id,
+            'priority': priority,
+            'message': message
+        })
         
     except Exception as e:
-        print(f"❌ Error formatting results: {e}")
-        # Return the raw result if formatting fails
-        return str(result) if result else "No results generated"
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/status/<session_id>')
 def get_status(session_id):
     """Get the current status of a crew process"""
-    if session_id not in crew_status:
+    status = job_store.get_status(session_id) if is_valid_session_id(session_id) else None
+    if status is None:
         return jsonify({'error': 'Session not found'}), 404
     
     try:
         # Ensure all values are JSON serializable
-        status_data = make_json_serializable(crew_status[session_id])
+        status_data = make_json_serializable(status)
         return jsonify(status_data)
     except Exception as e:
         print(f"❌ Error serializing status for session {session_id}: {e}")
@@ -405,16 +304,37 @@ def get_status(session_id):
 
 @app.route('/results/<session_id>')
 def get_results(session_id):
-    """Get the results of a completed crew process"""
-    if session_id not in crew_results:
+    """Get the results of a completed crew process
+
+    ``?section=legal,valuation`` (or ``?section=all``) returns only the named
+    report sections instead of the full report.
+    """
+    job = job_store.get(session_id) if is_valid_session_id(session_id) else None
+    if job is None or job['results'] is None:
         return jsonify({'error': 'Results not found'}), 404
     
     try:
-        # Ensure all values are JSON serializable
-        status_data = make_json_serializable(crew_status.get(session_id, {}))
+        # Ensure all values are JSON serializable; the report is sent once, not twice
+        status_data = make_json_serializable(
+            {key: value for key, value in job_store.get_status(session_id).items() if key != 'results'}
+        )
         
-        return jsonify({
-            'results': crew_results[session_id],
+        section_param = request.args.get('section')
+        if section_param:
+            names = [name.strip() for name in section_param.split(',') if name.strip()]
+            try:
+                sections = select_sections(job['sections'] or split_report(job['results']), names)
+            except ValueError as e:
+                return jsonify({'error': str(e), 'available_sections': list(REPORT_SECTIONS)}), 400
+            return cacheable_json({
+                'session_id': session_id,
+                'sections': sections,
+                'available_sections': list(REPORT_SECTIONS),
+                'status': status_data
+            })
+        
+        return cacheable_json({
+            'results': job['results'],
             'status': status_data
         })
     except Exception as e:
@@ -422,16 +342,67 @@ def get_results(session_id):
         return jsonify({
             'error': 'Error retrieving results',
             'session_id': session_id,
-            'results': str(crew_results.get(session_id, "Error retrieving results"))
+            'results': str(job.get('results') or "Error retrieving results")
         }), 500
 
 @app.route('/results/<session_id>/page')
 def results_page(session_id):
-    """Display results page"""
-    if session_id not in crew_results:
+    """Display results page
+
+    A finished report is served as the page rendered when the job completed;
+    a running session gets the live page, whose sections stream in.
+    """
+    job = job_store.get(session_id) if is_valid_session_id(session_id) else None
+    if job is None or job['status'] == 'error':
         return "Results not found", 404
     
-    return render_template('results.html', session_id=session_id)
+    if job['results'] is None:
+        # The live page reads the session id from its URL, so one rendering serves every session
+        return render_cached_page('results.html')
+    
+    page = job.get('page')
+    if not is_current(page):
+        # Finished before pages were prerendered, or the assets it links to have changed
+        page = render_results_page(session_id, job['sections'] or split_report(job['results']))
+        try:
+            job_store.update(session_id, page=page)
+        except JobStoreError as e:
+            print(f"⚠️  Could not store the results page of session {session_id}: {e}")
+    return cacheable_body(page['html'].encode('utf-8'), 'text/html')
+
+@app.route('/stream/<session_id>')
+def stream_results(session_id):
+    """Server-sent events with the status and live report sections of a running session"""
+    if not is_valid_session_id(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    try:
+        if job_store.get_live(session_id) is None:
+            return jsonify({'error': 'Session not found'}), 404
+    except JobStoreError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    response = app.response_class(stream_with_context(live_events(job_store, session_id)),
+                                  mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Proxies such as nginx would otherwise buffer the events
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/trace/<session_id>')
+def get_trace(session_id):
+    """Recent crew, task, agent, tool and LLM events of a session"""
+    job = job_store.get(session_id) if is_valid_session_id(session_id) else None
+    if job is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    # Embedded workers record into this process; dedicated workers save the trace with the job
+    trace = get_trace_recorder().get(session_id) or job.get('trace') or {
+        'session_id': session_id, 'events': [], 'dropped': 0, 'spilled': 0
+    }
+    trace = dict(trace, status=job['status'])
+    if request.args.get('include') == 'spilled':
+        trace['spilled_events'] = read_spilled_events(session_id)
+    return jsonify(make_json_serializable(trace))
 
 if __name__ == '__main__':
     # Check environment on startup
@@ -448,4 +419,8 @@ if __name__ == '__main__':
     print("🔄 Press Ctrl+C to stop the server")
     print("-" * 50)
     
+    # Only in the reloader child, so the debug reloader doesn't start two workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_embedded_workers()
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -16,7 +16,12 @@ if __name__ == "__main__":
     print("-" * 50)
     
     try:
-        from app import app
+        from app import app, start_embedded_workers
+        
+        # Only in the reloader child, so the debug reloader doesn't start two workers
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_embedded_workers()
+        
         app.run(debug=True, host='0.0.0.0', port=5000)
     except ImportError as e:
         print(f"❌ Error importing dependencies: {e}")
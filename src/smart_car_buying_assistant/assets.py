@@ -0,0 +1,130 @@
+"""
+Fingerprinted, precompressed static assets and cached pages.
+
+Files under ``static/`` are served from ``/assets/<path>.<hash>.<ext>``.  The
+hash comes from the file's content, so a changed file gets a new URL and
+browsers can keep every asset for a year as immutable.  Each file is read,
+hashed and compressed (gzip, plus brotli when the package is installed) at
+the highest levels once per process.  Pages that are the same for every
+visitor are rendered and compressed once as well, and carry an ETag so
+repeat views are answered with a 304.
+
+Tunables:
+
+    ASSET_RELOAD   '1' to re-read static files and re-render pages on every request (front-end development)
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+from smart_car_buying_assistant.compression import precompress
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'static')
+
+# Some platforms map .js to application/javascript or nothing at all
+MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+
+
+def asset_reload():
+    return os.getenv('ASSET_RELOAD', '0') == '1'
+
+
+class StaticBody:
+    """A response body with its ETag and precompressed encodings"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encoded = precompress(body)
+
+
+def fingerprinted_name(name, body):
+    """``css/results.css`` -> ``css/results.<content hash>.css``"""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+
+
+class AssetManifest:
+    """Fingerprinted URLs and precompressed bodies of the files under a static directory"""
+
+    def __init__(self, root, url_prefix='/assets/'):
+        self.root = root
+        self.url_prefix = url_prefix
+        self._urls = None
+        self._assets = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        urls, assets = {}, {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                with open(path, 'rb') as f:
+                    body = f.read()
+                mimetype = (MIMETYPES.get(os.path.splitext(name)[1])
+                            or mimetypes.guess_type(name)[0] or 'application/octet-stream')
+                urls[name] = fingerprinted_name(name, body)
+                assets[urls[name]] = StaticBody(body, mimetype)
+        return urls, assets
+
+    def _manifest(self):
+        if self._assets is None or asset_reload():
+            with self._lock:
+                if self._assets is None or asset_reload():
+                    self._urls, self._assets = self._load()
+                    print(f"✅ Prepared {len(self._assets)} static assets")
+        return self._urls, self._assets
+
+    def url(self, name):
+        """Fingerprinted URL of a static file (``asset_url`` in templates)"""
+        urls, _ = self._manifest()
+        if name not in urls:
+            raise KeyError(f"Unknown static asset: {name}")
+        return self.url_prefix + urls[name]
+
+    def get(self, fingerprinted):
+        """StaticBody served at a fingerprinted name, or None"""
+        return self._manifest()[1].get(fingerprinted)
+
+    def version(self):
+        """Changes whenever any asset's URL does (pages rendered with older URLs must be rendered again)"""
+        urls, _ = self._manifest()
+        return hashlib.sha256(json.dumps(urls, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_asset_manifest():
+    """Return the process-wide manifest of the files under static/"""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                _manifest = AssetManifest(os.path.abspath(STATIC_DIR))
+    return _manifest
+
+
+class PageCache:
+    """Rendered pages that are the same for every visitor"""
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get_or_render(self, name, render):
+        if not asset_reload():
+            with self._lock:
+                page = self._pages.get(name)
+            if page is not None:
+                return page
+        page = StaticBody(render().encode('utf-8'), 'text/html')
+        with self._lock:
+            self._pages[name] = page
+        return page
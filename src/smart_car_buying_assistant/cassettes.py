@@ -0,0 +1,246 @@
+"""
+Record/replay cassettes of crew sessions.
+
+A recording cassette captures every routed LLM call (response, model, token
+usage, latency) and every search backend call (result, latency) of one
+session, plus the session's inputs, in a gzip-compressed JSON lines file.
+Prompts are stored as hashes only, which keeps cassettes small.  Replaying a
+cassette runs the same session with every LLM and search call served from
+the file, sleeping for the recorded latencies (optionally scaled), so runs
+are deterministic and need no network.
+
+Replayed LLM calls are matched by agent, task and prompt hash.  A prompt that
+changed since the recording gets the next unused response recorded for the
+same agent and task instead, and is counted as a miss (``--strict`` turns
+misses into errors), so prompt changes can be compared against the old run.
+
+    replay_cassette cassettes/<session_id>.cassette.gz [--latency-scale 0.5] [--strict]
+
+Tunables:
+
+    CASSETTE_RECORD_DIR      when set, every session is recorded to <dir>/<session_id>.cassette.gz
+    CASSETTE_LATENCY_SCALE   multiplier for replayed latencies (default 1.0, 0 serves instantly)
+"""
+
+import argparse
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+CASSETTE_VERSION = 1
+
+_current_cassette = contextvars.ContextVar('cassette', default=None)
+
+# Injected dates change every day; they must not change the prompt hash
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?')
+
+
+class CassetteMissError(Exception):
+    """Raised when a replayed call has no recorded response"""
+
+
+def prompt_hash(messages):
+    """Stable hash of an LLM request's messages"""
+    if isinstance(messages, str):
+        messages = [{'role': 'user', 'content': messages}]
+    text = json.dumps(messages, sort_keys=True, default=str)
+    return hashlib.sha256(DATE_PATTERN.sub('<date>', text).encode('utf-8')).hexdigest()[:16]
+
+
+def _search_key(backend, search_query):
+    return f"{backend}:{' '.join(search_query.lower().split())}"
+
+
+class Cassette:
+    """The recorded LLM and search calls of one session"""
+
+    def __init__(self, path, header=None, entries=None, replaying=False, latency_scale=None, strict=False):
+        self.path = path
+        self.header = dict(header or {})
+        self.entries = list(entries or [])
+        self.replaying = replaying
+        self.latency_scale = (latency_scale if latency_scale is not None
+                              else float(os.getenv('CASSETTE_LATENCY_SCALE', '1.0')))
+        self.strict = strict
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        self._by_stream = defaultdict(deque)
+        if replaying:
+            for entry in self.entries:
+                self._by_key[entry['key']].append(entry)
+                if entry['kind'] == 'llm':
+                    self._by_stream[(entry['agent'], entry['task'])].append(entry)
+
+    @classmethod
+    def record_to(cls, path, **header):
+        return cls(path, header={'version': CASSETTE_VERSION, 'recorded_at': time.time(), **header})
+
+    @classmethod
+    def load(cls, path, latency_scale=None, strict=False):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if not records or records[0].get('version') != CASSETTE_VERSION:
+            raise ValueError(f"{path} is not a version {CASSETTE_VERSION} cassette")
+        return cls(path, records[0], records[1:], replaying=True, latency_scale=latency_scale, strict=strict)
+
+    def save(self, **header):
+        self.header.update(header)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            entries = list(self.entries)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            for record in [self.header] + entries:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def _add(self, entry):
+        with self._lock:
+            entry['seq'] = len(self.entries)
+            self.entries.append(entry)
+
+    def record_llm(self, agent, task, messages, response, model, latency, usage=None):
+        self._add({'kind': 'llm', 'key': prompt_hash(messages), 'agent': agent, 'task': task, 'model': model,
+                   'latency': round(latency, 3), 'usage': usage, 'response': response})
+
+    def record_search(self, backend, search_query, result, latency):
+        self._add({'kind': 'search', 'key': _search_key(backend, search_query), 'backend': backend,
+                   'query': search_query, 'latency': round(latency, 3), 'result': result})
+
+    def _take(self, key, stream=None):
+        with self._lock:
+            if self._by_key[key]:
+                entry = self._by_key[key].popleft()
+                if entry['kind'] == 'llm':
+                    self._by_stream[(entry['agent'], entry['task'])].remove(entry)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            if self.strict or stream is None or not self._by_stream[stream]:
+                return None
+            # The prompt changed since the recording: serve this agent's next response for the task
+            entry = self._by_stream[stream].popleft()
+            self._by_key[entry['key']].remove(entry)
+            return entry
+
+    def _wait(self, entry):
+        if self.latency_scale > 0:
+            time.sleep(entry['latency'] * self.latency_scale)
+
+    def replay_llm(self, agent, task, messages):
+        """Recorded entry for an LLM call; raises CassetteMissError when there is none"""
+        entry = self._take(prompt_hash(messages), stream=(agent, task))
+        if entry is None:
+            raise CassetteMissError(f"No recorded LLM response for {agent} / {task}")
+        self._wait(entry)
+        return entry
+
+    def replay_search(self, backend, search_query):
+        """Recorded result of a search (None for a recorded failure or a miss)"""
+        entry = self._take(_search_key(backend, search_query))
+        if entry is None:
+            if self.strict:
+                raise CassetteMissError(f"No recorded {backend} search for {search_query!r}")
+            return None
+        self._wait(entry)
+        return entry['result']
+
+    def recorded_io_seconds(self):
+        return sum(entry['latency'] for entry in self.entries)
+
+    def stats(self):
+        kinds = defaultdict(int)
+        for entry in self.entries:
+            kinds[entry['kind']] += 1
+        return {'llm_calls': kinds['llm'], 'searches': kinds['search'], 'hits': self.hits, 'misses': self.misses}
+
+
+def recording_cassette(session_id, **header):
+    """Cassette to record a session to when CASSETTE_RECORD_DIR is set, else None"""
+    record_dir = os.getenv('CASSETTE_RECORD_DIR')
+    if not record_dir:
+        return None
+    return Cassette.record_to(os.path.join(record_dir, f"{session_id}.cassette.gz"),
+                              session_id=session_id, **header)
+
+
+@contextmanager
+def use_cassette(cassette):
+    """Record or replay the LLM and search calls made inside the block (no-op for None)"""
+    if cassette is None:
+        yield None
+        return
+    token = _current_cassette.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _current_cassette.reset(token)
+
+
+def current_cassette():
+    """Cassette of the session running in this context, or None"""
+    return _current_cassette.get()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session offline")
+    parser.add_argument('path', help="cassette written with CASSETTE_RECORD_DIR set")
+    parser.add_argument('--latency-scale', type=float, default=None,
+                        help="multiplier for the recorded latencies (0 serves every call instantly)")
+    parser.add_argument('--strict', action='store_true', help="fail on calls that are not in the cassette")
+    args = parser.parse_args(argv)
+
+    try:
+        cassette = Cassette.load(args.path, args.latency_scale, args.strict)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not load cassette: {e}")
+        return 1
+
+    # Same crew and search backends as the recording; no call leaves the process
+    from smart_car_buying_assistant.tools.registry import BACKEND_ENV_VARS
+    for backend in cassette.header.get('search_backends', []):
+        os.environ.setdefault(BACKEND_ENV_VARS[backend], 'cassette-replay')
+    os.environ.setdefault('OPENAI_API_KEY', 'cassette-replay')
+
+    from smart_car_buying_assistant.job_store import MemoryJobStore
+    from smart_car_buying_assistant.runner import run_crew_background
+    from smart_car_buying_assistant.sessions import new_session_id
+
+    inputs = cassette.header['inputs']
+    store = MemoryJobStore()
+    session_id = new_session_id()
+    store.enqueue(session_id, inputs)
+    print(f"▶️  Replaying session {cassette.header.get('session_id')} as {session_id} "
+          f"(latency x{cassette.latency_scale:g})")
+    started = time.monotonic()
+    run_crew_background(session_id, inputs['user_requirements'], inputs['car_type'], inputs['budget_range'],
+                        inputs['current_state'], store=store, cassette=cassette)
+    elapsed = time.monotonic() - started
+
+    job = store.get(session_id)
+    stats = cassette.stats()
+    recorded = cassette.header.get('duration_seconds')
+    print(f"\n📼 Replay {job['status']} in {elapsed:.2f}s"
+          + (f" (recorded session took {recorded:.2f}s)" if recorded is not None else ''))
+    print(f"   {stats['llm_calls']} LLM calls and {stats['searches']} searches recorded, "
+          f"{stats['hits']} served exactly, {stats['misses']} missed")
+    print(f"   Recorded LLM/search time {cassette.recorded_io_seconds() * cassette.latency_scale:.2f}s "
+          f"(scaled, summed over concurrent calls)")
+    if cassette.header.get('crew'):
+        print(f"   Recorded with {cassette.header['crew']}")
+    if job['status'] != 'completed':
+        print(f"❌ {job.get('error')}")
+        return 1
+    return 1 if args.strict and stats['misses'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
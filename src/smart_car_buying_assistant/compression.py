@@ -0,0 +1,83 @@
+"""
+Response compression helpers (gzip always, brotli when the package is installed).
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+
+def available_encodings():
+    """Content encodings this server can produce, best first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encodings, size):
+    """Pick the best content encoding accepted by the client, or None
+
+    ``accept_encodings`` is a werkzeug ``Accept`` object (``request.accept_encodings``).
+    """
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    for encoding in available_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    """Compress a byte string with the given content encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def precompress(body):
+    """Compress a body served many times once, at the highest levels
+
+    Returns ``{encoding: compressed body}`` with only the encodings that make it smaller.
+    """
+    if len(body) < MIN_COMPRESS_SIZE:
+        return {}
+    compressed = {}
+    for encoding in available_encodings():
+        if encoding == 'br':
+            data = brotli.compress(body, quality=11)
+        else:
+            # mtime=0 keeps the output identical across processes
+            data = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(data) < len(body):
+            compressed[encoding] = data
+    return compressed
+
+
+class CompressedCache:
+    """Small LRU of compressed bodies keyed by (etag, encoding)"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, etag, body, encoding):
+        key = (etag, encoding)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        compressed = compress(body, encoding)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
@@ -0,0 +1,95 @@
+"""
+Conditional tasks: skip a task when the output of the task before it shows it has nothing to do.
+
+``research_vehicle_market`` ends its report with a summary line such as
+``Out-of-state vehicles - 0``.  ``analyze_legal_requirements`` only applies
+to out-of-state vehicles, so it is skipped when that count is zero and a
+short note is used as its output instead (tasks that take it as context and
+the report's legal section read the note).  When the summary line is missing
+or unreadable the task runs as before.
+"""
+
+import re
+
+from crewai.tasks.conditional_task import ConditionalTask
+from crewai.tasks.output_format import OutputFormat
+from crewai.tasks.task_output import TaskOutput
+
+from smart_car_buying_assistant.streaming import publish_task_output
+from smart_car_buying_assistant.tracing import get_trace_recorder
+
+OUT_OF_STATE_SUMMARY = re.compile(r'out[- ]of[- ]state vehicles\s*\**\s*[-:=]\s*\**\s*(\d+|none)\b', re.IGNORECASE)
+
+NO_LEGAL_REVIEW_NOTE = (
+    "No out-of-state vehicles were found in the market research, so no interstate purchase, "
+    "title transfer or out-of-state registration steps apply. Buy and register the vehicle "
+    "through the usual in-state process."
+)
+
+
+def summary_count(output, pattern):
+    """Number reported by a summary line of a task output, or None when it is missing"""
+    raw = getattr(output, 'raw', output) or ''
+    matches = pattern.findall(raw)
+    if not matches:
+        return None
+    # The summary is at the end; earlier matches may be part of the listing text
+    value = matches[-1].lower()
+    return 0 if value == 'none' else int(value)
+
+
+def has_out_of_state_vehicles(output):
+    """Whether the market research flagged any out-of-state vehicle (True when unsure)"""
+    count = summary_count(output, OUT_OF_STATE_SUMMARY)
+    return count is None or count > 0
+
+
+class SkippableTask(ConditionalTask):
+    """ConditionalTask whose skipped output is a note that later tasks can read"""
+
+    skipped_note: str = ''
+
+    def get_skipped_task_output(self):
+        output = TaskOutput(
+            description=self.description,
+            name=self.name,
+            expected_output=self.expected_output,
+            raw=self.skipped_note,
+            agent=self.agent.role if self.agent else '',
+            output_format=OutputFormat.RAW,
+        )
+        # crewai does not set the output of a skipped task; tasks that use it as context need it
+        self.output = output
+        print(f"⏭️  Skipping task {self.name}: its condition is not met")
+        get_trace_recorder().record('task_skipped', task=self.name)
+        publish_task_output(self, output.raw)
+        return output
+
+
+def legal_review_task(config):
+    """analyze_legal_requirements, run only when out-of-state vehicles were found"""
+    return SkippableTask(
+        config=config,
+        condition=has_out_of_state_vehicles,
+        skipped_note=NO_LEGAL_REVIEW_NOTE,
+    )
+
+
+def tasks_to_run(tasks, completed):
+    """Tasks not in ``completed`` that still have to run, skipping conditional tasks already decided
+
+    crewai checks a ConditionalTask against the output of the task run just
+    before it.  When that task's output was reused from an earlier session it
+    is not part of the crew, so the condition is checked here instead.
+    """
+    remaining = []
+    for index, task in enumerate(tasks):
+        if task.name in completed:
+            continue
+        previous = tasks[index - 1] if index else None
+        if (isinstance(task, ConditionalTask) and previous is not None and previous.name in completed
+                and previous.output is not None and not task.should_execute(previous.output)):
+            task.get_skipped_task_output()
+            continue
+        remaining.append(task)
+    return remaining
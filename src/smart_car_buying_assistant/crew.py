@@ -1,7 +1,11 @@
 import os
-from crewai import LLM
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
+
+from smart_car_buying_assistant.conditions import legal_review_task
+from smart_car_buying_assistant.map_tasks import per_candidate_task
+from smart_car_buying_assistant.routing import routed_llm
+from smart_car_buying_assistant.tracing import crew_verbose
 from crewai_tools import (
 	SerperDevTool,
 	BraveSearchTool
@@ -24,10 +28,7 @@ class SmartCarBuyingAssistantCrew:
             ],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_buying_requirements_analyst"),
         )
     
     @agent
@@ -41,10 +42,7 @@ class SmartCarBuyingAssistantCrew:
             ],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_market_research_specialist"),
         )
     
     @agent
@@ -57,10 +55,7 @@ class SmartCarBuyingAssistantCrew:
             ],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("interstate_car_purchase_legal_advisor"),
         )
     
     @agent
@@ -73,10 +68,7 @@ class SmartCarBuyingAssistantCrew:
             ],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("vehicle_valuation_expert"),
         )
     
     @agent
@@ -89,10 +81,7 @@ class SmartCarBuyingAssistantCrew:
             ],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_purchase_negotiation_strategist"),
         )
     
     @agent
@@ -105,10 +94,7 @@ class SmartCarBuyingAssistantCrew:
             ],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("vehicle_inspection_coordinator"),
         )
     
 
@@ -127,9 +113,8 @@ class SmartCarBuyingAssistantCrew:
     
     @task
     def analyze_legal_requirements(self) -> Task:
-        return Task(
-            config=self.tasks_config["analyze_legal_requirements"],
-        )
+        # Skipped when the market research found no out-of-state vehicles
+        return legal_review_task(self.tasks_config["analyze_legal_requirements"])
     
     @task
     def evaluate_vehicle_values(self) -> Task:
@@ -139,15 +124,12 @@ class SmartCarBuyingAssistantCrew:
     
     @task
     def develop_negotiation_strategies(self) -> Task:
-        return Task(
-            config=self.tasks_config["develop_negotiation_strategies"],
-        )
+        # Run once per top candidate from the valuation, concurrently
+        return per_candidate_task(self.tasks_config["develop_negotiation_strategies"])
     
     @task
     def create_inspection_plan(self) -> Task:
-        return Task(
-            config=self.tasks_config["create_inspection_plan"],
-        )
+        return per_candidate_task(self.tasks_config["create_inspection_plan"])
     
 
     @crew
@@ -157,5 +139,5 @@ class SmartCarBuyingAssistantCrew:
             agents=self.agents,  # Automatically created by the @agent decorator
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
-            verbose=True,
+            verbose=crew_verbose(),
         )
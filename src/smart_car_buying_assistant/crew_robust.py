@@ -1,45 +1,19 @@
-import os
-from crewai import LLM
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 
+from smart_car_buying_assistant.conditions import legal_review_task
+from smart_car_buying_assistant.map_tasks import per_candidate_task
+from smart_car_buying_assistant.routing import routed_llm
+from smart_car_buying_assistant.tools.registry import get_tool_registry
+from smart_car_buying_assistant.tracing import crew_verbose
+
 @CrewBase
 class SmartCarBuyingAssistantCrewRobust:
     """Robust SmartCarBuyingAssistant crew that handles missing API keys gracefully"""
 
     def _get_tools_for_agent(self, agent_name):
-        """Get tools for an agent, with fallbacks for missing API keys"""
-        tools = []
-        
-        # Check if search API keys are available
-        serper_key = os.getenv('SERPER_API_KEY')
-        brave_key = os.getenv('BRAVE_API_KEY')
-        
-        if serper_key and brave_key:
-            # Both keys available - use full search capabilities
-            try:
-                from crewai_tools import SerperDevTool, BraveSearchTool
-                if agent_name in ['car_market_research_specialist']:
-                    tools = [SerperDevTool(), BraveSearchTool()]
-                elif agent_name in ['interstate_car_purchase_legal_advisor', 'vehicle_valuation_expert', 'car_purchase_negotiation_strategist']:
-                    tools = [SerperDevTool()]
-                print(f"✅ Using full search tools for {agent_name}")
-            except ImportError:
-                print(f"⚠️  Search tools not available for {agent_name}")
-        elif brave_key:
-            # Only Brave key available
-            try:
-                from crewai_tools import BraveSearchTool
-                if agent_name in ['car_market_research_specialist']:
-                    tools = [BraveSearchTool()]
-                print(f"✅ Using Brave search for {agent_name}")
-            except ImportError:
-                print(f"⚠️  Brave search tool not available for {agent_name}")
-        else:
-            # No search keys available - use no tools
-            print(f"⚠️  No search API keys available for {agent_name}, using knowledge-based responses")
-        
-        return tools
+        """Get tools for an agent from the process-wide registry (routes around failing search backends)"""
+        return get_tool_registry().tools_for_agent(agent_name)
 
     @agent
     def car_buying_requirements_analyst(self) -> Agent:
@@ -48,10 +22,7 @@ class SmartCarBuyingAssistantCrewRobust:
             tools=[],  # No tools needed for requirements analysis
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_buying_requirements_analyst"),
         )
     
     @agent
@@ -62,10 +33,7 @@ class SmartCarBuyingAssistantCrewRobust:
             tools=tools,
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_market_research_specialist"),
         )
     
     @agent
@@ -76,10 +44,7 @@ class SmartCarBuyingAssistantCrewRobust:
             tools=tools,
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("interstate_car_purchase_legal_advisor"),
         )
     
     @agent
@@ -90,10 +55,7 @@ class SmartCarBuyingAssistantCrewRobust:
             tools=tools,
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("vehicle_valuation_expert"),
         )
     
     @agent
@@ -104,10 +66,7 @@ class SmartCarBuyingAssistantCrewRobust:
             tools=tools,
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_purchase_negotiation_strategist"),
         )
     
     @agent
@@ -117,10 +76,7 @@ class SmartCarBuyingAssistantCrewRobust:
             tools=[],  # No tools needed for inspection planning
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("vehicle_inspection_coordinator"),
         )
 
     @task
@@ -137,9 +93,8 @@ class SmartCarBuyingAssistantCrewRobust:
     
     @task
     def analyze_legal_requirements(self) -> Task:
-        return Task(
-            config=self.tasks_config["analyze_legal_requirements"],
-        )
+        # Skipped when the market research found no out-of-state vehicles
+        return legal_review_task(self.tasks_config["analyze_legal_requirements"])
     
     @task
     def evaluate_vehicle_values(self) -> Task:
@@ -149,15 +104,12 @@ class SmartCarBuyingAssistantCrewRobust:
     
     @task
     def develop_negotiation_strategies(self) -> Task:
-        return Task(
-            config=self.tasks_config["develop_negotiation_strategies"],
-        )
+        # Run once per top candidate from the valuation, concurrently
+        return per_candidate_task(self.tasks_config["develop_negotiation_strategies"])
     
     @task
     def create_inspection_plan(self) -> Task:
-        return Task(
-            config=self.tasks_config["create_inspection_plan"],
-        )
+        return per_candidate_task(self.tasks_config["create_inspection_plan"])
 
     @crew
     def crew(self) -> Crew:
@@ -166,5 +118,5 @@ class SmartCarBuyingAssistantCrewRobust:
             agents=self.agents,
             tasks=self.tasks,
             process=Process.sequential,
-            verbose=True,
+            verbose=crew_verbose(),
         )
@@ -1,8 +1,12 @@
 import os
-from crewai import LLM
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 
+from smart_car_buying_assistant.conditions import legal_review_task
+from smart_car_buying_assistant.map_tasks import per_candidate_task
+from smart_car_buying_assistant.routing import routed_llm
+from smart_car_buying_assistant.tracing import crew_verbose
+
 @CrewBase
 class SmartCarBuyingAssistantCrewSimple:
     """Simplified SmartCarBuyingAssistant crew without external API dependencies"""
@@ -14,10 +18,7 @@ class SmartCarBuyingAssistantCrewSimple:
             tools=[],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_buying_requirements_analyst"),
         )
     
     @agent
@@ -27,10 +28,7 @@ class SmartCarBuyingAssistantCrewSimple:
             tools=[],  # No external tools to avoid API key requirements
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_market_research_specialist"),
         )
     
     @agent
@@ -40,10 +38,7 @@ class SmartCarBuyingAssistantCrewSimple:
             tools=[],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("interstate_car_purchase_legal_advisor"),
         )
     
     @agent
@@ -53,10 +48,7 @@ class SmartCarBuyingAssistantCrewSimple:
             tools=[],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("vehicle_valuation_expert"),
         )
     
     @agent
@@ -66,10 +58,7 @@ class SmartCarBuyingAssistantCrewSimple:
             tools=[],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("car_purchase_negotiation_strategist"),
         )
     
     @agent
@@ -79,10 +68,7 @@ class SmartCarBuyingAssistantCrewSimple:
             tools=[],
             reasoning=False,
             inject_date=True,
-            llm=LLM(
-                model="gpt-4o-mini",
-                temperature=0.7,
-            ),
+            llm=routed_llm("vehicle_inspection_coordinator"),
         )
 
     @task
@@ -99,9 +85,8 @@ class SmartCarBuyingAssistantCrewSimple:
     
     @task
     def analyze_legal_requirements(self) -> Task:
-        return Task(
-            config=self.tasks_config["analyze_legal_requirements"],
-        )
+        # Skipped when the market research found no out-of-state vehicles
+        return legal_review_task(self.tasks_config["analyze_legal_requirements"])
     
     @task
     def evaluate_vehicle_values(self) -> Task:
@@ -111,15 +96,12 @@ class SmartCarBuyingAssistantCrewSimple:
     
     @task
     def develop_negotiation_strategies(self) -> Task:
-        return Task(
-            config=self.tasks_config["develop_negotiation_strategies"],
-        )
+        # Run once per top candidate from the valuation, concurrently
+        return per_candidate_task(self.tasks_config["develop_negotiation_strategies"])
     
     @task
     def create_inspection_plan(self) -> Task:
-        return Task(
-            config=self.tasks_config["create_inspection_plan"],
-        )
+        return per_candidate_task(self.tasks_config["create_inspection_plan"])
 
     @crew
     def crew(self) -> Crew:
@@ -128,5 +110,5 @@ class SmartCarBuyingAssistantCrewSimple:
             agents=self.agents,
             tasks=self.tasks,
             process=Process.sequential,
-            verbose=True,
+            verbose=crew_verbose(),
         )
@@ -0,0 +1,171 @@
+"""
+Feasibility check of a request before its crew is queued.
+
+Requests that cannot succeed (a budget below what any used vehicle of the
+requested type costs, or a state that does not exist) are rejected with a
+useful message instead of running all six agents.  Requests that only need
+adjusting, such as a new vehicle on a used-car budget, are reshaped and run.
+The local check uses the price bands below; when it cannot read the budget
+(including financing budgets such as "$400 a month" or "$3,000 down", which
+say nothing about the price) or does not know the car type, one small LLM
+call decides (and the request runs if that call fails).
+
+Tunables:
+
+    FEASIBILITY_LLM   '1' (default) to ask the feasibility_checker model when the local check is inconclusive
+"""
+
+import json
+import os
+import re
+
+from smart_car_buying_assistant.routing import routed_llm
+
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois',
+    'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina', 'SD': 'South Dakota',
+    'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VA': 'Virginia',
+    'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+
+# Rough lowest prices (USD) of a running used vehicle and of a new one, per car type
+PRICE_BANDS = {
+    'sedan': (3000, 20000),
+    'hatchback': (3000, 18000),
+    'coupe': (3500, 25000),
+    'wagon': (3500, 28000),
+    'suv': (4000, 25000),
+    'minivan': (4000, 38000),
+    'convertible': (5000, 30000),
+    'truck': (5000, 30000),
+    'hybrid': (5000, 25000),
+    'electric': (6000, 30000),
+}
+
+AMOUNT_PATTERN = re.compile(r'\$?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|thousand)?\b', re.IGNORECASE)
+# Monthly payments and down payments are not the price of the car
+FINANCING_PATTERN = re.compile(
+    r'\d\s*(?:k|thousand)?\s*(?:/\s*mo|(?:a|an|per|each|every)?\s*month|monthly|down\b|payment)'
+    r'|\b(?:monthly|down payment|payments?)\b[^\d$]{0,20}\$?\s*\d',
+    re.IGNORECASE,
+)
+# "new" said of the vehicle, not of the buyer ("I am new to car buying")
+NEW_VEHICLE_PATTERN = re.compile(
+    r'\bbrand[- ]new\b|\bnew\s+(?:car|vehicle|auto|pickup|van|ev|' + '|'.join(PRICE_BANDS) + r')s?\b',
+    re.IGNORECASE,
+)
+LIKE_NEW_PATTERN = re.compile(r'\b(like|almost|nearly|as)[- ]new\b', re.IGNORECASE)
+
+LLM_PROMPT = (
+    "You check car buying requests before an expensive analysis runs. Decide whether a buyer "
+    "could realistically find a {car_type} with a budget of \"{budget_range}\" in {state}, "
+    "given these requirements: {user_requirements}\n"
+    'Reply with JSON only: {{"feasible": true or false, "reason": "one sentence for the buyer"}}'
+)
+
+
+def normalize_state(value):
+    """Two-letter code of a US state given its code or name, or None"""
+    value = (value or '').strip()
+    if value.upper() in US_STATES:
+        return value.upper()
+    for code, name in US_STATES.items():
+        if name.lower() == value.lower():
+            return code
+    return None
+
+
+def parse_budget(text):
+    """Highest dollar amount mentioned in a budget, or None when there is none or it is a financing budget"""
+    if FINANCING_PATTERN.search(text or ''):
+        return None
+    amounts = []
+    for number, thousands in AMOUNT_PATTERN.findall(text or ''):
+        amount = float(number.replace(',', ''))
+        if thousands:
+            amount *= 1000
+        # Small bare numbers are counts or ambiguous ("under 15"), not dollars
+        if amount >= 500:
+            amounts.append(amount)
+    return max(amounts) if amounts else None
+
+
+def wants_new_vehicle(user_requirements):
+    text = LIKE_NEW_PATTERN.sub('', user_requirements or '')
+    return bool(NEW_VEHICLE_PATTERN.search(text))
+
+
+def _affordable_types(budget):
+    return [car_type for car_type, (used_floor, _) in PRICE_BANDS.items() if used_floor <= budget]
+
+
+def check_locally(payload):
+    """Return (feasible, message, payload); feasible is None when the check is inconclusive"""
+    state = normalize_state(payload.get('current_state'))
+    if state is None:
+        return False, f"'{payload.get('current_state')}' is not a US state. Please pick your state from the list.", payload
+    payload = {**payload, 'current_state': state}
+
+    band = PRICE_BANDS.get((payload.get('car_type') or '').strip().lower())
+    budget = parse_budget(payload.get('budget_range'))
+    if band is None or budget is None:
+        return None, '', payload
+
+    used_floor, new_floor = band
+    car_type = payload['car_type']
+    if budget < used_floor:
+        cheaper = [t for t in _affordable_types(budget) if t != car_type.lower()]
+        suggestion = (f" A {' or '.join(cheaper[:2])} may fit this budget." if cheaper
+                      else " Even the cheapest used cars usually cost more than this.")
+        return False, (f"A budget of ${budget:,.0f} is below what a running used {car_type} typically costs "
+                       f"(about ${used_floor:,.0f} and up). Please raise the budget.{suggestion}"), payload
+
+    if budget < new_floor and wants_new_vehicle(payload.get('user_requirements')):
+        note = (f"A new {car_type} starts at about ${new_floor:,.0f}, so the search covers used "
+                f"vehicles within ${budget:,.0f}.")
+        payload = {**payload, 'user_requirements': f"{payload['user_requirements']}\n\nNote: {note}"}
+        return True, note, payload
+
+    return True, '', payload
+
+
+def check_with_llm(payload):
+    """Ask the feasibility_checker model; returns (feasible, message) and (True, '') on any failure"""
+    try:
+        reply = routed_llm('feasibility_checker').call([{'role': 'user', 'content': LLM_PROMPT.format(
+            car_type=payload.get('car_type'),
+            budget_range=payload.get('budget_range'),
+            state=US_STATES.get(payload.get('current_state'), payload.get('current_state')),
+            user_requirements=(payload.get('user_requirements') or '')[:1000],
+        )}])
+        verdict = json.loads(re.search(r'\{.*\}', str(reply), re.DOTALL).group(0))
+    except Exception as e:
+        print(f"⚠️  Feasibility check by LLM failed, running the request: {e}")
+        return True, ''
+    if verdict.get('feasible') is False:
+        return False, str(verdict.get('reason') or 'This request does not look feasible.')
+    return True, ''
+
+
+def check_feasibility(payload, use_llm=None):
+    """Return (feasible, message, payload) for a submitted request
+
+    ``payload`` may come back adjusted (normalized state, reshaped
+    requirements); ``message`` explains a rejection or an adjustment.
+    """
+    feasible, message, payload = check_locally(payload)
+    if feasible is not None:
+        return feasible, message, payload
+    if use_llm is None:
+        use_llm = os.getenv('FEASIBILITY_LLM', '1') == '1'
+    if not use_llm:
+        return True, '', payload
+    feasible, message = check_with_llm(payload)
+    return feasible, message, payload
@@ -0,0 +1,195 @@
+"""
+Dependency health probes for the web tier.
+
+Probes run on a background thread at their own interval and the results are
+cached, so /health, /readyz and /submit_requirements never wait on the network
+and nothing is printed per request.  Search providers are probed rarely
+because every probe spends a search credit.
+
+Tunables (seconds / counts):
+
+    HEALTH_PROBE_INTERVAL          LLM and environment probes (default 60)
+    HEALTH_SEARCH_PROBE_INTERVAL   Serper and Brave probes (default 600)
+    HEALTH_QUEUE_PROBE_INTERVAL    job store, queue depth and workers (default 5)
+    READY_MAX_QUEUE_PER_SLOT       queued jobs per free worker slot before /readyz fails (default 5)
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+REQUIRED_ENV_VARS = ('OPENAI_API_KEY',)
+OPTIONAL_ENV_VARS = ('SERPER_API_KEY', 'BRAVE_API_KEY')
+
+PROBE_TIMEOUT = 5
+
+
+def check_environment_vars():
+    """Return (ok, message, missing optional variables) without printing anything"""
+    missing = [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
+    missing_optional = [var for var in OPTIONAL_ENV_VARS if not os.getenv(var)]
+    if missing:
+        return False, f"Missing required environment variables: {', '.join(missing)}", missing_optional
+    return True, "Environment check passed", missing_optional
+
+
+def probe_environment():
+    ok, message, missing_optional = check_environment_vars()
+    if ok and missing_optional:
+        message = f"{message} (optional not set: {', '.join(missing_optional)})"
+    return ok, message
+
+
+def probe_llm():
+    """Check that the OpenAI-compatible API answers with the configured key"""
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return False, "OPENAI_API_KEY not set"
+    base_url = (os.getenv('OPENAI_API_BASE') or os.getenv('OPENAI_BASE_URL') or 'https://api.openai.com/v1').rstrip('/')
+    response = requests.get(f"{base_url}/models", headers={'Authorization': f'Bearer {api_key}'},
+                            timeout=PROBE_TIMEOUT)
+    return response.status_code == 200, f"HTTP {response.status_code}"
+
+
+def probe_serper():
+    api_key = os.getenv('SERPER_API_KEY')
+    if not api_key:
+        return None, "SERPER_API_KEY not set"
+    response = requests.post('https://google.serper.dev/search', json={'q': 'car', 'num': 1},
+                             headers={'X-API-KEY': api_key}, timeout=PROBE_TIMEOUT)
+    return response.status_code == 200, f"HTTP {response.status_code}"
+
+
+def probe_brave():
+    api_key = os.getenv('BRAVE_API_KEY')
+    if not api_key:
+        return None, "BRAVE_API_KEY not set"
+    response = requests.get('https://api.search.brave.com/res/v1/web/search', params={'q': 'car', 'count': 1},
+                            headers={'X-Subscription-Token': api_key, 'Accept': 'application/json'},
+                            timeout=PROBE_TIMEOUT)
+    return response.status_code == 200, f"HTTP {response.status_code}"
+
+
+class Probe:
+    """A named dependency check run every ``interval`` seconds
+
+    ``check`` returns (ok, detail); ok is None when the dependency is not configured.
+    Failing ``required`` probes make the service not ready.
+    """
+
+    def __init__(self, name, check, interval, required=False):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.required = required
+        self.next_run = 0.0
+        self.result = {'ok': None, 'detail': 'not checked yet', 'latency_ms': None,
+                       'checked_at': None, 'required': required}
+
+    def run(self):
+        started = time.time()
+        try:
+            ok, detail = self.check()
+        except Exception as e:
+            ok, detail = False, f"{type(e).__name__}: {e}"
+        # Swap in a new dict so readers never see a half-written result
+        self.result = {
+            'ok': ok,
+            'detail': detail,
+            'latency_ms': round((time.time() - started) * 1000, 1),
+            'checked_at': started,
+            'required': self.required,
+        }
+        self.next_run = started + self.interval
+
+
+class HealthMonitor:
+    """Runs dependency probes in the background and caches their results"""
+
+    def __init__(self, store, probe_interval=None, search_probe_interval=None,
+                 queue_probe_interval=None, max_queue_per_slot=None):
+        self.store = store
+        probe_interval = probe_interval or float(os.getenv('HEALTH_PROBE_INTERVAL', '60'))
+        search_probe_interval = search_probe_interval or float(os.getenv('HEALTH_SEARCH_PROBE_INTERVAL', '600'))
+        queue_probe_interval = queue_probe_interval or float(os.getenv('HEALTH_QUEUE_PROBE_INTERVAL', '5'))
+        self.max_queue_per_slot = max_queue_per_slot or float(os.getenv('READY_MAX_QUEUE_PER_SLOT', '5'))
+        self.queue = {'depth': None, 'workers': None}
+        self.probes = [
+            Probe('environment', probe_environment, probe_interval, required=True),
+            Probe('llm', probe_llm, probe_interval, required=True),
+            Probe('serper', probe_serper, search_probe_interval),
+            Probe('brave', probe_brave, search_probe_interval),
+            Probe('job_store', self._probe_job_store, queue_probe_interval, required=True),
+        ]
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _probe_job_store(self):
+        depth = self.store.depth()
+        workers = self.store.worker_stats()
+        self.queue = {'depth': depth, 'workers': workers}
+        return True, f"{depth} queued, {workers['busy']}/{workers['capacity']} worker slots busy"
+
+    def run_due_probes(self):
+        now = time.time()
+        for probe in self.probes:
+            if probe.next_run <= now:
+                probe.run()
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            self.run_due_probes()
+            next_run = min(probe.next_run for probe in self.probes)
+            self._stopping.wait(max(0.5, next_run - time.time()))
+
+    def ensure_started(self):
+        """Start the background probe thread once per process"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    # Environment and queue checks are cheap; have them ready for the first request
+                    for probe in self.probes:
+                        if probe.name in ('environment', 'job_store'):
+                            probe.run()
+                    self._thread = threading.Thread(target=self._loop, name="health-monitor", daemon=True)
+                    self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+
+    def checks(self):
+        return {probe.name: probe.result for probe in self.probes}
+
+    def environment(self):
+        """Cached (ok, message) of the environment variable check"""
+        result = self.ensure_started().checks()['environment']
+        return bool(result['ok']), result['detail']
+
+    def readiness(self):
+        """Return (ready, report) from the cached probe results"""
+        checks = self.ensure_started().checks()
+        reasons = [
+            f"{name}: {result['detail']}"
+            for name, result in checks.items()
+            if result['required'] and result['ok'] is False
+        ]
+
+        depth = self.queue['depth'] or 0
+        workers = self.queue['workers'] or {'live': 0, 'capacity': 0, 'busy': 0, 'saturation': 1.0}
+        free_slots = max(0, workers['capacity'] - workers['busy'])
+        if workers['live'] == 0:
+            reasons.append("no live workers")
+        elif depth > self.max_queue_per_slot * max(1, free_slots):
+            reasons.append(f"queue depth {depth} exceeds {self.max_queue_per_slot:g} per free worker slot")
+
+        return not reasons, {
+            'status': 'ready' if not reasons else 'not_ready',
+            'reasons': reasons,
+            'queue_depth': depth,
+            'workers': workers,
+            'checks': checks,
+        }
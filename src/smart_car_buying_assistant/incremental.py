@@ -0,0 +1,101 @@
+"""
+Incremental re-runs of a session whose inputs were only partly edited.
+
+Each task reads some of the form inputs through the ``{placeholders}`` in its
+own description and in its agent's role, goal and backstory, plus the output
+of the tasks listed in its ``context``.  A follow-up submission linked to a
+completed session reruns only the tasks whose inputs changed and the tasks
+downstream of them; every other task keeps its stored output.
+"""
+
+import os
+import re
+
+import yaml
+from crewai.tasks.task_output import TaskOutput
+
+from smart_car_buying_assistant.conditions import tasks_to_run
+from smart_car_buying_assistant.search_planner import SEARCH_CONTEXT_SOURCES
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), 'config')
+
+# Same pattern crewai uses when it interpolates inputs
+PLACEHOLDER_PATTERN = re.compile(r'\{([A-Za-z_][A-Za-z0-9_\-]*)\}')
+
+TASK_TEXT_FIELDS = ('description', 'expected_output')
+AGENT_TEXT_FIELDS = ('role', 'goal', 'backstory')
+
+
+def _placeholders(config, fields):
+    return {
+        name
+        for field in fields
+        for name in PLACEHOLDER_PATTERN.findall(str((config or {}).get(field) or ''))
+    }
+
+
+def load_task_dependencies(config_dir=CONFIG_DIR):
+    """Map each task, in execution order, to the form inputs it reads and the tasks it builds on"""
+    with open(os.path.join(config_dir, 'agents.yaml'), 'r', encoding='utf-8') as f:
+        agents = yaml.safe_load(f) or {}
+    with open(os.path.join(config_dir, 'tasks.yaml'), 'r', encoding='utf-8') as f:
+        tasks = yaml.safe_load(f) or {}
+
+    dependencies = {}
+    for name, task in tasks.items():
+        used = _placeholders(task, TASK_TEXT_FIELDS) | _placeholders(agents.get(task.get('agent')), AGENT_TEXT_FIELDS)
+        inputs = set()
+        for placeholder in used:
+            # Pre-fetched search results are derived from the form inputs they were planned from
+            inputs.update(SEARCH_CONTEXT_SOURCES.get(placeholder, (placeholder,)))
+        # Without an explicit context a sequential task sees every earlier output
+        context = task['context'] if 'context' in task else list(dependencies)
+        dependencies[name] = {'inputs': inputs, 'context': list(context or [])}
+    return dependencies
+
+
+def changed_inputs(previous, current):
+    """Names of the inputs whose values differ, ignoring case and whitespace"""
+    def normalize(value):
+        return ' '.join(str(value or '').lower().split())
+    return {name for name in set(previous) | set(current) if normalize(previous.get(name)) != normalize(current.get(name))}
+
+
+def invalidated_tasks(dependencies, changed, forced=()):
+    """Tasks that read a changed input or build on an invalidated task, in execution order"""
+    stale = []
+    for name, dependency in dependencies.items():
+        if name in forced or dependency['inputs'] & changed or any(task in stale for task in dependency['context']):
+            stale.append(name)
+    return stale
+
+
+def plan_rerun(previous_job, inputs, dependencies=None):
+    """Return (reused outputs by task name, tasks to rerun) for a follow-up of ``previous_job``"""
+    dependencies = dependencies or load_task_dependencies()
+    stored = (previous_job or {}).get('task_outputs') or {}
+    if not previous_job or previous_job.get('status') != 'completed' or not stored:
+        return {}, list(dependencies)
+
+    changed = changed_inputs(previous_job.get('payload') or {}, inputs)
+    # Tasks whose output was not stored have to run again as well
+    missing = [name for name in dependencies if name not in stored]
+    stale = invalidated_tasks(dependencies, changed, forced=missing)
+    reused = {name: stored[name] for name in dependencies if name not in stale}
+    return reused, stale
+
+
+def apply_reuse(crew, reused):
+    """Restore the reused task outputs on the crew and keep only the tasks that have to run"""
+    for task in crew.tasks:
+        if task.name in reused:
+            # Tasks that run read their context from these outputs
+            task.output = TaskOutput(
+                description=task.description,
+                name=task.name,
+                expected_output=task.expected_output,
+                raw=reused[task.name],
+                agent=task.agent.role if task.agent else '',
+            )
+    crew.tasks = tasks_to_run(crew.tasks, reused)
+    return crew
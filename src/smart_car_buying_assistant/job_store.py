@@ -0,0 +1,1010 @@
+"""
+Durable job queue and status store shared by the web tier and crew workers.
+
+The web process only enqueues jobs and reads their status; one or more worker
+processes (``smart_car_buying_assistant.worker``) claim queued jobs, run the
+crew and write progress back.  SQLite is the default backend; a Redis backend
+is available for multi-node deployments (any server or in-process stand-in
+that speaks the Redis commands used below will do).
+
+Select the backend with ``JOB_STORE_URL``:
+
+    sqlite:///jobs.db            (default, path relative to the working dir)
+    sqlite:////var/lib/scba.db   (absolute path)
+    redis://localhost:6379/0
+    memory://                    (single process only, e.g. tests and embedded workers)
+
+Queued jobs have a priority class.  Workers take ``interactive`` jobs (the web
+form) before ``batch`` jobs (API integrations), except that a batch job that
+has waited ``promote_after`` seconds goes first, so batch work keeps moving.
+At most one in every ``promote_every`` claims takes a promoted job, so a
+backlog of long-waiting batch jobs cannot starve interactive jobs.  Within a
+class, and among promoted jobs, clients take turns in proportion to their
+weight (start-time fair queuing), so one client posting hundreds of jobs
+delays only its own.
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from smart_car_buying_assistant.sessions import SessionRegistry
+
+DEFAULT_JOB_STORE_URL = 'sqlite:///jobs.db'
+
+# Seconds without a heartbeat before a running job is considered abandoned
+DEFAULT_LEASE_TIMEOUT = 120
+# How many times an abandoned job is requeued before it is marked as failed
+DEFAULT_MAX_ATTEMPTS = 3
+# Priority classes, served in this order
+PRIORITY_CLASSES = ('interactive', 'batch')
+# Seconds a batch job waits before it is served ahead of interactive jobs
+DEFAULT_PROMOTE_AFTER = 900
+# At most one in every this many claims takes a promoted batch job
+DEFAULT_PROMOTE_EVERY = 4
+# Queue wait statistics cover the jobs started within this many seconds
+QUEUE_STATS_WINDOW = 3600
+# Queue waits kept per priority class by the Redis backend
+QUEUE_WAIT_SAMPLES = 1000
+
+# Fields exposed to API clients through /status
+STATUS_FIELDS = ('status', 'progress', 'current_task', 'results', 'error', 'usage')
+# Fields workers may change after a job has been queued
+UPDATABLE_FIELDS = frozenset(STATUS_FIELDS) | {'sections', 'task_outputs', 'trace', 'stream', 'page'}
+# Fields read by /stream/<session_id> while a job runs (``stream`` holds the live report sections)
+LIVE_FIELDS = ('status', 'progress', 'current_task', 'error', 'stream')
+# Per-session usage counters summed into the store-wide totals
+USAGE_TOTAL_FIELDS = ('calls', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost_usd')
+# Fields stored as JSON text by the SQLite and Redis backends
+JSON_FIELDS = ('sections', 'task_outputs', 'trace', 'usage', 'stream', 'page')
+
+
+class JobStoreError(Exception):
+    """Raised when the job store cannot complete an operation"""
+
+
+def fair_tags(clock, last_finish, weight):
+    """Start and finish tags of a client's next job in its class (start-time fair queuing)
+
+    A job starts at the class's virtual clock, or after the client's previous
+    job if that finishes later; each job takes ``1 / weight`` of virtual time.
+    """
+    start = max(clock or 0.0, last_finish or 0.0)
+    return start, start + 1.0 / max(float(weight), 0.01)
+
+
+class JobStore:
+    """Interface shared by all job store backends"""
+
+    def enqueue(self, job_id, payload, priority='interactive', client=None, weight=1.0):
+        """Add a new job to the queue for ``client`` (with its fair-share weight) and return its id"""
+        raise NotImplementedError
+
+    def claim(self, worker_id, promote_after=DEFAULT_PROMOTE_AFTER, promote_every=DEFAULT_PROMOTE_EVERY):
+        """Atomically take the next queued job in scheduling order, or return None if the queue is empty"""
+        raise NotImplementedError
+
+    def update(self, job_id, **fields):
+        """Update status fields of a job in a single atomic write"""
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """Return a copy of the job record, or None if it does not exist"""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id, worker_id):
+        """Extend the lease of a running job"""
+        raise NotImplementedError
+
+    def requeue_stale(self, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Return abandoned running jobs to the queue and return how many were recovered"""
+        raise NotImplementedError
+
+    def release(self, job_id):
+        """Put a claimed job back on the queue (used when a worker drains)"""
+        raise NotImplementedError
+
+    def depth(self):
+        """Number of jobs waiting in the queue"""
+        raise NotImplementedError
+
+    def queue_stats(self, window=QUEUE_STATS_WINDOW):
+        """Queued jobs and the queue waits of jobs started within ``window`` seconds, per priority class"""
+        waits = {priority: [] for priority in PRIORITY_CLASSES}
+        for priority, wait in self._queue_waits(time.time() - window):
+            waits.setdefault(priority, []).append(wait)
+        depths = self._depth_by_class()
+        stats = {}
+        for priority, values in waits.items():
+            values.sort()
+            stats[priority] = {
+                'queued': depths.get(priority, 0),
+                'started': len(values),
+                'avg_wait_seconds': round(sum(values) / len(values), 3) if values else None,
+                'p95_wait_seconds': round(values[int(round(0.95 * (len(values) - 1)))], 3) if values else None,
+                'max_wait_seconds': round(values[-1], 3) if values else None,
+            }
+        return stats
+
+    def _queue_waits(self, since):
+        """(priority class, seconds queued) of the jobs first started since ``since``"""
+        raise NotImplementedError
+
+    def _depth_by_class(self):
+        """Number of queued jobs per priority class"""
+        raise NotImplementedError
+
+    def record_worker(self, worker_id, capacity, busy):
+        """Publish how many job slots a worker has and how many are in use"""
+        raise NotImplementedError
+
+    def remove_worker(self, worker_id):
+        """Forget a worker that has shut down"""
+        raise NotImplementedError
+
+    def worker_stats(self, max_age=DEFAULT_LEASE_TIMEOUT):
+        """Aggregate capacity of the workers seen within ``max_age`` seconds"""
+        live = [w for w in self._workers() if w['seen_at'] >= time.time() - max_age]
+        capacity = sum(w['capacity'] for w in live)
+        busy = sum(w['busy'] for w in live)
+        return {
+            'live': len(live),
+            'capacity': capacity,
+            'busy': busy,
+            'saturation': round(busy / capacity, 3) if capacity else 1.0,
+        }
+
+    def _workers(self):
+        """Return every recorded worker as dicts with capacity, busy and seen_at"""
+        raise NotImplementedError
+
+    def add_usage(self, counters):
+        """Add ``{name: amount}`` to the process-independent usage totals"""
+        raise NotImplementedError
+
+    def usage_totals(self):
+        """Return the usage totals as ``{name: amount}``"""
+        raise NotImplementedError
+
+    def record_session_usage(self, usage):
+        """Add a finished session's usage snapshot to the totals"""
+        counters = {'sessions': 1, 'budget_exceeded': 1 if usage['budget']['exceeded'] else 0}
+        for name in USAGE_TOTAL_FIELDS:
+            counters[name] = usage[name]
+            for model, model_usage in usage['by_model'].items():
+                counters[f"model:{model}:{name}"] = model_usage[name]
+            for agent, agent_usage in usage.get('by_agent', {}).items():
+                counters[f"agent:{agent}:{name}"] = agent_usage[name]
+        self.add_usage(counters)
+
+    def _check_priority(self, priority):
+        if priority not in PRIORITY_CLASSES:
+            raise JobStoreError(f"Unknown priority class: {priority}")
+
+    def get_status(self, job_id):
+        """Return the public status view of a job, or None if it does not exist"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return {field: job.get(field) for field in STATUS_FIELDS}
+
+    def get_live(self, job_id):
+        """Return the status and live report sections of a job, or None if it does not exist"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return {field: job.get(field) for field in LIVE_FIELDS}
+
+    def complete(self, job_id, results, sections=None, task_outputs=None, page=None):
+        """Mark a job as finished and store its results (and optional report sections, task outputs and rendered page)"""
+        self.update(
+            job_id,
+            status='completed',
+            progress=100,
+            current_task='Analysis complete!',
+            results=results,
+            sections=sections,
+            task_outputs=task_outputs,
+            page=page,
+            stream=None,
+        )
+
+    def fail(self, job_id, error):
+        """Mark a job as failed"""
+        self.update(
+            job_id,
+            status='error',
+            error=str(error),
+            current_task=f'Error: {error}',
+        )
+
+
+class MemoryJobStore(JobStore):
+    """Non-durable job store for a single process, backed by a SessionRegistry"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or SessionRegistry()
+        self._queues = {priority: [] for priority in PRIORITY_CLASSES}  # heaps of (fair tag, created_at, id)
+        self._clocks = {}
+        self._finish = {}
+        self._since_promotion = float('inf')
+        self._queue_lock = threading.Lock()
+        self._worker_records = {}
+        self._usage = {}
+
+    def enqueue(self, job_id, payload, priority='interactive', client=None, weight=1.0):
+        self._check_priority(priority)
+        now = time.time()
+        with self._queue_lock:
+            tag, self._finish[(priority, client)] = fair_tags(self._clocks.get(priority),
+                                                              self._finish.get((priority, client)), weight)
+        created = self.registry.create(job_id, {
+            'id': job_id,
+            'status': 'queued',
+            'progress': 0,
+            'current_task': 'Waiting for an available worker...',
+            'payload': payload,
+            'priority': priority,
+            'client': client,
+            'fair_tag': tag,
+            'results': None,
+            'sections': None,
+            'task_outputs': None,
+            'trace': None,
+            'usage': None,
+            'stream': None,
+            'page': None,
+            'error': None,
+            'worker_id': None,
+            'attempts': 0,
+            'created_at': now,
+            'started_at': None,
+            'updated_at': now,
+            'heartbeat_at': None,
+        })
+        if not created:
+            raise JobStoreError(f"Job {job_id} already exists")
+        with self._queue_lock:
+            heapq.heappush(self._queues[priority], (tag, now, job_id))
+        return job_id
+
+    def _pop(self, promote_after, promote_every):
+        batch = self._queues['batch']
+        if batch and self._since_promotion >= promote_every - 1:
+            cutoff = time.time() - promote_after
+            waited = [entry for entry in batch if entry[1] < cutoff]
+            if waited:
+                # The long-waiting job that is next in fair-share order
+                entry = min(waited)
+                batch.remove(entry)
+                heapq.heapify(batch)
+                self._since_promotion = 0
+                return 'batch', entry
+        self._since_promotion += 1
+        for priority in PRIORITY_CLASSES:
+            if self._queues[priority]:
+                return priority, heapq.heappop(self._queues[priority])
+        return None, None
+
+    def claim(self, worker_id, promote_after=DEFAULT_PROMOTE_AFTER, promote_every=DEFAULT_PROMOTE_EVERY):
+        with self._queue_lock:
+            priority, entry = self._pop(promote_after, promote_every)
+            if entry is None:
+                return None
+            tag, _, job_id = entry
+            self._clocks[priority] = max(tag, self._clocks.get(priority) or 0.0)
+        now = time.time()
+
+        def start(job):
+            job.update(status='running', worker_id=worker_id, started_at=now,
+                       updated_at=now, heartbeat_at=now)
+            job['attempts'] += 1
+
+        self.registry.mutate(job_id, start)
+        return self.registry.get(job_id)
+
+    def update(self, job_id, **fields):
+        unknown = set(fields) - UPDATABLE_FIELDS
+        if unknown:
+            raise JobStoreError(f"Cannot update job fields: {', '.join(sorted(unknown))}")
+        if fields:
+            self.registry.update(job_id, updated_at=time.time(), **fields)
+
+    def get(self, job_id):
+        return self.registry.get(job_id)
+
+    def heartbeat(self, job_id, worker_id):
+        self.registry.mutate(
+            job_id,
+            lambda job: job.update(heartbeat_at=time.time()) if job['worker_id'] == worker_id else None,
+        )
+
+    def requeue_stale(self, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        cutoff = time.time() - lease_timeout
+        requeued = 0
+        for job_id, job in self.registry.items():
+            if job['status'] != 'running' or (job['heartbeat_at'] or 0) >= cutoff:
+                continue
+            if job['attempts'] >= max_attempts:
+                self.fail(job_id, 'Job abandoned by worker too many times')
+            else:
+                self.release(job_id)
+                requeued += 1
+        return requeued
+
+    def release(self, job_id):
+        released = []
+
+        def requeue(job):
+            if job['status'] == 'running':
+                job.update(status='queued', worker_id=None, progress=0,
+                           current_task='Waiting for an available worker...', updated_at=time.time())
+                released.append(job_id)
+
+        self.registry.mutate(job_id, requeue)
+        if released:
+            job = self.registry.get(job_id)
+            with self._queue_lock:
+                # Keeps its fair tag, so it goes back to the front of its class
+                heapq.heappush(self._queues[job['priority']], (job['fair_tag'], job['created_at'], job_id))
+
+    def depth(self):
+        with self._queue_lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _depth_by_class(self):
+        with self._queue_lock:
+            return {priority: len(queue) for priority, queue in self._queues.items()}
+
+    def _queue_waits(self, since):
+        return [(job['priority'], job['started_at'] - job['created_at']) for _, job in self.registry.items()
+                if job['attempts'] == 1 and (job['started_at'] or 0) >= since]
+
+    def record_worker(self, worker_id, capacity, busy):
+        self._worker_records[worker_id] = {'capacity': capacity, 'busy': busy, 'seen_at': time.time()}
+
+    def remove_worker(self, worker_id):
+        self._worker_records.pop(worker_id, None)
+
+    def _workers(self):
+        return list(self._worker_records.copy().values())
+
+    def add_usage(self, counters):
+        with self._queue_lock:
+            for name, amount in counters.items():
+                self._usage[name] = self._usage.get(name, 0) + amount
+
+    def usage_totals(self):
+        with self._queue_lock:
+            return dict(self._usage)
+
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a single SQLite database file (WAL mode)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                current_task TEXT,
+                payload TEXT NOT NULL,
+                priority TEXT NOT NULL DEFAULT 'interactive',
+                client TEXT,
+                fair_tag REAL NOT NULL DEFAULT 0,
+                results TEXT,
+                sections TEXT,
+                task_outputs TEXT,
+                trace TEXT,
+                usage TEXT,
+                stream TEXT,
+                page TEXT,
+                error TEXT,
+                worker_id TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                updated_at REAL NOT NULL,
+                heartbeat_at REAL
+            )
+            """
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at)')
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                capacity INTEGER NOT NULL,
+                busy INTEGER NOT NULL,
+                seen_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage_totals (
+                name TEXT PRIMARY KEY,
+                amount REAL NOT NULL
+            )
+            """
+        )
+        # Virtual clock of each priority class and finish tag of each client's latest job
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fair_queue (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            )
+            """
+        )
+        self._add_missing_columns(conn, {field: 'TEXT' for field in JSON_FIELDS})
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_fair_queue ON jobs (status, priority, fair_tag)')
+
+    def _add_missing_columns(self, conn, columns):
+        """Upgrade databases created by older versions of the schema"""
+        existing = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        for name, column_type in columns.items():
+            if name not in existing:
+                conn.execute(f'ALTER TABLE jobs ADD COLUMN {name} {column_type}')
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job['payload'] else {}
+        for field in JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job.get(field) else None
+        return job
+
+    def _fair_value(self, conn, name):
+        row = conn.execute('SELECT value FROM fair_queue WHERE name = ?', (name,)).fetchone()
+        return row['value'] if row else None
+
+    def enqueue(self, job_id, payload, priority='interactive', client=None, weight=1.0):
+        self._check_priority(priority)
+        conn = self._connect()
+        now = time.time()
+        finish_key = f"finish:{priority}:{client}"
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tag, finish = fair_tags(self._fair_value(conn, f"clock:{priority}"),
+                                    self._fair_value(conn, finish_key), weight)
+            conn.execute(
+                """
+                INSERT INTO jobs (id, status, progress, current_task, payload, priority, client, fair_tag,
+                                  created_at, updated_at)
+                VALUES (?, 'queued', 0, 'Waiting for an available worker...', ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, json.dumps(payload), priority, client, tag, now, now),
+            )
+            conn.execute('INSERT OR REPLACE INTO fair_queue (name, value) VALUES (?, ?)', (finish_key, finish))
+            conn.execute('COMMIT')
+        except sqlite3.IntegrityError as e:
+            conn.execute('ROLLBACK')
+            raise JobStoreError(f"Job {job_id} already exists") from e
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return job_id
+
+    def claim(self, worker_id, promote_after=DEFAULT_PROMOTE_AFTER, promote_every=DEFAULT_PROMOTE_EVERY):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            since_promotion = self._fair_value(conn, 'since_promotion')
+            since_promotion = promote_every if since_promotion is None else since_promotion
+            row = None
+            if since_promotion >= promote_every - 1:
+                row = conn.execute(
+                    """
+                    SELECT id, priority, fair_tag FROM jobs
+                    WHERE status = 'queued' AND priority = 'batch' AND created_at < ?
+                    ORDER BY fair_tag, created_at LIMIT 1
+                    """,
+                    (now - promote_after,),
+                ).fetchone()
+            promoted = row is not None
+            row = row or conn.execute(
+                """
+                SELECT id, priority, fair_tag FROM jobs WHERE status = 'queued'
+                ORDER BY CASE priority WHEN 'interactive' THEN 0 ELSE 1 END, fair_tag, created_at LIMIT 1
+                """
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute('INSERT OR REPLACE INTO fair_queue (name, value) VALUES (?, ?)',
+                         ('since_promotion', 0 if promoted else since_promotion + 1))
+            conn.execute(
+                'INSERT INTO fair_queue (name, value) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET value = max(value, excluded.value)',
+                (f"clock:{row['priority']}", row['fair_tag']),
+            )
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1,
+                       started_at = ?, updated_at = ?, heartbeat_at = ?
+                WHERE id = ?
+                """,
+                (worker_id, now, now, now, row['id']),
+            )
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self._row_to_job(job)
+
+    def update(self, job_id, **fields):
+        unknown = set(fields) - UPDATABLE_FIELDS
+        if unknown:
+            raise JobStoreError(f"Cannot update job fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        fields = {
+            name: json.dumps(value) if name in JSON_FIELDS and value is not None else value
+            for name, value in fields.items()
+        }
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        values = list(fields.values()) + [time.time(), job_id]
+        self._connect().execute(
+            f'UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?', values
+        )
+
+    def get(self, job_id):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def get_live(self, job_id):
+        # Polled several times a second per viewer; leave the trace and results unread
+        row = self._connect().execute(
+            f"SELECT {', '.join(LIVE_FIELDS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        live = dict(row)
+        live['stream'] = json.loads(live['stream']) if live['stream'] else None
+        return live
+
+    def heartbeat(self, job_id, worker_id):
+        self._connect().execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (time.time(), job_id, worker_id),
+        )
+
+    def requeue_stale(self, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        conn = self._connect()
+        cutoff = time.time() - lease_timeout
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            failed = conn.execute(
+                """
+                UPDATE jobs SET status = 'error', error = 'Job abandoned by worker too many times',
+                       current_task = 'Error: Job abandoned by worker too many times', updated_at = ?
+                WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?
+                """,
+                (time.time(), cutoff, max_attempts),
+            ).rowcount
+            requeued = conn.execute(
+                """
+                UPDATE jobs SET status = 'queued', worker_id = NULL, progress = 0,
+                       current_task = 'Waiting for an available worker...', updated_at = ?
+                WHERE status = 'running' AND heartbeat_at < ?
+                """,
+                (time.time(), cutoff),
+            ).rowcount
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if failed:
+            print(f"⚠️  Marked {failed} abandoned job(s) as failed")
+        return requeued
+
+    def release(self, job_id):
+        self._connect().execute(
+            """
+            UPDATE jobs SET status = 'queued', worker_id = NULL, progress = 0,
+                   current_task = 'Waiting for an available worker...', updated_at = ?
+            WHERE id = ? AND status = 'running'
+            """,
+            (time.time(), job_id),
+        )
+
+    def depth(self):
+        row = self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def _depth_by_class(self):
+        rows = self._connect().execute(
+            "SELECT priority, COUNT(*) AS queued FROM jobs WHERE status = 'queued' GROUP BY priority"
+        )
+        return {row['priority']: row['queued'] for row in rows}
+
+    def _queue_waits(self, since):
+        rows = self._connect().execute(
+            'SELECT priority, started_at - created_at AS wait FROM jobs WHERE attempts = 1 AND started_at >= ?',
+            (since,),
+        )
+        return [(row['priority'], row['wait']) for row in rows]
+
+    def record_worker(self, worker_id, capacity, busy):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO workers (id, capacity, busy, seen_at) VALUES (?, ?, ?, ?)',
+            (worker_id, capacity, busy, time.time()),
+        )
+
+    def remove_worker(self, worker_id):
+        self._connect().execute('DELETE FROM workers WHERE id = ?', (worker_id,))
+
+    def _workers(self):
+        return [dict(row) for row in self._connect().execute('SELECT capacity, busy, seen_at FROM workers')]
+
+    def add_usage(self, counters):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO usage_totals (name, amount) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET amount = amount + excluded.amount',
+                list(counters.items()),
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def usage_totals(self):
+        return {row['name']: row['amount'] for row in self._connect().execute('SELECT name, amount FROM usage_totals')}
+
+
+class RedisJobStore(JobStore):
+    """Job store backed by Redis (or any server/client implementing the same commands)
+
+    Jobs are kept in hashes, each priority class is a sorted set scored by
+    fair tag, and each worker has its own processing list so that claimed jobs
+    survive a worker crash.  A job moves between its queue and a processing
+    list in one WATCH/MULTI transaction, so it is always on exactly one of them.
+    """
+
+    def __init__(self, url=None, client=None, prefix='scba'):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise JobStoreError("The redis package is required for redis:// job stores") from e
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def _decode(self, value):
+        if isinstance(value, bytes):
+            return value.decode('utf-8')
+        return value
+
+    def _push(self, job_id, priority, tag, created_at, pipe=None):
+        execute = pipe is None
+        if execute:
+            pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(self._key('queue', priority), {job_id: tag})
+        if priority == 'batch':
+            pipe.zadd(self._key('queue_age', priority), {job_id: created_at})
+        if execute:
+            pipe.execute()
+
+    def enqueue(self, job_id, payload, priority='interactive', client=None, weight=1.0):
+        from redis.exceptions import WatchError
+
+        self._check_priority(priority)
+        key = self._key('job', job_id)
+        finish_key = f"finish:{priority}:{client}"
+        # The job hash, the client's finish tag and the queue entry are written in one
+        # MULTI, retried if the job or the fair-queue state changed since they were read
+        with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(key, self._key('fair'))
+                    if pipe.exists(key):
+                        raise JobStoreError(f"Job {job_id} already exists")
+                    clock, last_finish = pipe.hmget(self._key('fair'), [f"clock:{priority}", finish_key])
+                    tag, finish = fair_tags(float(self._decode(clock)) if clock is not None else None,
+                                            float(self._decode(last_finish)) if last_finish is not None else None,
+                                            weight)
+                    now = time.time()
+                    pipe.multi()
+                    pipe.hset(key, mapping={
+                        'id': job_id,
+                        'status': 'queued',
+                        'progress': 0,
+                        'current_task': 'Waiting for an available worker...',
+                        'payload': json.dumps(payload),
+                        'priority': priority,
+                        'client': client or '',
+                        'fair_tag': tag,
+                        'attempts': 0,
+                        'created_at': now,
+                        'updated_at': now,
+                    })
+                    pipe.hset(self._key('fair'), finish_key, finish)
+                    self._push(job_id, priority, tag, now, pipe)
+                    pipe.execute()
+                    return job_id
+                except WatchError:
+                    continue
+
+    def _next_job(self, pipe, promote_after, promote_every):
+        """Read the next job in scheduling order through a watching pipeline
+
+        Returns (job id, priority class, fair tag, promoted, since_promotion),
+        or None when every queue is empty.
+        """
+        since_promotion = pipe.hget(self._key('fair'), 'since_promotion')
+        since_promotion = promote_every if since_promotion is None else float(self._decode(since_promotion))
+        if since_promotion >= promote_every - 1:
+            waited = pipe.zrangebyscore(self._key('queue_age', 'batch'), '-inf', time.time() - promote_after)
+            tags = [(pipe.zscore(self._key('queue', 'batch'), job_id), self._decode(job_id)) for job_id in waited]
+            tags = [(float(tag), job_id) for tag, job_id in tags if tag is not None]
+            if tags:
+                # The long-waiting job that is next in fair-share order
+                tag, job_id = min(tags)
+                return job_id, 'batch', tag, True, since_promotion
+        for priority in PRIORITY_CLASSES:
+            head = pipe.zrange(self._key('queue', priority), 0, 0, withscores=True)
+            if head:
+                return self._decode(head[0][0]), priority, float(head[0][1]), False, since_promotion
+        return None
+
+    def claim(self, worker_id, promote_after=DEFAULT_PROMOTE_AFTER, promote_every=DEFAULT_PROMOTE_EVERY):
+        from redis.exceptions import WatchError
+
+        queues = [self._key('queue', priority) for priority in PRIORITY_CLASSES]
+        # Taking the job off its queue, putting it on the worker's processing list and
+        # moving the fair-queue state happen in one MULTI, so a worker that dies
+        # mid-claim leaves the job queued, and two workers never take the same job
+        with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(*queues, self._key('queue_age', 'batch'), self._key('fair'))
+                    picked = self._next_job(pipe, promote_after, promote_every)
+                    if picked is None:
+                        return None
+                    job_id, priority, tag, promoted, since_promotion = picked
+                    clock = pipe.hget(self._key('fair'), f"clock:{priority}")
+                    clock = float(self._decode(clock)) if clock is not None else 0.0
+                    now = time.time()
+                    key = self._key('job', job_id)
+                    pipe.multi()
+                    pipe.zrem(self._key('queue', priority), job_id)
+                    if priority == 'batch':
+                        pipe.zrem(self._key('queue_age', priority), job_id)
+                    pipe.lpush(self._key('processing', worker_id), job_id)
+                    pipe.hset(key, mapping={
+                        'status': 'running',
+                        'worker_id': worker_id,
+                        'started_at': now,
+                        'updated_at': now,
+                        'heartbeat_at': now,
+                    })
+                    pipe.hincrby(key, 'attempts', 1)
+                    pipe.hset(self._key('fair'), mapping={
+                        'since_promotion': 0 if promoted else since_promotion + 1,
+                        f"clock:{priority}": max(clock, tag),
+                    })
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue
+        job = self.get(job_id)
+        if job['attempts'] == 1:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.lpush(self._key('queue_waits', priority), json.dumps([now, now - job['created_at']]))
+            pipe.ltrim(self._key('queue_waits', priority), 0, QUEUE_WAIT_SAMPLES - 1)
+            pipe.execute()
+        return job
+
+    def update(self, job_id, **fields):
+        unknown = set(fields) - UPDATABLE_FIELDS
+        if unknown:
+            raise JobStoreError(f"Cannot update job fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        mapping = {
+            name: json.dumps(value) if name in JSON_FIELDS and value is not None else ('' if value is None else value)
+            for name, value in fields.items()
+        }
+        mapping['updated_at'] = time.time()
+        self.client.hset(self._key('job', job_id), mapping=mapping)
+        if fields.get('status') in ('completed', 'error'):
+            job = self.get(job_id)
+            if job and job.get('worker_id'):
+                self.client.lrem(self._key('processing', job['worker_id']), 0, job_id)
+
+    def get(self, job_id):
+        return self._parse_job(self.client.hgetall(self._key('job', job_id)))
+
+    def _parse_job(self, raw):
+        if not raw:
+            return None
+        job = {self._decode(k): self._decode(v) for k, v in raw.items()}
+        job['payload'] = json.loads(job['payload']) if job.get('payload') else {}
+        for field in JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job.get(field) else None
+        for field in ('progress', 'attempts'):
+            job[field] = int(float(job.get(field) or 0))
+        job['fair_tag'] = float(job['fair_tag'])
+        for field in ('created_at', 'started_at', 'updated_at', 'heartbeat_at'):
+            job[field] = float(job[field]) if job.get(field) else None
+        for field in ('current_task', 'results', 'error', 'worker_id', 'client'):
+            job[field] = job.get(field) or None
+        return job
+
+    def get_live(self, job_id):
+        values = self.client.hmget(self._key('job', job_id), list(LIVE_FIELDS))
+        live = dict(zip(LIVE_FIELDS, (self._decode(value) for value in values)))
+        if live['status'] is None:
+            return None
+        live['stream'] = json.loads(live['stream']) if live['stream'] else None
+        live['progress'] = int(float(live['progress'] or 0))
+        for field in ('current_task', 'error'):
+            live[field] = live[field] or None
+        return live
+
+    def heartbeat(self, job_id, worker_id):
+        from redis.exceptions import WatchError
+
+        key = self._key('job', job_id)
+        with self.client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(key)
+                owner, status = (self._decode(value) for value in pipe.hmget(key, ['worker_id', 'status']))
+                # A requeued or reclaimed job's lease belongs to its new worker
+                if owner != worker_id or status != 'running':
+                    return
+                pipe.multi()
+                pipe.hset(key, 'heartbeat_at', time.time())
+                pipe.execute()
+            except WatchError:
+                # The job changed while we looked; the next heartbeat checks again
+                pass
+
+    def _return_to_queue(self, processing_key, job_id, cutoff=None, max_attempts=None):
+        """Move a running job from a processing list back to its queue in one MULTI
+
+        Jobs whose heartbeat is newer than ``cutoff`` are left alone; jobs that
+        have used ``max_attempts`` are failed instead.  Returns True when the
+        job was requeued.
+        """
+        from redis.exceptions import WatchError
+
+        key = self._key('job', job_id)
+        with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(key, processing_key)
+                    job = self._parse_job(pipe.hgetall(key))
+                    if (job is None or job['status'] != 'running'
+                            or (cutoff is not None and (job['heartbeat_at'] or 0) >= cutoff)):
+                        return False
+                    exhausted = max_attempts is not None and job['attempts'] >= max_attempts
+                    pipe.multi()
+                    pipe.lrem(processing_key, 0, job_id)
+                    if not exhausted:
+                        pipe.hset(key, mapping={
+                            'status': 'queued',
+                            'progress': 0,
+                            'current_task': 'Waiting for an available worker...',
+                            'updated_at': time.time(),
+                        })
+                        self._push(job_id, job['priority'], job['fair_tag'], job['created_at'], pipe)
+                    pipe.execute()
+                    break
+                except WatchError:
+                    continue
+        if exhausted:
+            self.fail(job_id, 'Job abandoned by worker too many times')
+        return not exhausted
+
+    def requeue_stale(self, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        cutoff = time.time() - lease_timeout
+        requeued = 0
+        for processing_key in self.client.scan_iter(match=self._key('processing', '*')):
+            for job_id in self.client.lrange(processing_key, 0, -1):
+                if self._return_to_queue(processing_key, self._decode(job_id), cutoff, max_attempts):
+                    requeued += 1
+        return requeued
+
+    def release(self, job_id):
+        job = self.get(job_id)
+        if job is None or job['status'] != 'running' or not job.get('worker_id'):
+            return
+        self._return_to_queue(self._key('processing', job['worker_id']), job_id)
+
+    def depth(self):
+        return sum(self._depth_by_class().values())
+
+    def _depth_by_class(self):
+        return {priority: self.client.zcard(self._key('queue', priority)) for priority in PRIORITY_CLASSES}
+
+    def _queue_waits(self, since):
+        waits = []
+        for priority in PRIORITY_CLASSES:
+            for sample in self.client.lrange(self._key('queue_waits', priority), 0, -1):
+                started_at, wait = json.loads(self._decode(sample))
+                if started_at >= since:
+                    waits.append((priority, wait))
+        return waits
+
+    def record_worker(self, worker_id, capacity, busy):
+        self.client.hset(self._key('workers'), worker_id, json.dumps(
+            {'capacity': capacity, 'busy': busy, 'seen_at': time.time()}
+        ))
+
+    def remove_worker(self, worker_id):
+        self.client.hdel(self._key('workers'), worker_id)
+
+    def _workers(self):
+        return [json.loads(self._decode(value)) for value in self.client.hvals(self._key('workers'))]
+
+    def add_usage(self, counters):
+        pipe = self.client.pipeline(transaction=True)
+        for name, amount in counters.items():
+            pipe.hincrbyfloat(self._key('usage'), name, amount)
+        pipe.execute()
+
+    def usage_totals(self):
+        return {self._decode(name): float(self._decode(amount))
+                for name, amount in self.client.hgetall(self._key('usage')).items()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_job_store(url=None):
+    """Create a job store for the given URL (defaults to JOB_STORE_URL)"""
+    url = url or os.getenv('JOB_STORE_URL', DEFAULT_JOB_STORE_URL)
+    if url.startswith('sqlite:///'):
+        return SQLiteJobStore(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisJobStore(url)
+    if url.startswith('memory://'):
+        return MemoryJobStore()
+    raise JobStoreError(f"Unsupported job store URL: {url}")
+
+
+def get_job_store():
+    """Return the process-wide job store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_job_store()
+    return _store
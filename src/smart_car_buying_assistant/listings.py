@@ -0,0 +1,128 @@
+"""
+Vehicle listing deduplication.
+
+The same car is often listed on several sites, and Serper and Brave describe
+it with different titles and snippets, so URL matching alone lets it through
+more than once: into the prefetched search results and, from there, into the
+candidate list that valuation and negotiation run once per vehicle.  Two
+texts describe the same listing when they carry the same VIN or, without
+VINs, when their year, make and model match, their trims do not conflict,
+and at least two of price, mileage and location are stated by both and agree
+(with nothing they both state disagreeing).  Year, make, model and price alone
+are not enough: many different cars are listed at the same $19,995.
+"""
+
+import re
+
+KNOWN_MAKES = (
+    'acura', 'audi', 'bmw', 'buick', 'cadillac', 'chevrolet', 'chrysler', 'dodge', 'ford', 'gmc',
+    'honda', 'hyundai', 'infiniti', 'jeep', 'kia', 'lexus', 'lincoln', 'mazda', 'mercedes',
+    'mitsubishi', 'nissan', 'ram', 'subaru', 'tesla', 'toyota', 'volkswagen', 'volvo',
+)
+MAKE_ALIASES = {'chevy': 'chevrolet', 'vw': 'volkswagen', 'mercedes-benz': 'mercedes'}
+# Trim levels, read from the word after the model ("Civic EX", "RAV4 XLE")
+TRIMS = frozenset((
+    'base', 'ce', 'dx', 'ex', 'ex-l', 'exl', 'gl', 'gle', 'gls', 'glx', 'gt', 'l', 'le', 'limited', 'ls', 'lt',
+    'ltz', 'lx', 'lariat', 'platinum', 'premier', 'premium', 'rs', 's', 'se', 'sel', 'si', 'sl', 'sport',
+    'sr', 'sr5', 'ss', 'sv', 'titanium', 'touring', 'trd', 'xle', 'xlt', 'xse',
+))
+
+VIN = re.compile(r'\b(?=[A-HJ-NPR-Z0-9]*\d)(?=[A-HJ-NPR-Z0-9]*[A-HJ-NPR-Z])[A-HJ-NPR-Z0-9]{17}\b')
+YEAR = re.compile(r'\b(19[89]\d|20[0-4]\d)\b')
+MAKE_MODEL = re.compile(
+    r'\b(' + '|'.join(sorted(list(KNOWN_MAKES) + list(MAKE_ALIASES), key=len, reverse=True))
+    + r')\s+([a-z0-9][a-z0-9-]*)(?:\s+([a-z0-9][a-z0-9-]*))?', re.IGNORECASE,
+)
+PRICE = re.compile(r'\$\s?(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s?(k\b)?', re.IGNORECASE)
+MILEAGE = re.compile(r'\b(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s?(k)?\s*(?:miles|mi)\b', re.IGNORECASE)
+LOCATION = re.compile(r'\b([A-Z][a-z]+(?: [A-Z][a-z]+)*),\s*([A-Z]{2})\b')
+
+# Mileages this close are the same odometer reading written differently (45,210 mi / 45K mi)
+MILEAGE_TOLERANCE = 1000
+# Fields besides year, make and model that must agree before two listings without VINs match
+MIN_AGREEING_FIELDS = 2
+
+
+def _number(digits, thousands):
+    value = float(digits.replace(',', ''))
+    return int(round(value * 1000 if thousands else value))
+
+
+def listing_fields(text):
+    """VIN, year, make, model, trim, price, mileage and location stated in a listing text (None when absent)"""
+    text = text or ''
+    vin = VIN.search(text)
+    year = YEAR.search(text)
+    make_model = MAKE_MODEL.search(text)
+    price = PRICE.search(text)
+    mileage = MILEAGE.search(text)
+    location = LOCATION.search(text)
+    make = model = trim = None
+    if make_model:
+        make = make_model.group(1).lower()
+        make = MAKE_ALIASES.get(make, make)
+        model = make_model.group(2).lower().replace('-', '')
+        following = (make_model.group(3) or '').lower()
+        trim = following.replace('-', '') if following in TRIMS else None
+    return {
+        'vin': vin.group(0) if vin else None,
+        'year': int(year.group(1)) if year else None,
+        'make': make,
+        'model': model,
+        'trim': trim,
+        'price': _number(*price.groups()) if price else None,
+        'mileage': _number(*mileage.groups()) if mileage else None,
+        'location': f"{location.group(1).lower()}, {location.group(2)}" if location else None,
+    }
+
+
+def is_listing(fields):
+    """Whether the fields identify a vehicle well enough to compare it with other listings"""
+    return bool(fields['vin']) or bool(fields['year'] and fields['make'] and fields['model']
+                                       and (fields['price'] or fields['mileage']))
+
+
+def same_listing(a, b):
+    """Whether two listings' fields describe the same car"""
+    if a['vin'] and b['vin']:
+        return a['vin'] == b['vin']
+    if not (is_listing(a) and is_listing(b)):
+        return False
+    if (a['year'], a['make'], a['model']) != (b['year'], b['make'], b['model']):
+        return False
+    if a['trim'] and b['trim'] and a['trim'] != b['trim']:
+        return False
+    stated_by_both = [name for name in ('price', 'mileage', 'location') if a[name] and b[name]]
+    if 'price' in stated_by_both and a['price'] != b['price']:
+        return False
+    if 'mileage' in stated_by_both and abs(a['mileage'] - b['mileage']) > MILEAGE_TOLERANCE:
+        return False
+    if 'location' in stated_by_both and a['location'] != b['location']:
+        return False
+    return len(stated_by_both) >= MIN_AGREEING_FIELDS
+
+
+class ListingDeduplicator:
+    """Remembers the listings seen so far and spots repeats of them"""
+
+    def __init__(self):
+        self._seen = []
+
+    def is_duplicate(self, text):
+        """True for a listing already seen; otherwise remember it and return False"""
+        fields = listing_fields(text)
+        if not is_listing(fields):
+            return False
+        if any(same_listing(fields, seen) for seen in self._seen):
+            return True
+        self._seen.append(fields)
+        return False
+
+
+def unique_listings(items):
+    """Items without repeats of the same listing, in order; returns (unique items, removed items)"""
+    deduplicator = ListingDeduplicator()
+    unique, removed = [], []
+    for item in items:
+        (removed if deduplicator.is_duplicate(item) else unique).append(item)
+    return unique, removed
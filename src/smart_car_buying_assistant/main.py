@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys
 from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
+from smart_car_buying_assistant.search_planner import empty_search_context
 
 # This main file is intended to be a way for your to run your
 # crew locally, so refrain from adding unnecessary logic into this file.
@@ -9,29 +10,40 @@ from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
 
 def run():
     """
-    Run the crew.
+    Run the crew, or the command named by the first argument (``smart_car_buying_assistant worker``).
     """
+    # Commands that read their own arguments after the command name
+    commands = {'worker': worker, 'train': train, 'trace_report': trace_report, 'replay_cassette': replay_cassette}
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        return commands[sys.argv[1]]()
     inputs = {
         'user_requirements': 'sample_value',
         'car_type': 'sample_value',
         'budget_range': 'sample_value',
-        'current_state': 'sample_value'
+        'current_state': 'sample_value',
+        **empty_search_context()
     }
     SmartCarBuyingAssistantCrew().crew().kickoff(inputs=inputs)
 
 
 def train():
     """
-    Train the crew for a given number of iterations.
+    Train the crew for a given number of iterations, optionally on several processes.
     """
     inputs = {
         'user_requirements': 'sample_value',
         'car_type': 'sample_value',
         'budget_range': 'sample_value',
-        'current_state': 'sample_value'
+        'current_state': 'sample_value',
+        **empty_search_context()
     }
+    from smart_car_buying_assistant.training import main as training_main
+
+    args = sys.argv[1:]
+    if args and args[0] == "train":
+        args = args[1:]
     try:
-        SmartCarBuyingAssistantCrew().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        training_main(args, inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
@@ -54,7 +66,8 @@ def test():
         'user_requirements': 'sample_value',
         'car_type': 'sample_value',
         'budget_range': 'sample_value',
-        'current_state': 'sample_value'
+        'current_state': 'sample_value',
+        **empty_search_context()
     }
     try:
         SmartCarBuyingAssistantCrew().crew().test(n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
@@ -62,6 +75,39 @@ def test():
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
 
+def worker():
+    """
+    Run a crew worker that executes jobs queued by the web application.
+    """
+    from smart_car_buying_assistant.worker import main as worker_main
+
+    args = sys.argv[1:]
+    if args and args[0] == "worker":
+        args = args[1:]
+    worker_main(args)
+
+def trace_report():
+    """
+    Print critical paths and hotspots from exported session spans.
+    """
+    from smart_car_buying_assistant.trace_report import main as trace_report_main
+
+    args = sys.argv[1:]
+    if args and args[0] == "trace_report":
+        args = args[1:]
+    sys.exit(trace_report_main(args))
+
+def replay_cassette():
+    """
+    Replay a recorded session offline from its cassette.
+    """
+    from smart_car_buying_assistant.cassettes import main as replay_cassette_main
+
+    args = sys.argv[1:]
+    if args and args[0] == "replay_cassette":
+        args = args[1:]
+    sys.exit(replay_cassette_main(args))
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: main.py <command> [<args>]")
@@ -76,6 +122,12 @@ if __name__ == "__main__":
         replay()
     elif command == "test":
         test()
+    elif command == "worker":
+        worker()
+    elif command == "trace_report":
+        trace_report()
+    elif command == "replay_cassette":
+        replay_cassette()
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
@@ -0,0 +1,135 @@
+"""
+Map-over-items task mode: run a task once per candidate vehicle, concurrently.
+
+``evaluate_vehicle_values`` ends its report with one ``Candidate - ...`` line
+per top vehicle.  A ``MapTask`` reads those lines from its context, runs a
+copy of itself for each vehicle (each with its own copy of the agent, so the
+calls don't share executor state) on a bounded thread pool, and merges the
+per-vehicle outputs into one output with a ``### Candidate - ...`` heading
+per vehicle.  The merged headings are candidate lines too, so a MapTask that
+takes another MapTask as context maps over the same vehicles, and each run
+only gets the section about its own vehicle.  Candidates that are the same
+listing written differently (see ``listings``) are run once.  With fewer than
+two candidates the task runs once, as a normal task.
+
+Tunables:
+
+    MAP_MAX_ITEMS         most candidates a task is run for (default 5)
+    MAP_MAX_CONCURRENCY   per-candidate runs in flight at once (default 3)
+"""
+
+import contextvars
+import os
+import re
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+
+from smart_car_buying_assistant.listings import unique_listings
+from smart_car_buying_assistant.spans import get_tracer
+from smart_car_buying_assistant.streaming import label_task, publish_task_output
+from smart_car_buying_assistant.tracing import get_trace_recorder
+from smart_car_buying_assistant.usage import BudgetExceededError
+
+CANDIDATE_LINE = re.compile(
+    r'^[\s#>*-]*(?:top\s+)?candidate(?:\s*#?\d+)?\s*\**\s*[-:]\s*\**\s*(.+?)[\s*]*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def candidate_items(context):
+    """Vehicles listed on ``Candidate - ...`` lines of a task context, in order, without repeats"""
+    return list(dict.fromkeys(match.strip() for match in CANDIDATE_LINE.findall(context or '') if match.strip()))
+
+
+def item_context(context, item):
+    """The section of a merged MapTask output about ``item``, or the whole context"""
+    heading = f"### Candidate - {item}"
+    start = (context or '').find(heading)
+    if start < 0:
+        return context
+    end = context.find('### Candidate - ', start + len(heading))
+    return context[start:end if end >= 0 else None].strip()
+
+
+def merge_item_outputs(results):
+    """Reduce step: one section per item, in item order"""
+    return '\n\n'.join(f"### Candidate - {item}\n\n{raw.strip()}" for item, raw in results)
+
+
+class MapTask(Task):
+    """Task that runs once per item found in its context and merges the results"""
+
+    items_from: Callable[[str], list] | None = None
+    max_items: int | None = None
+    max_concurrency: int | None = None
+
+    def _item_task(self, item, agent):
+        # The vehicle goes last, after the text every run shares (see prompt_layout)
+        return Task(
+            name=self.name,
+            description=self.description,
+            expected_output=(f"{self.expected_output}\n\nFocus only on this vehicle: {item}. "
+                             "The other candidates are covered separately."),
+            agent=agent,
+        )
+
+    def execute_sync(self, agent=None, context=None, tools=None):
+        agent = agent or self.agent
+        max_items = self.max_items or int(os.getenv('MAP_MAX_ITEMS', '5'))
+        items, duplicates = unique_listings((self.items_from or candidate_items)(context))
+        if duplicates:
+            # Each repeat would have been a whole extra run: its prompt is at least the shared task text
+            tokens = sum(len(self.description) + len(self.expected_output) + len(item_context(context, item))
+                         for item in duplicates) // 4
+            print(f"🧹 {self.name}: skipped {len(duplicates)} duplicate candidate(s), ~{tokens} prompt tokens")
+            get_trace_recorder().record('listing_dedup', task=self.name, candidates_removed=len(duplicates),
+                                        prompt_tokens_removed=tokens)
+        items = items[:max_items]
+        if len(items) < 2:
+            return super().execute_sync(agent=agent, context=context, tools=tools)
+
+        workers = min(len(items), self.max_concurrency or int(os.getenv('MAP_MAX_CONCURRENCY', '3')))
+        print(f"🔀 Running {self.name} for {len(items)} candidates, {workers} at a time")
+
+        def run_item(item):
+            item_agent = agent.copy()
+            # copy() turns the crew reference into a plain dict
+            item_agent.crew = agent.crew
+            task = self._item_task(item, item_agent)
+            label_task(task, f"Candidate - {item}")
+            return task.execute_sync(context=item_context(context, item), tools=tools).raw
+
+        with get_tracer().span(self.name, 'map', items=len(items), concurrency=workers), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix='map-task') as pool:
+            # Each run gets its own copy of the session's context (trace, spans, usage)
+            futures = [(item, pool.submit(contextvars.copy_context().run, run_item, item)) for item in items]
+            results, errors = [], []
+            for item, future in futures:
+                try:
+                    results.append((item, future.result()))
+                except Exception as e:
+                    errors.append(e)
+                    results.append((item, f"Could not be generated for this vehicle: {e}"))
+
+        if any(isinstance(e, BudgetExceededError) for e in errors):
+            raise next(e for e in errors if isinstance(e, BudgetExceededError))
+        if len(errors) == len(items):
+            raise errors[0]
+
+        self.output = TaskOutput(
+            name=self.name,
+            description=self.description,
+            expected_output=self.expected_output,
+            raw=merge_item_outputs(results),
+            agent=agent.role,
+        )
+        publish_task_output(self, self.output.raw)
+        return self.output
+
+
+def per_candidate_task(config):
+    """Task run once per top candidate vehicle when the valuation lists several"""
+    return MapTask(config=config)
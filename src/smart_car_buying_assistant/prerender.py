@@ -0,0 +1,196 @@
+"""
+Server-side rendering of finished results pages.
+
+A finished report never changes, so its page is rendered to HTML once, when
+the job completes, and stored with the job: /results/<session_id>/page then
+serves it in one response, without the browser fetching /results and
+building the page itself.  The cards are the ones ``static/js/results.js``
+builds in the browser.  A stored page links to fingerprinted assets, so it is
+rendered again when those have changed since.
+
+Tunables:
+
+    RESULTS_EXPORT_DIR   when set, finished pages are also written to <dir>/<session_id>.html for a static file server
+"""
+
+import os
+import threading
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from smart_car_buying_assistant.assets import get_asset_manifest
+from smart_car_buying_assistant.report import REPORT_SECTIONS, SECTION_TITLES
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'templates')
+
+# (words in a card title, Font Awesome icon), first match wins
+SECTION_ICONS = (
+    (('profile',), 'fas fa-user'),
+    (('top', 'recommended'), 'fas fa-car'),
+    (('detailed reasons',), 'fas fa-list-check'),
+    (('registration',), 'fas fa-id-card'),
+    (('negotiation',), 'fas fa-handshake'),
+    (('inspection',), 'fas fa-tools'),
+    (('recommendations',), 'fas fa-lightbulb'),
+    (('requirement',), 'fas fa-clipboard-list'),
+    (('need',), 'fas fa-clipboard-list'),
+    (('market',), 'fas fa-search'),
+    (('research',), 'fas fa-search'),
+    (('legal',), 'fas fa-gavel'),
+    (('law',), 'fas fa-gavel'),
+    (('value',), 'fas fa-dollar-sign'),
+    (('price',), 'fas fa-dollar-sign'),
+    (('deal',), 'fas fa-handshake'),
+    (('test',), 'fas fa-tools'),
+)
+DEFAULT_ICON = 'fas fa-file-alt'
+
+
+def icon_for_title(title):
+    lower = title.lower()
+    for words, icon in SECTION_ICONS:
+        if all(word in lower for word in words):
+            return icon
+    return DEFAULT_ICON
+
+
+def _is_heading(line):
+    return (':' in line and len(line) < 100 and not line.startswith('-') and '|' not in line
+            and 'Rank' not in line and 'Vehicle Model' not in line)
+
+
+def _starts_table(line):
+    return '|' in line and any(word in line for word in ('Rank', 'Vehicle Model', '------', 'Negotiation'))
+
+
+def parse_results(text):
+    """Split report text into titled cards on ``Heading:`` lines, as the results page script does"""
+    cards = []
+    title, content, in_table, table = None, [], False, []
+
+    def card(body):
+        return {'title': title, 'content': body, 'icon': icon_for_title(title)}
+
+    for line in (text or '').split('\n'):
+        stripped = line.strip()
+        if _is_heading(stripped):
+            if title:
+                if in_table:
+                    if cards:
+                        cards[-1]['content'] += '\n' + '\n'.join(table)
+                    in_table, table = False, []
+                else:
+                    cards.append(card('\n'.join(content).strip()))
+            title, content = stripped, []
+        elif not in_table and _starts_table(stripped):
+            # A separator row inside a table continues it
+            in_table, table = True, [line]
+        elif in_table and '|' in stripped:
+            table.append(line)
+        elif in_table:
+            in_table = False
+            if title:
+                cards.append(card('\n'.join(content).strip() + '\n' + '\n'.join(table)))
+            title, content, table = None, [], []
+        elif stripped:
+            content.append(line)
+
+    if title:
+        body = '\n'.join(content).strip()
+        cards.append(card(body + '\n' + '\n'.join(table) if in_table else body))
+    if not cards:
+        cards.append({'title': 'Complete Analysis', 'content': text, 'icon': DEFAULT_ICON})
+    return cards
+
+
+def _table(rows):
+    cells = [[cell.strip() for cell in row.split('|') if cell.strip()] for row in rows]
+    return {'header': cells[0], 'rows': [row for raw, row in zip(rows[1:], cells[1:]) if '------' not in raw]}
+
+
+def card_body(content):
+    """``{'table': ...}`` for the ranked vehicle tables, ``{'text': ...}`` for everything else"""
+    if not ('|' in content and 'Rank' in content):
+        return {'table': None, 'text': content}
+    rows, in_table, table = [], False, None
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if '|' in stripped and any(word in stripped for word in ('Rank', 'Vehicle Model', '------')):
+            in_table = True
+            rows.append(stripped)
+        elif in_table and '|' in stripped:
+            rows.append(stripped)
+        elif in_table:
+            in_table = False
+            table = _table(rows)
+    if in_table:
+        table = _table(rows)
+    return {'table': table, 'text': None}
+
+
+def report_cards(sections):
+    """Cards of a finished report, in report order"""
+    cards = []
+    for name in REPORT_SECTIONS:
+        content = (sections or {}).get(name)
+        if not content:
+            continue
+        parsed = parse_results(content)
+        if len(parsed) == 1 and parsed[0]['title'] == 'Complete Analysis':
+            parsed[0]['title'] = SECTION_TITLES[name]
+            parsed[0]['icon'] = icon_for_title(parsed[0]['title'])
+        cards.extend({'title': card['title'], 'icon': card['icon'], **card_body(card['content'])} for card in parsed)
+    return cards
+
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def _templates():
+    """Jinja environment for rendering outside a Flask request (workers have no app)"""
+    global _environment
+    if _environment is None:
+        with _environment_lock:
+            if _environment is None:
+                environment = Environment(loader=FileSystemLoader(os.path.abspath(TEMPLATES_DIR)),
+                                          autoescape=select_autoescape(['html']))
+                environment.globals['asset_url'] = get_asset_manifest().url
+                _environment = environment
+    return _environment
+
+
+def render_results_page(session_id, sections):
+    """Stored page record of a finished report: ``{'html': ..., 'assets': manifest version}``"""
+    html = _templates().get_template('results.html').render(session_id=session_id, cards=report_cards(sections))
+    return {'html': html, 'assets': get_asset_manifest().version()}
+
+
+def is_current(page):
+    """Whether a stored page links to the assets being served now"""
+    return bool(page) and page.get('assets') == get_asset_manifest().version()
+
+
+def export_page(session_id, html):
+    """Write a finished page for a static file server when RESULTS_EXPORT_DIR is set"""
+    export_dir = os.getenv('RESULTS_EXPORT_DIR')
+    if not export_dir:
+        return None
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f"{session_id}.html")
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def prerender_results_page(session_id, sections):
+    """Render (and export) a finished session's page; returns None when rendering fails"""
+    try:
+        page = render_results_page(session_id, sections)
+        export_page(session_id, page['html'])
+        return page
+    except Exception as e:
+        # The page route renders it on demand instead
+        print(f"⚠️  Could not prerender the results page of session {session_id}: {e}")
+        return None
@@ -0,0 +1,126 @@
+"""
+Speculative search prewarming while the user is still filling in the form.
+
+The state and car type are usually chosen well before the free-text
+requirements are finished.  As soon as they are set the form calls /prewarm,
+which runs the searches that do not depend on the free text (registration
+rules for the state, listings and prices for the market segment) so the
+results are already in the search cache when the crew's query planner asks
+for them.  Prewarm work that no submission used within the TTL is cancelled
+and its cached results are evicted.
+
+The search cache belongs to the process, so prewarming only helps crews run
+by an embedded worker of the web process.  It is off until the web app starts
+one; with dedicated workers it would spend search credits for nothing.
+
+Tunables:
+
+    PREWARM_TTL_SECONDS   how long prewarmed results wait for a submission (default 300)
+    PREWARM_MAX_ACTIVE    prewarms kept at the same time, to bound speculative spend (default 32)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from smart_car_buying_assistant.search_planner import plan_segment_queries
+from smart_car_buying_assistant.tools.registry import get_tool_registry
+
+
+def _segment_key(state, car_type, budget=''):
+    return tuple(' '.join((value or '').lower().split()) for value in (state, car_type, budget))
+
+
+class Prewarmer:
+    """Runs segment searches ahead of a submission and evicts unused ones"""
+
+    def __init__(self, registry=None, ttl=None, max_active=None, enabled=False):
+        self._registry = registry
+        self.enabled = enabled
+        self.ttl = ttl or float(os.getenv('PREWARM_TTL_SECONDS', '300'))
+        self.max_active = max_active or int(os.getenv('PREWARM_MAX_ACTIVE', '32'))
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prewarm")
+        self._janitor = None
+        self.stats = {'started': 0, 'used': 0, 'expired': 0}
+
+    @property
+    def registry(self):
+        # Built lazily so importing the web app does not construct the search backends
+        if self._registry is None:
+            self._registry = get_tool_registry()
+        return self._registry
+
+    def prewarm(self, state, car_type, budget=''):
+        """Start prewarming a segment; returns 'started', 'warm', 'busy' or 'disabled'"""
+        if not self.enabled or not self.registry.backends:
+            return 'disabled'
+        key = _segment_key(state, car_type, budget)
+        with self._lock:
+            if key in self._entries:
+                return 'warm'
+            if len(self._entries) >= self.max_active:
+                return 'busy'
+            entry = {
+                'created_at': time.time(),
+                'queries': [query for _, query in plan_segment_queries(state, car_type, budget)],
+                'cancel': threading.Event(),
+                'used': False,
+            }
+            self._entries[key] = entry
+            self.stats['started'] += 1
+        self._ensure_janitor()
+        self._executor.submit(self._run, entry)
+        return 'started'
+
+    def _run(self, entry):
+        # Speculative work runs one call at a time so it can stop early and never
+        # competes with real sessions for the search executor
+        for query in entry['queries']:
+            for name in self.registry.backends:
+                if entry['cancel'].is_set():
+                    return
+                self.registry.search_backend(name, query)
+                if entry['cancel'].is_set() and not entry['used']:
+                    # Expired while the call was in flight
+                    self.registry.evict([query])
+
+    def mark_used(self, state, car_type):
+        """Keep every prewarm of this state and car type; a submission is about to use it"""
+        prefix = _segment_key(state, car_type)[:2]
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key[:2] == prefix and not entry['used']:
+                    entry['used'] = True
+                    self.stats['used'] += 1
+
+    def expire(self, now=None):
+        """Forget prewarms older than the TTL, cancelling and evicting unused ones"""
+        now = now or time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if now - entry['created_at'] >= self.ttl]
+            entries = [self._entries.pop(key) for key in expired]
+        for entry in entries:
+            if not entry['used']:
+                entry['cancel'].set()
+                self.registry.evict(entry['queries'])
+                self.stats['expired'] += 1
+        return len(entries)
+
+    def _janitor_loop(self):
+        while True:
+            time.sleep(max(1.0, self.ttl / 4))
+            self.expire()
+
+    def _ensure_janitor(self):
+        if self._janitor is None:
+            with self._lock:
+                if self._janitor is None:
+                    self._janitor = threading.Thread(target=self._janitor_loop, name="prewarm-janitor", daemon=True)
+                    self._janitor.start()
+
+    def snapshot(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'active': len(self._entries), **self.stats}
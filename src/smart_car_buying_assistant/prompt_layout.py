@@ -0,0 +1,62 @@
+"""
+Prompt layout for provider prefix caching.
+
+Providers cache the longest prompt prefix they have seen recently, so a
+prompt is only cheap to reuse up to its first per-session value.  In the
+default ``cache`` layout every ``{placeholder}`` in an agent's role, goal and
+backstory and in a task's description and expected output is replaced by a
+``[placeholder]`` reference, and the values are listed once at the end of the
+task prompt.  The system prompt of every agent and the task text before the
+values are then identical across sessions.  The ``inline`` layout keeps
+crewai's usual in-place interpolation.
+
+Tunables:
+
+    PROMPT_LAYOUT   'cache' (default) or 'inline'
+"""
+
+import os
+
+from smart_car_buying_assistant.incremental import PLACEHOLDER_PATTERN
+
+AGENT_FIELDS = ('role', 'goal', 'backstory')
+TASK_FIELDS = ('description', 'expected_output')
+
+
+def cache_friendly_layout():
+    """Whether per-session values should be moved to the end of the prompts"""
+    return os.getenv('PROMPT_LAYOUT', 'cache').strip().lower() != 'inline'
+
+
+def to_references(text):
+    """Replace ``{name}`` placeholders with ``[name]``; returns the text and the names in order"""
+    names = list(dict.fromkeys(PLACEHOLDER_PATTERN.findall(text or '')))
+    return PLACEHOLDER_PATTERN.sub(lambda match: f"[{match.group(1)}]", text or ''), names
+
+
+def values_block(names):
+    """Trailing prompt section that crewai fills in with this session's values"""
+    if not names:
+        return ''
+    return "\n\nValues for this session:\n" + '\n'.join(f"[{name}] = {{{name}}}" for name in names)
+
+
+def apply_cache_friendly_layout(crew):
+    """Move the placeholders of the crew's agents and tasks to the end of each task prompt"""
+    agent_names = {}
+    for agent in crew.agents:
+        names = []
+        for field in AGENT_FIELDS:
+            text, used = to_references(getattr(agent, field))
+            setattr(agent, field, text)
+            names.extend(used)
+        agent_names[id(agent)] = names
+
+    for task in crew.tasks:
+        names = list(agent_names.get(id(task.agent), []))
+        for field in TASK_FIELDS:
+            text, used = to_references(getattr(task, field))
+            setattr(task, field, text)
+            names.extend(used)
+        task.expected_output += values_block(list(dict.fromkeys(names)))
+    return crew
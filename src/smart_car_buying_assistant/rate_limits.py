@@ -0,0 +1,307 @@
+"""
+Token-bucket rate limiting of outbound LLM and search calls, per provider.
+
+Every routed LLM call takes one request and its estimated tokens from its
+provider's buckets before it is sent (the estimate is settled against the
+reported usage afterwards), and every search takes one request from its
+backend's bucket.  Callers that have to wait are queued per session and
+served round-robin, so concurrent sessions share a provider evenly.  The
+limits in ``config/rate_limits.yaml`` are divided between the live worker
+processes recorded in the job store, so the whole deployment stays below
+them.  A 429 from a provider pauses its bucket for the provider's
+``Retry-After`` instead of letting every caller retry at once.
+
+Tunables:
+
+    RATE_LIMITS                   'on' (default) or 'off'
+    RATE_LIMIT_MAX_WAIT_SECONDS   longest a call waits for its turn before it is sent anyway (default 120)
+    RATE_LIMIT_SHARE_REFRESH      seconds between re-reading the number of live workers (default 15)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import yaml
+
+RATE_LIMITS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'rate_limits.yaml')
+
+# Completion tokens assumed for a call that does not set max_tokens
+DEFAULT_COMPLETION_ESTIMATE = 1000
+# Pause after a 429 that does not say how long to wait
+DEFAULT_RETRY_AFTER = 10.0
+# 429s of one LLM call that are waited out before it fails over to another model
+RATE_LIMIT_RETRIES = 2
+
+
+def provider_for_model(model):
+    """Provider whose limits a model's calls count against"""
+    model = model or ''
+    if '/' in model:
+        return model.split('/', 1)[0]
+    if model.startswith('claude'):
+        return 'anthropic'
+    return 'openai'
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough token count of a call before it is made (about four characters per token)"""
+    if isinstance(messages, str):
+        chars = len(messages)
+    else:
+        chars = sum(len(str(message.get('content') or '')) for message in messages or [])
+    return chars // 4 + (max_tokens or DEFAULT_COMPLETION_ESTIMATE)
+
+
+class TokenBucket:
+    """Refills at ``per_minute`` per minute up to ``burst_seconds`` worth of allowance
+
+    A call larger than the capacity waits for a full bucket, then takes its
+    whole amount and leaves the bucket in debt, so the calls after it wait
+    until the rate has paid for it.
+    """
+
+    def __init__(self, per_minute, burst_seconds=2.0):
+        self.burst_seconds = burst_seconds
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(per_minute)
+        self.level = self.capacity
+
+    def set_rate(self, per_minute):
+        self._refill()
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * self.burst_seconds)
+        self.level = min(self.level, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.level < getattr(self, 'capacity', 0):
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` can be taken (amounts above the capacity wait for a full bucket)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if self.rate > 0 else float('inf')
+
+    def take(self, amount):
+        self._refill()
+        # The whole amount, even above the capacity: the debt delays the next calls
+        self.level -= amount
+
+    def adjust(self, amount):
+        """Take (or give back, when negative) the difference between an estimate and the actual use"""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class ProviderLimiter:
+    """Request and token buckets of one provider, with round-robin queuing by session"""
+
+    def __init__(self, name, requests_per_minute=None, tokens_per_minute=None, burst_seconds=2.0):
+        self.name = name
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.buckets = {kind: TokenBucket(limit, burst_seconds) for kind, limit in self.limits.items() if limit}
+        self.paused_until = 0.0
+        self.stats = {'calls': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait_exceeded': 0, 'rate_limited': 0}
+        self._waiting = OrderedDict()  # session -> deque of waiting callers, served in turn
+        self._cond = threading.Condition()
+
+    def scale(self, share):
+        """Use ``share`` of the configured limits (this process's part of the deployment's allowance)"""
+        with self._cond:
+            for kind, bucket in self.buckets.items():
+                bucket.set_rate(self.limits[kind] * share)
+            self._cond.notify_all()
+
+    def _wait_time(self, tokens):
+        wait = max(0.0, self.paused_until - time.monotonic())
+        for kind, amount in (('requests', 1), ('tokens', tokens)):
+            if kind in self.buckets:
+                wait = max(wait, self.buckets[kind].wait_time(amount))
+        return wait
+
+    def _head(self):
+        for callers in self._waiting.values():
+            return callers[0]
+        return None
+
+    def acquire(self, session_id=None, tokens=0, max_wait=None):
+        """Wait for this session's turn and for the allowance; returns the seconds waited"""
+        ticket = object()
+        started = time.monotonic()
+        deadline = started + max_wait if max_wait is not None else None
+        with self._cond:
+            self._waiting.setdefault(session_id, deque()).append(ticket)
+            try:
+                while True:
+                    wait = self._wait_time(tokens) if self._head() is ticket else None
+                    if wait == 0.0:
+                        break
+                    if deadline is not None and time.monotonic() >= deadline:
+                        self.stats['max_wait_exceeded'] += 1
+                        print(f"⚠️  Waited {max_wait:g}s for the {self.name} rate limit, sending the call anyway")
+                        break
+                    timeout = wait if wait is not None else None
+                    if deadline is not None:
+                        timeout = min(timeout if timeout is not None else float('inf'), deadline - time.monotonic())
+                    self._cond.wait(timeout=max(0.0, timeout) if timeout is not None else None)
+                for kind, amount in (('requests', 1), ('tokens', tokens)):
+                    if kind in self.buckets:
+                        self.buckets[kind].take(amount)
+            finally:
+                callers = self._waiting[session_id]
+                callers.remove(ticket)
+                # The next caller of this session queues behind the other sessions
+                del self._waiting[session_id]
+                if callers:
+                    self._waiting[session_id] = callers
+                self._cond.notify_all()
+            waited = time.monotonic() - started
+            self.stats['calls'] += 1
+            if waited >= 0.01:
+                self.stats['waited'] += 1
+                self.stats['wait_seconds'] += waited
+        return waited
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once a call's actual usage is known"""
+        if 'tokens' not in self.buckets or actual_tokens is None:
+            return
+        with self._cond:
+            self.buckets['tokens'].adjust(actual_tokens - estimated_tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every caller after the provider answered 429"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats['rate_limited'] += 1
+        print(f"⚠️  {self.name} is rate limiting, pausing its calls for {seconds:g}s")
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                **self.stats,
+                'wait_seconds': round(self.stats['wait_seconds'], 3),
+                'queued': sum(len(callers) for callers in self._waiting.values()),
+                'per_minute': {kind: round(bucket.rate * 60, 1) for kind, bucket in self.buckets.items()},
+            }
+
+
+class RateLimiter:
+    """The provider limiters of this process"""
+
+    def __init__(self, config=None, enabled=None, max_wait=None, share_refresh=None, store=None):
+        config = config if config is not None else load_rate_limits_config()
+        self.enabled = enabled if enabled is not None else os.getenv('RATE_LIMITS', 'on').strip().lower() != 'off'
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('RATE_LIMIT_MAX_WAIT_SECONDS', '120'))
+        self.share_refresh = (share_refresh if share_refresh is not None
+                              else float(os.getenv('RATE_LIMIT_SHARE_REFRESH', '15')))
+        self.headroom = float(config.get('headroom', 0.9))
+        burst_seconds = float(config.get('burst_seconds', 2))
+        self.providers = {
+            name: ProviderLimiter(name, (limits or {}).get('requests_per_minute'),
+                                  (limits or {}).get('tokens_per_minute'), burst_seconds)
+            for name, limits in (config.get('providers') or {}).items()
+        }
+        self.store = store
+        self.share = None
+        self._share_checked = 0.0
+        self._lock = threading.Lock()
+
+    def _live_workers(self):
+        try:
+            if self.store is None:
+                from smart_car_buying_assistant.job_store import get_job_store
+                self.store = get_job_store()
+            return self.store.worker_stats()['live']
+        except Exception:
+            return 0
+
+    def _refresh_share(self):
+        now = time.monotonic()
+        if self.share is not None and now - self._share_checked < self.share_refresh:
+            return
+        with self._lock:
+            if self.share is not None and now - self._share_checked < self.share_refresh:
+                return
+            self._share_checked = now
+            share = self.headroom / max(1, self._live_workers())
+            if share != self.share:
+                self.share = share
+                for limiter in self.providers.values():
+                    limiter.scale(share)
+
+    def limiter(self, provider):
+        """ProviderLimiter for a provider, or None when it is not limited"""
+        if not self.enabled:
+            return None
+        limiter = self.providers.get(provider)
+        if limiter is not None:
+            self._refresh_share()
+        return limiter
+
+    def acquire(self, provider, session_id=None, tokens=0):
+        """Wait for a call to ``provider``; returns the seconds waited (0 when it is not limited)"""
+        limiter = self.limiter(provider)
+        if limiter is None:
+            return 0.0
+        return limiter.acquire(session_id, tokens, self.max_wait)
+
+    def snapshot(self):
+        """Per-provider calls, waits and 429s, for /metrics"""
+        return {name: limiter.snapshot() for name, limiter in self.providers.items()}
+
+
+def load_rate_limits_config(path=RATE_LIMITS_CONFIG_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        print(f"⚠️  Rate limit config not found at {path}, outbound calls are not rate limited")
+        return {}
+
+
+def is_rate_limited(error):
+    """Whether an exception (or one it was raised from) is a provider's 429"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, 'status_code', None) == 429 or type(error).__name__ == 'RateLimitError':
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def retry_after(error):
+    """Seconds a 429 asks the caller to wait, or the default pause"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            value = headers.get('retry-after') or headers.get('Retry-After')
+            if value:
+                return max(1.0, float(value))
+        except (AttributeError, TypeError, ValueError):
+            pass
+        error = error.__cause__ or error.__context__
+    return DEFAULT_RETRY_AFTER
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
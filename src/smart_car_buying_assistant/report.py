@@ -0,0 +1,102 @@
+"""
+Addressable sections of the car buying report.
+
+A finished report is stored both as the full text and as the six sections
+below, so API clients can fetch only the parts they need.  Sections come from
+the individual task outputs when they are available; older or raw reports are
+split on their section headings instead.
+"""
+
+REPORT_SECTIONS = ('profile', 'recommendations', 'legal', 'valuation', 'negotiation', 'inspection')
+
+SECTION_TITLES = {
+    'profile': 'Customer Profile',
+    'recommendations': 'Recommended Vehicles',
+    'legal': 'Out-of-State Registration Requirements',
+    'valuation': 'Vehicle Valuation',
+    'negotiation': 'Negotiation Strategies',
+    'inspection': 'Inspection Checklists',
+}
+
+# Which report section each task in tasks.yaml feeds
+TASK_SECTIONS = {
+    'collect_car_buying_requirements': 'profile',
+    'research_vehicle_market': 'recommendations',
+    'analyze_legal_requirements': 'legal',
+    'evaluate_vehicle_values': 'valuation',
+    'develop_negotiation_strategies': 'negotiation',
+    'create_inspection_plan': 'inspection',
+}
+
+# Headings (lower case, without markdown decoration) that start a section in the text report
+SECTION_HEADINGS = {
+    'profile': ('comprehensive car buying report', 'customer profile'),
+    'recommendations': ('top 10 recommended vehicles', 'detailed reasons to buy each vehicle',
+                        'final recommendations'),
+    'legal': ('out-of-state registration requirements', 'legal requirements'),
+    'valuation': ('vehicle valuation', 'valuation report', 'fair market value'),
+    'negotiation': ('negotiation strategies', 'negotiation guide'),
+    'inspection': ('inspection checklists', 'inspection plan', 'inspection guide'),
+}
+
+
+def _heading_section(line):
+    """Return the section a heading line starts, or None if it is not a heading"""
+    text = line.strip().strip('#*').strip().rstrip(':').strip().lower()
+    if not text or len(text) > 60 or '|' in text:
+        return None
+    for section, headings in SECTION_HEADINGS.items():
+        if any(text.startswith(heading) for heading in headings):
+            return section
+    return None
+
+
+def split_report(report):
+    """Split a text report into sections using its headings"""
+    sections = {name: [] for name in REPORT_SECTIONS}
+    current = 'profile'
+    for line in (report or '').split('\n'):
+        current = _heading_section(line) or current
+        sections[current].append(line)
+    return {name: '\n'.join(lines).strip() for name, lines in sections.items()}
+
+
+def _profile_block(profile):
+    """Keep only the structured customer profile written by format_crew_results"""
+    lines = profile.split('\n')
+    for index, line in enumerate(lines):
+        if line.startswith('Special Consideration'):
+            return '\n'.join(lines[:index + 1]).strip()
+    return profile
+
+
+def build_report_sections(report, tasks_output=None):
+    """Build the report sections, preferring the raw output of each task"""
+    sections = split_report(report)
+    if tasks_output:
+        # Unheaded crew output would otherwise be attributed to the profile
+        sections['profile'] = _profile_block(sections['profile'])
+    for task_output in tasks_output or []:
+        section = TASK_SECTIONS.get(getattr(task_output, 'name', None) or '')
+        raw = getattr(task_output, 'raw', None)
+        if not section or not raw:
+            continue
+        if section == 'profile':
+            # Keep the structured customer profile and add the analyst's write-up
+            sections[section] = f"{sections[section]}\n\n{raw.strip()}".strip()
+        else:
+            sections[section] = raw.strip()
+    return sections
+
+
+def select_sections(sections, names):
+    """Return the requested sections in report order
+
+    ``names`` is a list of section names or ``['all']``; unknown names raise ValueError.
+    """
+    if not names or 'all' in names:
+        names = list(REPORT_SECTIONS)
+    unknown = [name for name in names if name not in REPORT_SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown report section(s): {', '.join(unknown)}")
+    return {name: sections.get(name, '') for name in REPORT_SECTIONS if name in names}
@@ -0,0 +1,482 @@
+"""
+Per-agent model routing with latency- and error-aware fallback.
+
+Each agent's model and fallbacks are configured in ``config/models.yaml``.
+The router is shared by every crew in the process, so the latency and error
+statistics it keeps per model reflect all sessions, not just the current one.
+
+Every call follows the ``calls`` policy of the same file: an attempt that
+hangs past its timeout is abandoned, failed attempts are retried after a
+jittered exponential backoff, and an attempt slower than the model's recent
+p95 latency is hedged with a duplicate request (the first answer wins).
+
+Tunables:
+
+    LLM_CALL_THREADS   threads that make LLM requests, shared by all sessions (default 64)
+"""
+
+import contextvars
+import copy
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+import yaml
+from crewai import LLM
+from crewai.utilities.exceptions.context_window_exceeding_exception import LLMContextLengthExceededError
+
+from smart_car_buying_assistant.cassettes import current_cassette
+from smart_car_buying_assistant.rate_limits import (
+    RATE_LIMIT_RETRIES,
+    estimate_tokens,
+    get_rate_limiter,
+    is_rate_limited,
+    provider_for_model,
+    retry_after,
+)
+from smart_car_buying_assistant.spans import get_tracer
+from smart_car_buying_assistant.streaming import current_report_stream, quiet_console
+from smart_car_buying_assistant.usage import BudgetExceededError, current_usage, estimate_cost
+
+MODELS_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'models.yaml')
+
+DEFAULT_MODEL = 'gpt-4o-mini'
+DEFAULT_ROUTING = {
+    'window': 50,
+    'min_samples': 5,
+    'p95_latency_seconds': 45,
+    'max_error_rate': 0.25,
+    'cooldown_seconds': 120,
+}
+DEFAULT_CALL_POLICY = {
+    'timeout_seconds': 90,
+    'max_attempts': 3,
+    'backoff_seconds': 1,
+    'max_backoff_seconds': 20,
+    'hedge': True,
+    'hedge_quantile': 0.95,
+    'hedge_min_delay_seconds': 3,
+}
+
+
+class LLMCallTimeout(Exception):
+    """An LLM call attempt did not answer within its timeout"""
+
+
+class ModelStats:
+    """Rolling latency and error statistics for one model"""
+
+    def __init__(self, window):
+        self.calls = deque(maxlen=window)
+        self.unhealthy_since = None
+        self.timeouts = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, latency, ok):
+        self.calls.append((latency, ok))
+
+    def latency_quantile(self, quantile):
+        latencies = sorted(latency for latency, ok in self.calls if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(quantile * (len(latencies) - 1))))]
+
+    @property
+    def p95_latency(self):
+        latencies = sorted(latency for latency, _ in self.calls)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+
+    @property
+    def error_rate(self):
+        if not self.calls:
+            return None
+        return sum(1 for _, ok in self.calls if not ok) / len(self.calls)
+
+    def snapshot(self):
+        return {
+            'calls': len(self.calls),
+            'p95_latency_seconds': None if self.p95_latency is None else round(self.p95_latency, 3),
+            'error_rate': None if self.error_rate is None else round(self.error_rate, 3),
+            'healthy': self.unhealthy_since is None,
+            'timeouts': self.timeouts,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'hedge_win_rate': round(self.hedge_wins / self.hedged, 3) if self.hedged else None,
+        }
+
+
+class ModelRouter:
+    """Chooses the model for each agent call from the configured candidates"""
+
+    def __init__(self, config=None):
+        config = config if config is not None else load_models_config()
+        self.settings = {**DEFAULT_ROUTING, **(config.get('routing') or {})}
+        self.call_settings = {**DEFAULT_CALL_POLICY, **(config.get('calls') or {})}
+        self.defaults = config.get('defaults') or {}
+        self.agents = config.get('agents') or {}
+        self.pricing = config.get('pricing') or {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, agent_name):
+        """Primary model followed by its fallbacks, in order of preference"""
+        agent = self.agents.get(agent_name) or {}
+        models = [agent.get('model') or DEFAULT_MODEL] + list(agent.get('fallbacks') or [])
+        return list(dict.fromkeys(models))
+
+    def llm_params(self, agent_name):
+        """Extra LLM parameters (temperature, max_tokens, ...) for an agent"""
+        agent = self.agents.get(agent_name) or {}
+        params = dict(self.defaults)
+        params.update({key: value for key, value in agent.items()
+                       if key not in ('model', 'fallbacks') and key not in DEFAULT_CALL_POLICY})
+        return params
+
+    def call_policy(self, agent_name):
+        """Timeout, retry and hedging settings for an agent's calls"""
+        agent = self.agents.get(agent_name) or {}
+        return {**self.call_settings, **{key: agent[key] for key in DEFAULT_CALL_POLICY if key in agent}}
+
+    def hedge_delay(self, model, policy):
+        """Seconds after which a call to ``model`` is hedged, or None while its latency is unknown"""
+        if not policy['hedge']:
+            return None
+        with self._lock:
+            stats = self._stats_for(model)
+            if len(stats.calls) < self.settings['min_samples']:
+                return None
+            delay = stats.latency_quantile(policy['hedge_quantile'])
+        if delay is None:
+            return None
+        return max(float(policy['hedge_min_delay_seconds']), delay)
+
+    def record_timeout(self, model, latency):
+        self.record(model, latency, ok=False)
+        with self._lock:
+            self._stats_for(model).timeouts += 1
+
+    def record_hedge(self, model):
+        with self._lock:
+            self._stats_for(model).hedged += 1
+
+    def record_hedge_win(self, model):
+        """Count a hedged call whose duplicate request answered first"""
+        with self._lock:
+            self._stats_for(model).hedge_wins += 1
+
+    def _stats_for(self, model):
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = ModelStats(int(self.settings['window']))
+        return stats
+
+    def _is_available(self, stats, now):
+        if stats.unhealthy_since is None:
+            return True
+        if now - stats.unhealthy_since >= self.settings['cooldown_seconds']:
+            # Cooldown over: give the model a fresh window to prove itself
+            stats.calls.clear()
+            stats.unhealthy_since = None
+            return True
+        return False
+
+    def choose(self, agent_name, exclude=()):
+        """Return the preferred healthy model for an agent, or None if all are excluded"""
+        candidates = [model for model in self.candidates(agent_name) if model not in exclude]
+        if not candidates:
+            return None
+        now = time.time()
+        with self._lock:
+            for model in candidates:
+                if self._is_available(self._stats_for(model), now):
+                    return model
+            # Every candidate is unhealthy: use the one with the best recent latency
+            return min(candidates, key=lambda model: self._stats_for(model).p95_latency or 0)
+
+    def record(self, model, latency, ok):
+        """Record the outcome of a call and update the model's health"""
+        with self._lock:
+            stats = self._stats_for(model)
+            stats.record(latency, ok)
+            if stats.unhealthy_since is not None or len(stats.calls) < self.settings['min_samples']:
+                return
+            too_slow = stats.p95_latency > self.settings['p95_latency_seconds']
+            too_many_errors = stats.error_rate > self.settings['max_error_rate']
+            if too_slow or too_many_errors:
+                stats.unhealthy_since = time.time()
+                reason = 'p95 latency' if too_slow else 'error rate'
+                print(f"⚠️  Model {model} marked unhealthy ({reason} above threshold), routing to fallbacks")
+
+    def snapshot(self):
+        """Per-model statistics, for health and metrics endpoints"""
+        with self._lock:
+            return {model: stats.snapshot() for model, stats in self._stats.items()}
+
+
+def backoff_delay(retry, policy):
+    """Full-jitter exponential backoff before the ``retry``-th retry of a call"""
+    cap = min(float(policy['max_backoff_seconds']), float(policy['backoff_seconds']) * 2 ** (retry - 1))
+    return random.uniform(0, cap)
+
+
+def _usage_value(usage, name):
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+class UsageCapture:
+    """LLM callback that records the token usage of one call on its span and session"""
+
+    def __init__(self, span, pricing, model, task_name, agent_name=None):
+        self.span = span
+        self.pricing = pricing
+        self.model = model
+        self.task_name = task_name
+        self.agent_name = agent_name
+        self.usage = None
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        usage = response_obj.get('usage')
+        if usage is None:
+            return
+        details = _usage_value(usage, 'prompt_tokens_details')
+        prompt_tokens = _usage_value(usage, 'prompt_tokens') or 0
+        completion_tokens = _usage_value(usage, 'completion_tokens') or 0
+        cached_tokens = (_usage_value(details, 'cached_tokens') if details else None) or 0
+        self.usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'prompt_tokens_details': {'cached_tokens': cached_tokens}}
+        cost = estimate_cost(self.pricing, self.model, prompt_tokens, completion_tokens, cached_tokens)
+        if self.span is not None:
+            self.span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                          cached_tokens=cached_tokens, cost_usd=cost)
+        session_usage = current_usage()
+        if session_usage is not None:
+            session_usage.record(self.model, self.task_name, prompt_tokens, completion_tokens, cached_tokens, cost,
+                                 agent=self.agent_name)
+
+
+class RoutedLLM(LLM):
+    """LLM that asks the router which model to use on every call
+
+    A failed or timed-out attempt is retried, after a backoff, on the next
+    healthy candidate model.  Calls wait for their provider's rate limit
+    first, and a call the provider rejected with a 429 is retried on the same
+    model once the provider's pause is over.
+    """
+
+    def __init__(self, agent_name, router, **kwargs):
+        self.agent_name = agent_name
+        self.router = router
+        super().__init__(model=router.choose(agent_name), **kwargs)
+
+    def _use_model(self, model):
+        if model != self.model:
+            self.model = model
+            self.is_anthropic = self._is_anthropic_model(model)
+            self.context_window_size = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None):
+        tried = []
+        rate_limited = 0
+        session_usage = current_usage()
+        task_name = getattr(from_task, 'name', None)
+        cassette = current_cassette()
+        policy = self.router.call_policy(self.agent_name)
+        call_kwargs = {'tools': tools, 'callbacks': callbacks, 'available_functions': available_functions,
+                       'from_task': from_task, 'from_agent': from_agent}
+        # Report tasks stream their tokens to the results page while they are generated
+        report_stream = current_report_stream()
+        stream = report_stream is not None and report_stream.covers(task_name)
+        while True:
+            if session_usage is not None:
+                # Stop before spending more once the session budget is used up
+                session_usage.check()
+            if cassette is not None and cassette.replaying:
+                return self._replay(cassette, messages, task_name)
+            # The next fallback, or the same model again once every candidate has failed
+            model = self.router.choose(self.agent_name, exclude=tried) or self.router.choose(self.agent_name)
+            self._use_model(model)
+            limiter = get_rate_limiter().limiter(provider_for_model(model))
+            attempt = len(tried) + 1
+
+            def send(hedge=False):
+                return self._send(model, stream, limiter, messages, task_name, session_usage, call_kwargs,
+                                  attempt, hedge)
+
+            if stream or available_functions:
+                # A duplicate request would interleave two streams in the live report, or run tools twice.
+                # A stream that stops sending chunks hits the LLM's own timeout instead of a deadline.
+                timeout, hedge_delay = None, None
+            else:
+                timeout, hedge_delay = float(policy['timeout_seconds']), self.router.hedge_delay(model, policy)
+            # Waiting for the rate limit does not count towards the model's latency
+            primary = send()
+            started = time.monotonic()
+            try:
+                result, usage = self._race(model, primary, send, timeout, hedge_delay)
+            except (LLMContextLengthExceededError, BudgetExceededError):
+                # Not a model health problem; the agent executor or runner handles it
+                raise
+            except Exception as e:
+                if limiter is not None and is_rate_limited(e) and rate_limited < RATE_LIMIT_RETRIES:
+                    # The provider is busy, not the model broken: wait out its pause and try again
+                    rate_limited += 1
+                    limiter.pause(retry_after(e))
+                    continue
+                if isinstance(e, LLMCallTimeout):
+                    self.router.record_timeout(model, time.monotonic() - started)
+                else:
+                    self.router.record(model, time.monotonic() - started, ok=False)
+                tried.append(model)
+                if len(tried) >= int(policy['max_attempts']):
+                    raise
+                delay = backoff_delay(len(tried), policy)
+                print(f"⚠️  {self.agent_name}: {model} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.router.record(model, time.monotonic() - started, ok=True)
+            if cassette is not None:
+                cassette.record_llm(self.agent_name, task_name, messages, result, model,
+                                    time.monotonic() - started, usage)
+            return result
+
+    def _send(self, model, stream, limiter, messages, task_name, session_usage, call_kwargs, attempt, hedge):
+        """Start one request on the call threads, once the rate limit allows it; returns its future"""
+        tokens = estimate_tokens(messages, self.max_tokens)
+        waited = 0.0
+        if limiter is not None:
+            waited = limiter.acquire(getattr(session_usage, 'session_id', None), tokens,
+                                     get_rate_limiter().max_wait)
+        # The session's usage, trace and live report are context variables
+        context = contextvars.copy_context()
+        future = _call_executor().submit(context.run, self._attempt, model, stream, messages, task_name,
+                                         call_kwargs, attempt, hedge, waited)
+        if limiter is not None:
+            def settle(done):
+                usage = None if done.exception() is not None else done.result()[1]
+                if usage is not None:
+                    limiter.settle(tokens, usage['prompt_tokens'] + usage['completion_tokens'])
+            future.add_done_callback(settle)
+        return future
+
+    def _for_attempt(self, model, stream):
+        """Copy of this LLM that sends one request to ``model``
+
+        A hedge may start after the retry loop has moved this LLM on to the
+        next model; the copy keeps the model its span and usage are recorded for.
+        """
+        llm = copy.copy(self)
+        llm._use_model(model)
+        llm.stream = stream
+        return llm
+
+    def _attempt(self, model, stream, messages, task_name, call_kwargs, attempt, hedge, waited):
+        with get_tracer().span('llm_call', 'llm', model=model, agent=self.agent_name, attempt=attempt,
+                               hedge=hedge or None) as span:
+            if span is not None and waited:
+                span.set(rate_limit_wait=round(waited, 3))
+            capture = UsageCapture(span, self.router.pricing, model, task_name, self.agent_name)
+            # Streamed chunks reach the live report, not the console
+            with quiet_console() if stream else nullcontext():
+                result = super(RoutedLLM, self._for_attempt(model, stream)).call(
+                    messages, **{**call_kwargs, 'callbacks': list(call_kwargs['callbacks'] or []) + [capture]})
+        return result, capture.usage
+
+    def _race(self, model, primary, send, timeout, hedge_delay):
+        """First successful answer of an attempt, hedged once after ``hedge_delay``
+
+        The slower request is abandoned, not cancelled: its thread finishes
+        (or hits the LLM's own timeout) in the background.
+        """
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else None
+        hedge = None
+        error = None
+        pending = {primary}
+        while pending:
+            until = deadline
+            if hedge is None and hedge_delay is not None:
+                until = min(deadline, started + hedge_delay)
+            timeout_left = max(0.0, until - time.monotonic()) if until is not None else None
+            done, pending = wait(pending, timeout=timeout_left, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.router.record_hedge_win(model)
+                    return future.result()
+                error = error or future.exception()
+            if done:
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LLMCallTimeout(f"no answer from {model} within {timeout:g}s")
+            if hedge is None and hedge_delay is not None:
+                self.router.record_hedge(model)
+                hedge = send(hedge=True)
+                pending.add(hedge)
+        raise error
+
+    def _replay(self, cassette, messages, task_name):
+        """Serve a call from a replayed cassette, with its recorded usage"""
+        with get_tracer().span('llm_call', 'llm', agent=self.agent_name, replayed=True) as span:
+            entry = cassette.replay_llm(self.agent_name, task_name, messages)
+            if span is not None:
+                span.set(model=entry['model'])
+            if entry.get('usage'):
+                capture = UsageCapture(span, self.router.pricing, entry['model'], task_name, self.agent_name)
+                capture.log_success_event({}, {'usage': entry['usage']}, None, None)
+        return entry['response']
+
+
+def load_models_config(path=MODELS_CONFIG_PATH):
+    """Load the model routing configuration"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        print(f"⚠️  Model routing config not found at {path}, using {DEFAULT_MODEL} for all agents")
+        return {}
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_router():
+    """Return the process-wide model router"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _call_executor():
+    """Threads that make the LLM requests of every session in the process"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_CALL_THREADS', '64')),
+                                               thread_name_prefix='llm-call')
+    return _executor
+
+
+def routed_llm(agent_name):
+    """Create the LLM for an agent, routed according to config/models.yaml"""
+    router = get_model_router()
+    params = router.llm_params(agent_name)
+    # Abandoned attempts should not hold a call thread much past their timeout
+    params.setdefault('timeout', router.call_policy(agent_name)['timeout_seconds'])
+    return RoutedLLM(agent_name, router, **params)
@@ -0,0 +1,410 @@
+"""
+Crew execution for a single car buying session.
+
+This module is shared by the worker processes and by the embedded worker used
+in development; the web tier never runs crews itself.
+"""
+
+import os
+import time
+from datetime import datetime
+
+from crewai.crews.crew_output import CrewOutput
+
+from smart_car_buying_assistant.cassettes import recording_cassette, use_cassette
+from smart_car_buying_assistant.incremental import apply_reuse, plan_rerun
+from smart_car_buying_assistant.job_store import get_job_store
+from smart_car_buying_assistant.prerender import prerender_results_page
+from smart_car_buying_assistant.prompt_layout import apply_cache_friendly_layout, cache_friendly_layout
+from smart_car_buying_assistant.report import build_report_sections
+from smart_car_buying_assistant.search_planner import empty_search_context, prefetch_search_results
+from smart_car_buying_assistant.spans import get_tracer
+from smart_car_buying_assistant.streaming import publish_task_output, stream_report
+from smart_car_buying_assistant.tools.registry import get_tool_registry
+from smart_car_buying_assistant.tracing import get_trace_recorder
+from smart_car_buying_assistant.usage import BudgetExceededError, track_usage
+
+
+def select_crew_class():
+    """Pick the best crew implementation that can be imported in this environment"""
+    # Try to use the robust crew first (handles missing API keys gracefully)
+    try:
+        from smart_car_buying_assistant.crew_robust import SmartCarBuyingAssistantCrewRobust
+        print("✅ Using robust crew (handles missing API keys gracefully)")
+        return SmartCarBuyingAssistantCrewRobust
+    except ImportError as e:
+        print(f"⚠️  Could not import robust crew: {e}")
+
+    # Check if optional API keys are available
+    serper_key = os.getenv('SERPER_API_KEY')
+    brave_key = os.getenv('BRAVE_API_KEY')
+
+    # Use simplified crew if search API keys are missing
+    if not serper_key or not brave_key:
+        print("⚠️  Search API keys not available, using simplified crew")
+        try:
+            from smart_car_buying_assistant.crew_simple import SmartCarBuyingAssistantCrewSimple
+            print("✅ Using simplified crew (no external API dependencies)")
+            return SmartCarBuyingAssistantCrewSimple
+        except ImportError as e2:
+            print(f"⚠️  Could not import simplified crew: {e2}")
+            # Fallback to main crew
+            try:
+                from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
+                print("⚠️  Using main crew (some features may fail)")
+                return SmartCarBuyingAssistantCrew
+            except ImportError as e3:
+                raise Exception(f"Failed to import any CrewAI module: {e3}")
+
+    # Use main crew if all API keys are available
+    try:
+        from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
+        print("✅ Using main crew with full search capabilities")
+        return SmartCarBuyingAssistantCrew
+    except ImportError as e2:
+        print(f"⚠️  Could not import main crew: {e2}")
+        # Fallback to simplified crew
+        try:
+            from smart_car_buying_assistant.crew_simple import SmartCarBuyingAssistantCrewSimple
+            print("✅ Using simplified crew as fallback")
+            return SmartCarBuyingAssistantCrewSimple
+        except ImportError as e3:
+            raise Exception(f"Failed to import any CrewAI module: {e3}")
+
+
+def run_crew_job(job, store=None):
+    """Run the crew for a job claimed from the job store"""
+    payload = job['payload']
+    run_crew_background(
+        job['id'],
+        payload.get('user_requirements', ''),
+        payload.get('car_type', ''),
+        payload.get('budget_range', ''),
+        payload.get('current_state', ''),
+        store=store,
+        previous_session_id=payload.get('previous_session_id'),
+    )
+
+
+def run_crew_background(session_id, user_requirements, car_type, budget_range, current_state, store=None,
+                        previous_session_id=None, cassette=None):
+    """Run the crew process and record progress in the job store
+
+    With ``previous_session_id`` only the tasks invalidated by the edited inputs
+    are run again; the other task outputs are reused from that session.  A
+    replaying ``cassette`` serves every LLM and search call from a recording;
+    without one the session is recorded when CASSETTE_RECORD_DIR is set.
+    """
+    store = store or get_job_store()
+    # Incremental sessions depend on stored task outputs, so they are not recorded
+    if cassette is None and not previous_session_id:
+        cassette = recording_cassette(session_id, inputs={
+            'user_requirements': user_requirements, 'car_type': car_type,
+            'budget_range': budget_range, 'current_state': current_state,
+        })
+    started = time.monotonic()
+    # Crew events go to this session's trace instead of stdout; spans time every step
+    tracer = get_tracer()
+    with (
+        use_cassette(cassette),
+        track_usage(session_id) as usage,
+        get_trace_recorder().session(session_id, persist=lambda trace: _save_trace(store, session_id, trace, usage)),
+        tracer.session(session_id, car_type=car_type, current_state=current_state,
+                       incremental=bool(previous_session_id)) as session_span,
+        stream_report(store, session_id),
+    ):
+        try:
+            # Update status (a requeued job starts its live report over)
+            store.update(session_id, status='running', progress=10, current_task='Analyzing requirements...',
+                         stream=None)
+
+            # Import the crew here to avoid import errors at startup
+            crew_class = select_crew_class()
+            if cassette is not None:
+                cassette.header.setdefault('crew', crew_class.__name__)
+
+            # Prepare inputs for the crew
+            inputs = {
+                'user_requirements': user_requirements,
+                'car_type': car_type,
+                'budget_range': budget_range,
+                'current_state': current_state
+            }
+
+            # Update progress
+            store.update(session_id, progress=20, current_task='Creating AI crew...')
+
+            # Create the crew
+            try:
+                with tracer.span('create_crew', 'internal'):
+                    crew = crew_class().crew()
+            except Exception as e:
+                raise Exception(f"Failed to create crew: {e}")
+
+            all_tasks = list(crew.tasks)
+            if previous_session_id:
+                reused, stale = plan_rerun(store.get(previous_session_id), inputs)
+                apply_reuse(crew, reused)
+                get_trace_recorder().record('incremental_rerun', previous_session_id=previous_session_id,
+                                            reused=sorted(reused), rerun=stale)
+                if reused:
+                    print(f"♻️  Reusing {len(reused)} task outputs from {previous_session_id}, "
+                          f"rerunning {len(stale)}: {', '.join(stale) or 'none'}")
+                for task in all_tasks:
+                    if task.output is not None:
+                        publish_task_output(task, task.output.raw)
+
+            # Static prompt text first and session values last, so providers can cache the prefix
+            if cache_friendly_layout():
+                apply_cache_friendly_layout(crew)
+
+            # Run the predictable searches concurrently and share the results with every agent
+            store.update(session_id, progress=25, current_task='Searching listings and registration rules...')
+            try:
+                if crew.tasks:
+                    with tracer.span('search_prefetch', 'internal'):
+                        pool = prefetch_search_results(inputs)
+                    get_trace_recorder().record('search_prefetch', **pool.stats())
+                    inputs.update(pool.as_inputs())
+                else:
+                    inputs.update(empty_search_context())
+            except Exception as e:
+                print(f"⚠️  Search prefetch failed, agents will search on their own: {e}")
+                inputs.update(empty_search_context())
+
+            # Update progress
+            store.update(session_id, progress=30, current_task='Researching vehicle market...')
+
+            # Run the crew
+            try:
+                if crew.tasks:
+                    with tracer.span('kickoff', 'internal', tasks=len(crew.tasks)):
+                        result = crew.kickoff(inputs=inputs)
+                else:
+                    # Nothing changed since the previous session
+                    result = CrewOutput(raw=all_tasks[-1].output.raw, tasks_output=[task.output for task in all_tasks])
+                print(f"✅ Crew execution completed successfully")
+            except BudgetExceededError as e:
+                # Stop gracefully and report what the finished tasks produced
+                print(f"⚠️  {e}; returning a partial report for session {session_id}")
+                get_trace_recorder().record('budget_exceeded', reason=usage.exceeded)
+                result = partial_crew_output(all_tasks, e)
+            except Exception as e:
+                print(f"❌ Crew execution failed: {e}")
+                raise Exception(f"Crew execution failed: {e}")
+
+            # Reused and freshly run task outputs, in task order
+            tasks_output = [task.output for task in all_tasks if task.output is not None]
+            task_outputs = {task_output.name: task_output.raw for task_output in tasks_output if task_output.name}
+            store.update(session_id, usage=usage.snapshot())
+
+            # Format the results according to the specified output format
+            try:
+                formatted_result = format_crew_results(result, user_requirements, car_type, budget_range, current_state)
+                sections = build_report_sections(formatted_result, tasks_output)
+                # The finished page is rendered once here instead of in every visitor's browser
+                store.complete(session_id, formatted_result, sections, task_outputs,
+                               page=prerender_results_page(session_id, sections))
+                print(f"✅ Results formatted and stored successfully for session {session_id}")
+            except Exception as e:
+                print(f"❌ Error formatting results: {e}")
+                # Fallback to raw results if formatting fails
+                result_str = str(result) if result else "No results generated"
+                sections = build_report_sections(result_str)
+                store.complete(session_id, result_str, sections, task_outputs,
+                               page=prerender_results_page(session_id, sections))
+            if usage.exceeded:
+                store.update(session_id, current_task='Stopped early: session budget exceeded')
+
+        except Exception as e:
+            session_span.finish(error=e)
+            store.fail(session_id, e)
+            print(f"❌ Error in crew execution: {e}")
+
+        try:
+            store.record_session_usage(usage.snapshot())
+        except Exception as e:
+            print(f"⚠️  Could not record usage totals for session {session_id}: {e}")
+
+    if cassette is not None and not cassette.replaying:
+        _save_cassette(cassette, store.get(session_id), time.monotonic() - started)
+
+def partial_crew_output(tasks, error):
+    """Crew output made of the tasks that finished before the crew was stopped"""
+    finished = [task.output for task in tasks if task.output is not None]
+    skipped = [task.name for task in tasks if task.output is None]
+    note = f"Partial report: {error}. Not completed: {', '.join(skipped) or 'none'}."
+    return CrewOutput(raw='\n\n'.join([output.raw for output in finished] + [note]), tasks_output=finished)
+
+def _save_cassette(cassette, job, duration):
+    """Write a recorded session's cassette; recording must never fail a session"""
+    try:
+        cassette.save(
+            duration_seconds=round(duration, 3),
+            status=job['status'] if job else None,
+            search_backends=sorted(get_tool_registry().backends),
+        )
+        print(f"📼 Session recorded to {cassette.path}")
+    except Exception as e:
+        print(f"⚠️  Could not save cassette {cassette.path}: {e}")
+
+def _save_trace(store, session_id, trace, usage):
+    """Store the trace and token usage with the job; tracing must never fail a session"""
+    try:
+        store.update(session_id, trace=trace, usage=usage.snapshot())
+    except Exception as e:
+        print(f"⚠️  Could not save trace for session {session_id}: {e}")
+
+def format_crew_results(result, user_requirements, car_type, budget_range, current_state):
+    """Format the crew results according to the specified output format"""
+    try:
+        # Get current date
+        current_date = datetime.now().strftime("%B %d, %Y")
+        
+        # Extract additional details from user requirements
+        # This is a simplified extraction - you may need to enhance this based on your actual input format
+        requirements_parts = user_requirements.split(',') if user_requirements else []
+        
+        # Default values
+        color = "Not specified"
+        mileage = "Not specified"
+        must_have_features = "Not specified"
+        nice_to_have_features = "Not specified"
+        payment_method = "Not specified"
+        intended_use = "Not specified"
+        purchase_date = "Not specified"
+        special_considerations = "Not specified"
+        
+        # Try to extract information from requirements
+        for part in requirements_parts:
+            part = part.strip().lower()
+            if 'color' in part or 'black' in part or 'white' in part or 'red' in part or 'blue' in part:
+                color = part.split(':')[-1].strip() if ':' in part else part
+            elif 'mileage' in part or 'miles' in part:
+                mileage = part.split(':')[-1].strip() if ':' in part else part
+            elif 'sunroof' in part or 'camera' in part or 'bluetooth' in part:
+                if 'must' in part or 'required' in part:
+                    must_have_features = part
+                else:
+                    nice_to_have_features = part
+            elif 'cash' in part or 'loan' in part or 'finance' in part:
+                payment_method = part
+            elif 'commute' in part or 'work' in part or 'family' in part:
+                intended_use = part
+            elif 'week' in part or 'month' in part or 'day' in part:
+                purchase_date = part
+            elif 'title' in part or 'clean' in part:
+                special_considerations = part
+        
+        # Start building the formatted output
+        formatted_output = f"""Comprehensive Car Buying Report
+Current Date: {current_date}
+
+Customer Profile
+State: {current_state}
+Vehicle Type: {car_type}
+Color: {color}
+Mileage: {mileage}
+Budget: {budget_range}
+Must-Have Features: {must_have_features}
+Nice-to-Have Features: {nice_to_have_features}
+Method of Payment: {payment_method}
+Intended Use: {intended_use}
+Desired Purchase Date: {purchase_date}
+Special Consideration: {special_considerations}
+
+"""
+        
+        # Add the crew results
+        if result:
+            result_str = str(result)
+            
+            # Try to extract and format specific sections
+            if "Top" in result_str and "Recommended" in result_str:
+                # Extract the top recommendations section
+                formatted_output += "Top 10 Recommended Vehicles\n"
+                # Add the table format
+                formatted_output += "| Rank | Vehicle Model | Price | Mileage | Location | Seller Type | Link |\n"
+                formatted_output += "|------|-----------------------------|--------|---------|------------------|------------------|------------------------------------------------|\n"
+                
+                # Try to extract vehicle information from the result
+                # This is a simplified approach - you may need to enhance this
+                lines = result_str.split('\n')
+                rank = 1
+                for line in lines:
+                    if any(keyword in line.lower() for keyword in ['nissan', 'toyota', 'honda', 'hyundai', 'mazda', 'subaru', 'ford', 'chevrolet', 'volkswagen', 'kia']):
+                        # Extract vehicle info (simplified)
+                        parts = line.split('|')
+                        if len(parts) >= 6:
+                            formatted_output += f"| {rank} | {parts[0].strip()} | {parts[1].strip()} | {parts[2].strip()} | {parts[3].strip()} | {parts[4].strip()} | {parts[5].strip()} |\n"
+                        else:
+                            formatted_output += f"| {rank} | {line.strip()} | $TBD | TBD | TBD | TBD | TBD |\n"
+                        rank += 1
+                        if rank > 10:
+                            break
+                
+                formatted_output += "\n"
+            
+            # Add the rest of the result content
+            formatted_output += result_str
+            
+            # Add standard sections if not present
+            if "Detailed Reasons" not in result_str:
+                formatted_output += "\n\nDetailed Reasons to Buy Each Vehicle\n"
+                formatted_output += "Detailed analysis of each recommended vehicle will be provided based on the research.\n"
+            
+            if "Out-of-State Registration" not in result_str:
+                formatted_output += "\n\nOut-of-State Registration Requirements\n"
+                formatted_output += "For vehicles purchased outside " + current_state + ", the following requirements must be met:\n"
+                formatted_output += "Documentation: Bill of sale, title transfer documentation, and any loan agreements if applicable.\n"
+                formatted_output += "Fees: Expect to pay registration fees and sales tax based on the purchase price.\n"
+                formatted_output += "Inspection: Some vehicles may require a smog check before registration.\n"
+                formatted_output += "Timeline: Registration should occur within 10 days of purchase to avoid penalties.\n"
+                formatted_output += "Process: Visit the " + current_state + " DMV website for step-by-step instructions.\n"
+            
+            if "Negotiation Strategies" not in result_str:
+                formatted_output += "\n\nNegotiation Strategies\n"
+                formatted_output += "| Vehicle Model | Negotiation Range | Suggested Offer Price |\n"
+                formatted_output += "|---------------------------|---------------------|-----------------------|\n"
+                formatted_output += "| [Vehicle] | [Range] | [Suggested Price] |\n"
+                formatted_output += "\nTips for Negotiation:\n"
+                formatted_output += "Research market values and be prepared to justify your offer.\n"
+                formatted_output += "Highlight any issues found during inspections as leverage.\n"
+                formatted_output += "Be ready to walk away if the deal doesn't meet your budget.\n"
+            
+            if "Inspection Checklists" not in result_str:
+                formatted_output += "\n\nInspection Checklists\n"
+                formatted_output += "Exterior Inspection\n"
+                formatted_output += "Body condition (dents, scratches)\n"
+                formatted_output += "Paint consistency\n"
+                formatted_output += "Tire tread and wear\n"
+                formatted_output += "Functional lights and signals\n"
+                formatted_output += "\nInterior Inspection\n"
+                formatted_output += "Seat condition\n"
+                formatted_output += "Dashboard functionality\n"
+                formatted_output += "Air conditioning and heating\n"
+                formatted_output += "Infotainment system operation\n"
+                formatted_output += "\nEngine and Mechanical Components\n"
+                formatted_output += "Fluid levels\n"
+                formatted_output += "Signs of leaks\n"
+                formatted_output += "Battery condition\n"
+                formatted_output += "Brake responsiveness\n"
+            
+            if "Final Recommendations" not in result_str:
+                formatted_output += "\n\nFinal Recommendations\n"
+                formatted_output += "Next Steps:\n"
+                formatted_output += "Research and contact sellers for preferred vehicles.\n"
+                formatted_output += "Schedule inspections and test drives.\n"
+                formatted_output += "Prepare negotiation strategies based on research.\n"
+                formatted_output += "Complete necessary paperwork for out-of-state registration if applicable.\n"
+                formatted_output += "Finalize purchase before the desired purchase date.\n"
+                formatted_output += "\nBy following this structured approach, you can confidently navigate the car buying process and select a vehicle that meets your needs and budget.\n"
+        else:
+            formatted_output += "No results generated from the crew analysis.\n"
+        
+        return formatted_output
+        
+    except Exception as e:
+        print(f"❌ Error formatting results: {e}")
+        # Return the raw result if formatting fails
+        return str(result) if result else "No results generated"
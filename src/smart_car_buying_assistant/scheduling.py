@@ -0,0 +1,68 @@
+"""
+Priority classes and fair-share weights of the clients that submit jobs.
+
+The job store does the scheduling (see ``job_store``); this module decides,
+per submission, which client it belongs to, its priority class and its
+client's weight, from ``config/scheduling.yaml``.
+"""
+
+import hashlib
+import os
+import threading
+
+import yaml
+
+from smart_car_buying_assistant.job_store import DEFAULT_PROMOTE_AFTER, DEFAULT_PROMOTE_EVERY, PRIORITY_CLASSES
+
+SCHEDULING_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config', 'scheduling.yaml')
+
+
+def client_id(api_key=None, remote_addr=None):
+    """Stable id of a submitting client, without storing its API key"""
+    if api_key:
+        return 'key:' + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+class SchedulingPolicy:
+    """Priority class and weight of each client's submissions"""
+
+    def __init__(self, config=None):
+        config = config if config is not None else load_scheduling_config()
+        self.promote_after = float(config.get('promote_after_seconds', DEFAULT_PROMOTE_AFTER))
+        self.promote_every = max(1, int(config.get('promote_every_claims', DEFAULT_PROMOTE_EVERY)))
+        self.default_weight = float(config.get('default_weight', 1))
+        self.clients = config.get('clients') or {}
+
+    def weight(self, client):
+        return float((self.clients.get(client) or {}).get('weight', self.default_weight))
+
+    def priority(self, client, requested=None):
+        """Priority class of a submission; API clients get batch unless they are allowed interactive jobs"""
+        if requested is not None and requested not in PRIORITY_CLASSES:
+            raise ValueError(f"priority must be one of: {', '.join(PRIORITY_CLASSES)}")
+        interactive = not client.startswith('key:') or bool((self.clients.get(client) or {}).get('interactive'))
+        return 'batch' if requested == 'batch' or not interactive else 'interactive'
+
+
+def load_scheduling_config(path=SCHEDULING_CONFIG_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        print(f"⚠️  Scheduling config not found at {path}, every client has the same weight")
+        return {}
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_scheduling_policy():
+    """Return the process-wide scheduling policy"""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = SchedulingPolicy()
+    return _policy
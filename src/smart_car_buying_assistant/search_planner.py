@@ -0,0 +1,202 @@
+"""
+Search query planning and concurrent prefetch.
+
+Before the crew starts, the searches the agents would otherwise run one after
+another inside their reasoning loops are derived from the structured inputs,
+run concurrently against every configured backend (Serper and Brave), and
+deduplicated (by URL, and by listing: see ``listings``) into a shared result
+pool.  The pool is passed to the tasks through the ``{market_search_results}``,
+``{legal_search_results}`` and ``{valuation_search_results}`` placeholders in
+tasks.yaml.
+"""
+
+import asyncio
+import re
+from urllib.parse import urlsplit
+
+from smart_car_buying_assistant.listings import KNOWN_MAKES, ListingDeduplicator
+from smart_car_buying_assistant.tools.registry import get_tool_registry
+
+# Placeholder in tasks.yaml that receives the results of each query purpose
+SEARCH_CONTEXT_INPUTS = {
+    'market': 'market_search_results',
+    'legal': 'legal_search_results',
+    'valuation': 'valuation_search_results',
+}
+
+# Form inputs each placeholder's queries are planned from
+SEARCH_CONTEXT_SOURCES = {
+    'market_search_results': ('user_requirements', 'car_type', 'budget_range', 'current_state'),
+    'legal_search_results': ('current_state',),
+    'valuation_search_results': ('user_requirements', 'car_type', 'budget_range'),
+}
+
+NO_SEARCH_RESULTS = "No pre-fetched search results are available; use the search tool if you need live data."
+
+
+def empty_search_context():
+    """Task inputs to use when no searches were prefetched"""
+    return {placeholder: NO_SEARCH_RESULTS for placeholder in SEARCH_CONTEXT_INPUTS.values()}
+
+
+def mentioned_makes(user_requirements):
+    """Car makes named in the free-text requirements"""
+    words = set(re.findall(r'[a-z]+', (user_requirements or '').lower()))
+    return [make for make in KNOWN_MAKES if make in words]
+
+
+def plan_segment_queries(state, car_type, budget=''):
+    """Searches that depend only on the state, car type and budget, not on the free text
+
+    Returns a list of (purpose, query) tuples.
+    """
+    state, car_type, budget = state.strip(), car_type.strip(), budget.strip()
+    queries = [
+        ('legal', f"{state} out of state vehicle purchase registration requirements"),
+        ('legal', f"{state} sales tax title transfer car bought in another state"),
+    ]
+    if car_type:
+        queries += [
+            ('market', f"used {car_type} for sale under {budget} {state}"),
+            ('market', f"best used {car_type} {budget} AutoTrader CarGurus Cars.com"),
+            ('valuation', f"{car_type} fair market value {budget} KBB Edmunds"),
+        ]
+    return queries
+
+
+def plan_queries(inputs):
+    """Derive the likely search set from the structured requirements
+
+    Returns a list of (purpose, query) tuples.
+    """
+    car_type = inputs.get('car_type', '').strip()
+    budget = inputs.get('budget_range', '').strip()
+    state = inputs.get('current_state', '').strip()
+
+    queries = plan_segment_queries(state, car_type, budget)
+    for make in mentioned_makes(inputs.get('user_requirements'))[:3]:
+        queries.append(('market', f"used {make} {car_type} for sale {state} under {budget}"))
+        queries.append(('valuation', f"{make} {car_type} average price {budget}"))
+    return queries
+
+
+def _normalize_url(url):
+    parts = urlsplit(url or '')
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def parse_results(raw, backend):
+    """Turn a backend response into a list of {title, link, snippet} items"""
+    items = []
+    if isinstance(raw, dict):
+        for result in raw.get('organic', []):
+            items.append({
+                'title': result.get('title', ''),
+                'link': result.get('link', ''),
+                'snippet': result.get('snippet', ''),
+            })
+    elif isinstance(raw, str):
+        # BraveSearchTool returns "Title: ...\nLink: ...\nSnippet: ...\n---" blocks
+        for block in raw.split('---'):
+            fields = dict(re.findall(r'^(Title|Link|Snippet): (.*)$', block, re.M))
+            if fields.get('Link'):
+                items.append({
+                    'title': fields.get('Title', ''),
+                    'link': fields['Link'],
+                    'snippet': fields.get('Snippet', ''),
+                })
+    for item in items:
+        item['source'] = backend
+    return items
+
+
+def _render_item(index, item):
+    return f"{index}. {item['title']} ({item['link']})\n   {item['snippet']}"
+
+
+class SearchResultPool:
+    """Deduplicated search results shared by every agent of a session"""
+
+    def __init__(self):
+        self.items = {purpose: [] for purpose in SEARCH_CONTEXT_INPUTS}
+        self._seen = {purpose: set() for purpose in SEARCH_CONTEXT_INPUTS}
+        self._listings = {purpose: ListingDeduplicator() for purpose in SEARCH_CONTEXT_INPUTS}
+        self.queries = 0
+        self.duplicates = 0
+        self.listing_duplicates = 0
+        self.duplicate_tokens = 0
+
+    def add(self, purpose, items):
+        for item in items:
+            key = _normalize_url(item['link']) or item['title'].lower()
+            if key in self._seen[purpose]:
+                self.duplicates += 1
+            elif self._listings[purpose].is_duplicate(f"{item['title']}\n{item['snippet']}"):
+                # The same car on another site, or the other backend's description of it
+                self.listing_duplicates += 1
+            else:
+                self._seen[purpose].add(key)
+                self.items[purpose].append(item)
+                continue
+            # Prompt tokens the duplicate would have added to the rendered results
+            self.duplicate_tokens += len(_render_item(0, item)) // 4
+
+    def render(self, purpose, limit=12):
+        items = self.items.get(purpose, [])[:limit]
+        if not items:
+            return NO_SEARCH_RESULTS
+        return '\n'.join(_render_item(index, item) for index, item in enumerate(items, 1))
+
+    def as_inputs(self, limit=12):
+        """Task inputs for the search context placeholders"""
+        return {
+            placeholder: self.render(purpose, limit)
+            for purpose, placeholder in SEARCH_CONTEXT_INPUTS.items()
+        }
+
+    def stats(self):
+        return {
+            'queries': self.queries,
+            'results': {purpose: len(items) for purpose, items in self.items.items()},
+            'duplicates_removed': self.duplicates,
+            'listing_duplicates_removed': self.listing_duplicates,
+            'duplicate_tokens_removed': self.duplicate_tokens,
+        }
+
+
+async def _run_queries(queries, registry, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(purpose, query, backend):
+        async with semaphore:
+            raw = await asyncio.to_thread(registry.search_backend, backend, query)
+        return purpose, backend, raw
+
+    jobs = [
+        run_one(purpose, query, backend)
+        for purpose, query in queries
+        for backend in registry.backends
+    ]
+    return await asyncio.gather(*jobs)
+
+
+def prefetch_search_results(inputs, registry=None, max_concurrency=8):
+    """Run the planned queries concurrently and return the shared result pool"""
+    registry = registry or get_tool_registry()
+    pool = SearchResultPool()
+    if not registry.backends:
+        return pool
+
+    queries = plan_queries(inputs)
+    responses = asyncio.run(_run_queries(queries, registry, max_concurrency))
+    pool.queries = len(responses)
+    for purpose, backend, raw in responses:
+        if raw is not None:
+            pool.add(purpose, parse_results(raw, backend))
+    print(f"🔎 Prefetched {pool.queries} searches: {pool.stats()['results']} results, "
+          f"{pool.duplicates + pool.listing_duplicates} duplicates removed "
+          f"({pool.listing_duplicates} repeated listings, ~{pool.duplicate_tokens} tokens)")
+    return pool
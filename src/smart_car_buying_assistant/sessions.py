@@ -0,0 +1,113 @@
+"""
+Session identifiers and a concurrency-safe in-memory session registry.
+
+Session ids are random and unguessable, so two submissions in the same second
+never share an id and one user cannot enumerate another user's sessions.
+
+The registry stores every session as an immutable snapshot.  Writers build a
+new snapshot under the lock of the stripe the session hashes to and swap it in
+atomically; readers never lock and always see a complete snapshot, never a
+half-applied update.
+"""
+
+import re
+import secrets
+import threading
+from types import MappingProxyType
+
+SESSION_ID_PREFIX = 'session_'
+SESSION_ID_PATTERN = re.compile(r'^session_[A-Za-z0-9_-]{16,64}$')
+
+
+def new_session_id():
+    """Return a new random session id (128 bits of entropy)"""
+    return SESSION_ID_PREFIX + secrets.token_urlsafe(16)
+
+
+def is_valid_session_id(session_id):
+    """Check that a session id has the shape produced by new_session_id()"""
+    return bool(session_id) and SESSION_ID_PATTERN.match(session_id) is not None
+
+
+def _freeze(value):
+    """Recursively convert a record into read-only containers"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Recursively convert a frozen record back into plain dicts and lists"""
+    if isinstance(value, MappingProxyType):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class SessionRegistry:
+    """Lock-striped map of session id -> immutable session snapshot"""
+
+    def __init__(self, stripes=16):
+        self._stripes = [(threading.Lock(), {}) for _ in range(max(1, stripes))]
+
+    def _stripe(self, session_id):
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def create(self, session_id, record):
+        """Register a new session; returns False if the id is already taken"""
+        lock, sessions = self._stripe(session_id)
+        with lock:
+            if session_id in sessions:
+                return False
+            sessions[session_id] = _freeze(dict(record))
+            return True
+
+    def update(self, session_id, **fields):
+        """Apply several field changes as one atomic snapshot swap"""
+        return self.mutate(session_id, lambda record: record.update(fields))
+
+    def mutate(self, session_id, change):
+        """Apply ``change(record)`` to a private copy and swap it in atomically
+
+        Returns the new snapshot, or None if the session does not exist.
+        """
+        lock, sessions = self._stripe(session_id)
+        with lock:
+            current = sessions.get(session_id)
+            if current is None:
+                return None
+            record = _thaw(current)
+            change(record)
+            sessions[session_id] = snapshot = _freeze(record)
+            return snapshot
+
+    def snapshot(self, session_id):
+        """Return the current read-only snapshot of a session, or None"""
+        _, sessions = self._stripe(session_id)
+        return sessions.get(session_id)
+
+    def get(self, session_id):
+        """Return a mutable copy of the current session record, or None"""
+        snapshot = self.snapshot(session_id)
+        return None if snapshot is None else _thaw(snapshot)
+
+    def remove(self, session_id):
+        lock, sessions = self._stripe(session_id)
+        with lock:
+            return sessions.pop(session_id, None) is not None
+
+    def items(self):
+        """Iterate over (session id, snapshot) pairs, one stripe at a time"""
+        for lock, sessions in self._stripes:
+            with lock:
+                pairs = list(sessions.items())
+            yield from pairs
+
+    def __contains__(self, session_id):
+        return self.snapshot(session_id) is not None
+
+    def __len__(self):
+        return sum(len(sessions) for _, sessions in self._stripes)
@@ -0,0 +1,304 @@
+"""
+Span tracing of a session: session -> task -> agent -> LLM call / tool call -> search backend.
+
+Spans form a parent/child tree per session and carry timings plus
+attributes such as the model, token counts and the search backend.  The
+session and tool/LLM spans are opened by the code that does the work; task
+and agent spans come from the crewai event bus.  Finished sessions are
+exported in one write, either as plain JSON lines (one span per line) or as
+OTLP/JSON ``resourceSpans`` lines that OpenTelemetry tooling can import.
+
+Tunables:
+
+    SPAN_EXPORT        'jsonl' (default), 'otlp' or 'none'
+    SPAN_EXPORT_PATH   file the spans are appended to (default spans.jsonl)
+    SPAN_EXPORT_MAX_MB size at which the file is rolled over to <path>.1, replacing the previous one (default 50, 0 for no limit)
+
+``trace_report`` prints critical paths and hotspots from the exported file.
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from crewai.events.event_bus import crewai_event_bus
+from crewai.events.types.agent_events import (
+    AgentExecutionCompletedEvent,
+    AgentExecutionErrorEvent,
+    AgentExecutionStartedEvent,
+)
+from crewai.events.types.task_events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+
+SERVICE_NAME = 'smart-car-buying-assistant'
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed operation within a session trace"""
+
+    def __init__(self, name, kind, trace_id, parent=None, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start = time.time()
+        self.end = None
+        # Spans of the whole session, shared by every span of the trace
+        self.collected = parent.collected if parent is not None else []
+        self.collected.append(self)
+
+    def set(self, **attributes):
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def finish(self, error=None):
+        if self.end is None:
+            self.end = time.time()
+        if error is not None:
+            self.status = 'error'
+            self.attributes['error'] = str(error)[:500]
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent is not None else None,
+            'name': self.name,
+            'kind': self.kind,
+            'start': self.start,
+            'end': self.end if self.end is not None else time.time(),
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': value if isinstance(value, str) else json.dumps(value, default=str)}
+
+
+def to_otlp(spans):
+    """Wrap span dicts in an OTLP/JSON ExportTraceServiceRequest"""
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{
+            'scope': {'name': 'smart_car_buying_assistant'},
+            'spans': [{
+                'traceId': span['trace_id'],
+                'spanId': span['span_id'],
+                'parentSpanId': span['parent_id'] or '',
+                'name': span['name'],
+                'kind': 1,
+                'startTimeUnixNano': str(int(span['start'] * 1e9)),
+                'endTimeUnixNano': str(int(span['end'] * 1e9)),
+                'attributes': [{'key': 'span.kind', 'value': {'stringValue': span['kind']}}] + [
+                    {'key': key, 'value': _otlp_value(value)} for key, value in span['attributes'].items()
+                ],
+                'status': {'code': 2 if span['status'] == 'error' else 1},
+            } for span in spans],
+        }],
+    }]}
+
+
+def _from_otlp_value(value):
+    kind, raw = next(iter(value.items()))
+    return int(raw) if kind == 'intValue' else raw
+
+
+def from_otlp(request):
+    """Turn an OTLP/JSON request written by ``to_otlp`` back into span dicts"""
+    spans = []
+    for resource_spans in request.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for span in scope_spans.get('spans', []):
+                attributes = {item['key']: _from_otlp_value(item['value']) for item in span.get('attributes', [])}
+                spans.append({
+                    'trace_id': span['traceId'],
+                    'span_id': span['spanId'],
+                    'parent_id': span.get('parentSpanId') or None,
+                    'name': span['name'],
+                    'kind': attributes.pop('span.kind', 'internal'),
+                    'start': int(span['startTimeUnixNano']) / 1e9,
+                    'end': int(span['endTimeUnixNano']) / 1e9,
+                    'status': 'error' if span.get('status', {}).get('code') == 2 else 'ok',
+                    'attributes': attributes,
+                })
+    return spans
+
+
+def load_spans(path):
+    """Read span dicts from a file written by either exporter"""
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            spans.extend(from_otlp(record) if 'resourceSpans' in record else [record])
+    return spans
+
+
+class FileSpanExporter:
+    """Appends finished session traces to a local file, rolled over to ``<path>.1`` past ``max_bytes``"""
+
+    def __init__(self, path, format='jsonl', max_bytes=0):
+        self.path = path
+        self.format = format
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _roll_over(self, incoming):
+        """Move the file to ``<path>.1`` when ``incoming`` more bytes would take it past ``max_bytes``"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        # A session is never split across the two files
+        if size and size + incoming > self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+
+    def export(self, spans):
+        records = [span.to_dict() for span in spans]
+        if self.format == 'otlp':
+            lines = [json.dumps(to_otlp(records), default=str)]
+        else:
+            lines = [json.dumps(record, default=str) for record in records]
+        data = '\n'.join(lines) + '\n'
+        try:
+            with self._lock:
+                if self.max_bytes:
+                    self._roll_over(len(data.encode('utf-8')))
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+        except OSError as e:
+            print(f"⚠️  Could not export spans to {self.path}: {e}")
+
+
+def create_exporter():
+    """Build the exporter selected by SPAN_EXPORT, or None when exporting is disabled"""
+    export = os.getenv('SPAN_EXPORT', 'jsonl').strip().lower()
+    if export in ('', 'none', 'off'):
+        return None
+    if export not in ('jsonl', 'otlp'):
+        print(f"⚠️  Unknown SPAN_EXPORT '{export}', using jsonl")
+        export = 'jsonl'
+    max_bytes = int(float(os.getenv('SPAN_EXPORT_MAX_MB', '50')) * 1024 * 1024)
+    return FileSpanExporter(os.getenv('SPAN_EXPORT_PATH', 'spans.jsonl'), export, max_bytes)
+
+
+class Tracer:
+    """Creates spans under the current session and exports finished sessions"""
+
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+        self._installed = False
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Open task and agent spans from the crewai event bus (once per process)"""
+        if self._installed:
+            return self
+        with self._lock:
+            if not self._installed:
+                crewai_event_bus.register_handler(TaskStartedEvent, self._on_started)
+                crewai_event_bus.register_handler(AgentExecutionStartedEvent, self._on_started)
+                for event_type in (TaskCompletedEvent, TaskFailedEvent,
+                                   AgentExecutionCompletedEvent, AgentExecutionErrorEvent):
+                    crewai_event_bus.register_handler(event_type, self._on_finished)
+                self._installed = True
+        return self
+
+    @staticmethod
+    def _event_kind(event):
+        return 'task' if event.type.startswith('task_') else 'agent'
+
+    def _on_started(self, source, event):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        kind = self._event_kind(event)
+        if kind == 'task':
+            name = getattr(event.task, 'name', None) or 'task'
+            attributes = {'agent': getattr(getattr(event.task, 'agent', None), 'role', None)}
+        else:
+            name = getattr(event.agent, 'role', None) or 'agent'
+            attributes = {'task': getattr(event.task, 'name', None)}
+        span = Span(name, kind, parent.trace_id, parent, {k: v for k, v in attributes.items() if v})
+        # The event bus calls handlers in the emitting thread, so this span becomes
+        # the parent of the LLM and tool calls made until the matching end event
+        _current_span.set(span)
+
+    def _on_finished(self, source, event):
+        span = _current_span.get()
+        kind = self._event_kind(event)
+        # Close any spans left open below the one this event ends
+        while span is not None and span.kind != kind and span.kind != 'session':
+            span.finish()
+            span = span.parent
+        if span is None or span.kind != kind:
+            return
+        span.finish(error=getattr(event, 'error', None))
+        _current_span.set(span.parent)
+
+    @contextmanager
+    def session(self, session_id, **attributes):
+        """Root span of a session; its spans are exported when the block ends"""
+        self.install()
+        span = Span('session', 'session', secrets.token_hex(16), attributes={'session_id': session_id, **attributes})
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.finish(error=e)
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+            for child in span.collected:
+                child.finish()
+            if self.exporter is not None:
+                self.exporter.export(span.collected)
+
+    @contextmanager
+    def span(self, name, kind, **attributes):
+        """Child span of the current span; does nothing outside a session"""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(name, kind, parent.trace_id, parent, {k: v for k, v in attributes.items() if v is not None})
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.finish(error=e)
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the process-wide tracer"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(create_exporter())
+    return _tracer
@@ -0,0 +1,311 @@
+"""
+Live report sections for sessions that are still running.
+
+While a crew runs, every finished task's output is published as its report
+section, and the tasks of the long report sections (valuation, negotiation
+and inspection by default) stream their LLM tokens: the text after the
+agent's ``Final Answer:`` grows in the section as it is generated.  The
+worker writes the live sections to the job store (at most once per flush
+interval), so dedicated worker processes stream too; ``/stream/<session_id>``
+polls the store and sends the new text to the results page as server-sent
+events.
+
+Tunables:
+
+    STREAM_SECTIONS        sections whose tasks stream tokens (default 'valuation,negotiation,inspection'; 'none' turns it off)
+    STREAM_FLUSH_SECONDS   shortest interval between two writes of the live sections (default 0.5)
+    STREAM_POLL_SECONDS    how often /stream/<session_id> reads the job store (default 0.25)
+    STREAM_MAX_SECONDS     longest a /stream/<session_id> connection stays open (default 1800)
+"""
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from crewai.events.event_bus import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallStartedEvent, LLMStreamChunkEvent
+from crewai.events.types.task_events import TaskCompletedEvent
+
+from smart_car_buying_assistant.report import REPORT_SECTIONS, TASK_SECTIONS
+from smart_car_buying_assistant.tracing import crew_verbose
+
+DEFAULT_STREAM_SECTIONS = 'valuation,negotiation,inspection'
+
+FINAL_ANSWER = 'Final Answer:'
+
+_current_stream = contextvars.ContextVar('report_stream', default=None)
+_quiet_console = contextvars.ContextVar('quiet_console', default=False)
+
+
+def streamed_sections():
+    """Report sections whose tasks stream their LLM tokens"""
+    value = os.getenv('STREAM_SECTIONS', DEFAULT_STREAM_SECTIONS).strip().lower()
+    if value in ('', 'none', 'off'):
+        return frozenset()
+    return frozenset(name.strip() for name in value.split(',') if name.strip() in REPORT_SECTIONS)
+
+
+def _task_key(task):
+    return str(getattr(task, 'id', None) or id(task))
+
+
+def _section(task_name):
+    return TASK_SECTIONS.get(task_name or '')
+
+
+class ReportStream:
+    """Live text of one session's report sections, published to the job store"""
+
+    def __init__(self, publish, sections=None, flush_interval=None):
+        self.publish = publish
+        self.streamed = streamed_sections() if sections is None else frozenset(sections)
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else float(os.getenv('STREAM_FLUSH_SECONDS', '0.5')))
+        self._parts = {}      # section -> {task key: text}, in the order the tasks started
+        self._headings = {}   # task key -> heading of a per-vehicle part
+        self._calls = {}      # task key -> [response text so far, start of the final answer]
+        self._done = set()
+        self._dirty = False
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def covers(self, task_name):
+        """Whether the LLM calls of a task should stream"""
+        return TASK_SECTIONS.get(task_name or '') in self.streamed
+
+    def label(self, task_name, key, heading):
+        """Show a task's text under ``heading`` (per-vehicle runs of a MapTask)"""
+        with self._lock:
+            self._headings[key] = heading
+            # Reserve the part's place so the vehicles stay in candidate order
+            if _section(task_name):
+                self._parts.setdefault(_section(task_name), {}).setdefault(key, '')
+
+    def call_started(self, key):
+        with self._lock:
+            self._calls[key] = ['', None]
+
+    def add_chunk(self, task_name, key, chunk):
+        section = _section(task_name)
+        if section not in self.streamed or not chunk:
+            return
+        with self._lock:
+            call = self._calls.setdefault(key, ['', None])
+            call[0] += chunk
+            if call[1] is None:
+                # Thoughts and tool calls come before the final answer and are not shown
+                index = call[0].rfind(FINAL_ANSWER)
+                if index < 0:
+                    return
+                call[1] = index + len(FINAL_ANSWER)
+            self._parts.setdefault(section, {})[key] = call[0][call[1]:].lstrip()
+            self._dirty = True
+        self.flush()
+
+    def task_completed(self, task_name, key, raw):
+        """Replace the streamed text of a task with its final output"""
+        section = _section(task_name)
+        if not section or raw is None:
+            return
+        with self._lock:
+            self._calls.pop(key, None)
+            if key in self._headings:
+                self._parts.setdefault(section, {})[key] = raw.strip()
+            else:
+                # A whole task (or a MapTask's merged output) replaces its per-vehicle parts
+                self._parts[section] = {key: raw.strip()}
+                self._done.add(section)
+            self._dirty = True
+        self.flush(force=True)
+
+    def snapshot(self):
+        with self._lock:
+            sections = {}
+            for section in REPORT_SECTIONS:
+                parts = self._parts.get(section)
+                if not parts or not any(parts.values()):
+                    continue
+                sections[section] = '\n\n'.join(
+                    f"### {self._headings[key]}\n\n{text}" if key in self._headings else text
+                    for key, text in parts.items() if text
+                )
+            return {'sections': sections, 'done': [s for s in REPORT_SECTIONS if s in self._done]}
+
+    def flush(self, force=False):
+        """Publish the live sections if they changed and the flush interval has passed"""
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirty or (not force and now - self._last_flush < self.flush_interval):
+                return
+            self._dirty = False
+            self._last_flush = now
+        try:
+            self.publish(self.snapshot())
+        except Exception as e:
+            # Streaming is best effort; the report is stored when the session finishes
+            print(f"⚠️  Could not publish live report sections: {e}")
+
+
+# LLM events only carry the id and name of their task
+def _on_call_started(source, event):
+    stream = _current_stream.get()
+    if stream is not None and event.task_id:
+        stream.call_started(str(event.task_id))
+
+
+def _on_chunk(source, event):
+    stream = _current_stream.get()
+    if stream is not None and event.task_id:
+        stream.add_chunk(event.task_name, str(event.task_id), event.chunk)
+
+
+def _on_task_completed(source, event):
+    stream = _current_stream.get()
+    if stream is not None and event.task is not None:
+        stream.task_completed(event.task.name, _task_key(event.task), getattr(event.output, 'raw', None))
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+class _ConsoleFilter:
+    """stdout that drops what is written from a context inside ``quiet_console``"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, text):
+        if _quiet_console.get():
+            return len(text)
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+@contextmanager
+def quiet_console():
+    """Drop the console output of the block unless crews are verbose
+
+    crewai prints every chunk of every streamed call to stdout, whatever the
+    crew's verbosity, and has no setting to stop it.  Only the context that
+    enters the block (and the calls it starts) is silenced; the rest of the
+    process prints as usual.
+    """
+    if crew_verbose():
+        yield
+        return
+    with _install_lock:
+        if not isinstance(sys.stdout, _ConsoleFilter):
+            sys.stdout = _ConsoleFilter(sys.stdout)
+    token = _quiet_console.set(True)
+    try:
+        yield
+    finally:
+        _quiet_console.reset(token)
+
+
+def _install():
+    """Register the event bus handlers once per process"""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if not _installed:
+            crewai_event_bus.register_handler(LLMCallStartedEvent, _on_call_started)
+            crewai_event_bus.register_handler(LLMStreamChunkEvent, _on_chunk)
+            crewai_event_bus.register_handler(TaskCompletedEvent, _on_task_completed)
+            _installed = True
+
+
+@contextmanager
+def stream_report(store, session_id):
+    """Publish the live report sections of the crew run inside the block to the job store"""
+    _install()
+    stream = ReportStream(lambda snapshot: store.update(session_id, stream=snapshot))
+    token = _current_stream.set(stream)
+    try:
+        yield stream
+    finally:
+        _current_stream.reset(token)
+
+
+def current_report_stream():
+    """Live report of the session running in this context, or None"""
+    return _current_stream.get()
+
+
+def publish_task_output(task, raw):
+    """Show the output of a task that crewai did not report as completed (skipped, merged or reused)"""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.task_completed(task.name, _task_key(task), raw)
+
+
+def label_task(task, heading):
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.label(task.name, _task_key(task), heading)
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def live_events(store, session_id, poll_interval=None, max_seconds=None, heartbeat_seconds=15):
+    """Server-sent events with a session's status and live report sections, until it finishes
+
+    The first event for a section carries its whole text; later ones carry
+    only the appended text when the section grew at the end.
+    """
+    poll_interval = poll_interval if poll_interval is not None else float(os.getenv('STREAM_POLL_SECONDS', '0.25'))
+    max_seconds = max_seconds if max_seconds is not None else float(os.getenv('STREAM_MAX_SECONDS', '1800'))
+    deadline = time.monotonic() + max_seconds
+    last_sent = time.monotonic()
+    sent_status = None
+    sent_sections = {}
+    sent_done = set()
+    yield f"retry: {int(poll_interval * 4000)}\n\n"
+    while True:
+        live = store.get_live(session_id)
+        if live is None:
+            yield server_sent_event('end', {'status': 'missing'})
+            return
+        events = []
+        status = {field: live[field] for field in ('status', 'progress', 'current_task')}
+        if status != sent_status:
+            events.append(server_sent_event('status', status))
+            sent_status = status
+        stream = live.get('stream') or {}
+        for section, text in (stream.get('sections') or {}).items():
+            done = section in (stream.get('done') or ())
+            previous = sent_sections.get(section)
+            if previous == text and (not done or section in sent_done):
+                continue
+            if previous is not None and text.startswith(previous):
+                events.append(server_sent_event('section', {'section': section, 'append': text[len(previous):],
+                                                            'done': done}))
+            else:
+                events.append(server_sent_event('section', {'section': section, 'text': text, 'done': done}))
+            sent_sections[section] = text
+            if done:
+                sent_done.add(section)
+        if live['status'] in ('completed', 'error'):
+            events.append(server_sent_event('end', {'status': live['status'], 'error': live.get('error')}))
+        if events:
+            yield ''.join(events)
+            last_sent = time.monotonic()
+            if live['status'] in ('completed', 'error'):
+                return
+        elif time.monotonic() - last_sent >= heartbeat_seconds:
+            # Comment line; keeps proxies from closing an idle connection
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(poll_interval)
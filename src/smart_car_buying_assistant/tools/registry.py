@@ -0,0 +1,294 @@
+"""
+Process-wide search tool registry with per-backend circuit breakers.
+
+Search backends (Serper, Brave) are built once per process instead of once per
+agent per session.  Agents get a ``ResilientSearchTool`` that tries their
+preferred backends in order, enforces a per-call timeout, and routes around a
+backend whose circuit breaker is open.  When no backend is usable the tool
+returns a local fallback answer instead of making the agent wait.  Every
+backend call waits for the backend's shared rate limit (see ``rate_limits``).
+
+Tunables:
+
+    SEARCH_TIMEOUT_SECONDS        per-call timeout before trying the next backend (default 15)
+    SEARCH_FAILURE_THRESHOLD      consecutive failures that open a breaker (default 3)
+    SEARCH_BREAKER_RESET_SECONDS  how long a breaker stays open before a trial call (default 60)
+    SEARCH_CACHE_TTL_SECONDS      how long identical queries are answered from cache (default 900)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Type
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field, PrivateAttr
+
+from smart_car_buying_assistant.cassettes import current_cassette
+from smart_car_buying_assistant.rate_limits import get_rate_limiter
+from smart_car_buying_assistant.spans import get_tracer
+from smart_car_buying_assistant.usage import current_usage
+
+# Search backends each agent may use, in order of preference
+AGENT_SEARCH_BACKENDS = {
+    'car_market_research_specialist': ('serper', 'brave'),
+    'interstate_car_purchase_legal_advisor': ('serper', 'brave'),
+    'vehicle_valuation_expert': ('serper', 'brave'),
+    'car_purchase_negotiation_strategist': ('serper', 'brave'),
+}
+
+BACKEND_ENV_VARS = {
+    'serper': 'SERPER_API_KEY',
+    'brave': 'BRAVE_API_KEY',
+}
+
+LOCAL_FALLBACK_RESULT = (
+    "Live search is temporarily unavailable. Answer from your own knowledge of the "
+    "car market and clearly state that listings and prices could not be verified online."
+)
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial call after a cooldown"""
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60.0, window=50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._trial_in_flight = False
+
+    def allow(self):
+        """Return True if a call may be made to this backend now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                # Let exactly one trial call through
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency):
+        with self._lock:
+            self.calls.append((latency, True))
+            self.consecutive_failures = 0
+            if self.state != 'closed':
+                print(f"✅ Search backend {self.name} recovered, closing circuit breaker")
+            self.state = 'closed'
+            self._trial_in_flight = False
+
+    def record_failure(self, latency):
+        with self._lock:
+            self.calls.append((latency, False))
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"⚠️  Search backend {self.name} is failing, opening circuit breaker")
+                self.state = 'open'
+                self.opened_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(latency for latency, _ in self.calls)
+            errors = sum(1 for _, ok in self.calls if not ok)
+            return {
+                'state': self.state,
+                'calls': len(self.calls),
+                'error_rate': round(errors / len(self.calls), 3) if self.calls else None,
+                'p95_latency_seconds': round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+            }
+
+
+class ResilientSearchToolInput(BaseModel):
+    """Input schema for ResilientSearchTool."""
+    search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+
+class ResilientSearchTool(BaseTool):
+    name: str = "Search the internet"
+    description: str = (
+        "A tool that can be used to search the internet with a search_query. "
+        "Useful for finding car listings, prices, valuations and state registration rules."
+    )
+    args_schema: Type[BaseModel] = ResilientSearchToolInput
+
+    backends: tuple = ()
+    _registry: Any = PrivateAttr(default=None)
+
+    def _run(self, search_query: str, **kwargs) -> str:
+        return self._registry.search(search_query, self.backends)
+
+
+class ToolRegistry:
+    """Builds search backends once and routes searches around unhealthy ones"""
+
+    def __init__(self, timeout=None, failure_threshold=None, reset_timeout=None):
+        self.timeout = timeout or float(os.getenv('SEARCH_TIMEOUT_SECONDS', '15'))
+        failure_threshold = failure_threshold or int(os.getenv('SEARCH_FAILURE_THRESHOLD', '3'))
+        reset_timeout = reset_timeout or float(os.getenv('SEARCH_BREAKER_RESET_SECONDS', '60'))
+        self.backends = self._build_backends()
+        self.breakers = {
+            name: CircuitBreaker(name, failure_threshold, reset_timeout) for name in self.backends
+        }
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="search")
+        self._agent_tools = {}
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.cache_ttl = float(os.getenv('SEARCH_CACHE_TTL_SECONDS', '900'))
+        self.cache_size = 2048
+
+    def _build_backends(self):
+        """Instantiate every search backend whose API key is configured"""
+        backends = {}
+        if os.getenv(BACKEND_ENV_VARS['serper']):
+            try:
+                from crewai_tools import SerperDevTool
+                backends['serper'] = SerperDevTool()
+            except ImportError:
+                print("⚠️  Serper search tool not available")
+        if os.getenv(BACKEND_ENV_VARS['brave']):
+            try:
+                from crewai_tools import BraveSearchTool
+                backends['brave'] = BraveSearchTool()
+            except ImportError:
+                print("⚠️  Brave search tool not available")
+        if backends:
+            print(f"✅ Search backends ready: {', '.join(backends)}")
+        else:
+            print("⚠️  No search API keys available, agents will use knowledge-based responses")
+        return backends
+
+    def _call_backend(self, name, search_query):
+        result = self.backends[name]._run(search_query=search_query)
+        # BraveSearchTool reports request errors as text instead of raising
+        if isinstance(result, str) and result.startswith(('Error performing search', 'Error parsing search results')):
+            raise RuntimeError(result)
+        return result
+
+    @staticmethod
+    def _cache_key(name, search_query):
+        return name, ' '.join(search_query.lower().split())
+
+    def cached_result(self, name, search_query):
+        """Return a fresh cached result for a query, or None"""
+        cached = self._cache.get(self._cache_key(name, search_query))
+        if cached is not None and time.time() - cached[0] < self.cache_ttl:
+            return cached[1]
+        return None
+
+    def evict(self, queries):
+        """Drop the cached results of the given queries on every backend"""
+        with self._lock:
+            for search_query in queries:
+                for name in self.backends:
+                    self._cache.pop(self._cache_key(name, search_query), None)
+
+    def search_backend(self, name, search_query):
+        """Run a search on one backend; returns None if it is unavailable or fails
+
+        Results are cached for a few minutes, so agents and the query planner
+        issuing the same query share one round trip.  A replayed session is
+        served from its cassette only, and a recorded one records cache hits
+        too, so the replay gets every result the session saw.
+        """
+        breaker = self.breakers.get(name)
+        if breaker is None:
+            return None
+        cassette = current_cassette()
+        replaying = cassette is not None and cassette.replaying
+        cache_key = self._cache_key(name, search_query)
+        cached = None if replaying else self.cached_result(name, search_query)
+        if cached is not None:
+            if cassette is not None:
+                cassette.record_search(name, search_query, cached, 0.0)
+            return cached
+        with get_tracer().span(name, 'search', backend=name) as span:
+            result = self._call_with_breaker(name, search_query, breaker)
+            if span is not None:
+                span.set(ok=result is not None)
+        # Replayed results stay out of the cache shared with live sessions
+        if result is not None and not replaying:
+            with self._lock:
+                self._cache[cache_key] = (time.time(), result)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _call_with_breaker(self, name, search_query, breaker):
+        cassette = current_cassette()
+        if cassette is not None and cassette.replaying:
+            return cassette.replay_search(name, search_query)
+        if not breaker.allow():
+            return None
+        # Searches share the backend's rate limit with every other session
+        get_rate_limiter().acquire(name, getattr(current_usage(), 'session_id', None))
+        started = time.monotonic()
+        future = self._executor.submit(self._call_backend, name, search_query)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            breaker.record_failure(time.monotonic() - started)
+            print(f"⚠️  Search backend {name} timed out after {self.timeout:g}s")
+            result = None
+        except Exception as e:
+            breaker.record_failure(time.monotonic() - started)
+            print(f"⚠️  Search backend {name} failed: {e}")
+            result = None
+        else:
+            breaker.record_success(time.monotonic() - started)
+        if cassette is not None:
+            cassette.record_search(name, search_query, result, time.monotonic() - started)
+        return result
+
+    def search(self, search_query, backends):
+        """Run a search on the first healthy backend, falling back in order"""
+        with get_tracer().span('search_tool', 'tool', query=search_query[:200]):
+            for name in backends:
+                result = self.search_backend(name, search_query)
+                if result is not None:
+                    return result
+            return LOCAL_FALLBACK_RESULT
+
+    def tools_for_agent(self, agent_name):
+        """Return the (shared) tools for an agent; agents without search get none"""
+        backends = tuple(
+            name for name in AGENT_SEARCH_BACKENDS.get(agent_name, ()) if name in self.backends
+        )
+        if not backends:
+            return []
+        with self._lock:
+            tool = self._agent_tools.get(backends)
+            if tool is None:
+                tool = ResilientSearchTool(backends=backends)
+                tool._registry = self
+                self._agent_tools[backends] = tool
+        return [tool]
+
+    def snapshot(self):
+        """Circuit breaker state and latency/error statistics per backend"""
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tool_registry():
+    """Return the process-wide tool registry, building it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ToolRegistry()
+    return _registry
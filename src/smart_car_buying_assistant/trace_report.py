@@ -0,0 +1,165 @@
+"""
+Critical-path and hotspot report for exported session spans.
+
+    trace_report [spans.jsonl] [--session SESSION_ID] [--sessions N] [--top N]
+
+For each selected session the report follows the chain of spans that bounds
+the session's end time and shows how much of it was spent in LLM calls,
+search calls and the framework's own code (span self time).  The hotspot
+table aggregates every span in the file by kind and name (LLM spans by model).
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+from smart_car_buying_assistant.spans import load_spans
+
+
+def _duration(span):
+    return max(0.0, span['end'] - span['start'])
+
+
+def group_traces(spans):
+    """Return {trace_id: (root span, {span_id: children sorted by start})}, oldest first"""
+    by_trace = defaultdict(list)
+    for span in spans:
+        by_trace[span['trace_id']].append(span)
+    traces = {}
+    for trace_id, trace_spans in by_trace.items():
+        roots = [span for span in trace_spans if span['parent_id'] is None]
+        if not roots:
+            continue
+        children = defaultdict(list)
+        for span in trace_spans:
+            if span['parent_id'] is not None:
+                children[span['parent_id']].append(span)
+        for siblings in children.values():
+            siblings.sort(key=lambda span: span['start'])
+        traces[trace_id] = (roots[0], children)
+    return dict(sorted(traces.items(), key=lambda item: item[1][0]['start']))
+
+
+def self_time(span, children):
+    """Time in a span not covered by any of its children (children may overlap)"""
+    covered = 0.0
+    cursor = span['start']
+    for child in children.get(span['span_id'], []):
+        start, end = max(child['start'], cursor), min(child['end'], span['end'])
+        if end > start:
+            covered += end - start
+            cursor = end
+    return max(0.0, _duration(span) - covered)
+
+
+def critical_path(span, children, depth=0):
+    """Spans that bound the end of ``span``, as (depth, span) pairs in start order"""
+    chain = []
+    cursor = span['end']
+    remaining = list(children.get(span['span_id'], []))
+    while True:
+        candidates = [child for child in remaining if child['end'] <= cursor + 1e-6]
+        if not candidates:
+            break
+        latest = max(candidates, key=lambda child: child['end'])
+        chain.append(latest)
+        remaining.remove(latest)
+        cursor = latest['start']
+    path = [(depth, span)]
+    for child in reversed(chain):
+        path.extend(critical_path(child, children, depth + 1))
+    return path
+
+
+def _label(span):
+    model = span['attributes'].get('model')
+    return f"{span['kind']}:{model}" if span['kind'] == 'llm' and model else f"{span['kind']}:{span['name']}"
+
+
+def print_session(root, children, out=sys.stdout):
+    total = _duration(root)
+    session_id = root['attributes'].get('session_id', root['trace_id'])
+    print(f"\n⏱️  Session {session_id}: {total:.2f}s ({root['status']})", file=out)
+
+    by_kind = defaultdict(float)
+    for depth, span in critical_path(root, children):
+        own = self_time(span, children)
+        by_kind['overhead' if span['kind'] in ('session', 'internal', 'task', 'agent', 'map') else span['kind']] += own
+        tokens = ''
+        if span['attributes'].get('prompt_tokens') is not None:
+            tokens = f", {span['attributes']['prompt_tokens']}+{span['attributes'].get('completion_tokens', 0)} tokens"
+        error = ' ❌' if span['status'] == 'error' else ''
+        print(f"  {'  ' * depth}{_label(span)} {_duration(span):.2f}s (self {own:.2f}s{tokens}){error}", file=out)
+
+    breakdown = ', '.join(
+        f"{kind} {seconds:.2f}s ({seconds / total * 100 if total else 0:.0f}%)"
+        for kind, seconds in sorted(by_kind.items(), key=lambda item: -item[1])
+    )
+    print(f"  Critical path: {breakdown}", file=out)
+
+
+def hotspots(traces):
+    """Aggregate statistics per span label across every session"""
+    stats = defaultdict(lambda: {'count': 0, 'errors': 0, 'total': 0.0, 'self': 0.0, 'tokens': 0, 'durations': []})
+    for root, children in traces.values():
+        stack = [root]
+        while stack:
+            span = stack.pop()
+            entry = stats[_label(span)]
+            entry['count'] += 1
+            entry['errors'] += span['status'] == 'error'
+            entry['total'] += _duration(span)
+            entry['self'] += self_time(span, children)
+            entry['tokens'] += (span['attributes'].get('prompt_tokens') or 0) + (span['attributes'].get('completion_tokens') or 0)
+            entry['durations'].append(_duration(span))
+            stack.extend(children.get(span['span_id'], []))
+    for entry in stats.values():
+        durations = sorted(entry.pop('durations'))
+        entry['p95'] = durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))]
+    return stats
+
+
+def print_hotspots(traces, top, out=sys.stdout):
+    stats = hotspots(traces)
+    print(f"\n🔥 Hotspots across {len(traces)} session(s), by self time", file=out)
+    print(f"  {'span':<48} {'count':>6} {'errors':>6} {'self s':>9} {'total s':>9} {'p95 s':>8} {'tokens':>9}", file=out)
+    for label, entry in sorted(stats.items(), key=lambda item: -item[1]['self'])[:top]:
+        print(f"  {label[:48]:<48} {entry['count']:>6} {entry['errors']:>6} {entry['self']:>9.2f} "
+              f"{entry['total']:>9.2f} {entry['p95']:>8.2f} {entry['tokens']:>9}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Critical paths and hotspots from exported session spans")
+    parser.add_argument('path', nargs='?', default=os.getenv('SPAN_EXPORT_PATH', 'spans.jsonl'),
+                        help="span file written by the jsonl or otlp exporter")
+    parser.add_argument('--session', help="show the critical path of this session only")
+    parser.add_argument('--sessions', type=int, default=1,
+                        help="number of most recent sessions to show critical paths for")
+    parser.add_argument('--top', type=int, default=15, help="number of hotspots to list")
+    args = parser.parse_args(argv)
+
+    try:
+        traces = group_traces(load_spans(args.path))
+    except FileNotFoundError:
+        print(f"❌ Span file not found: {args.path}")
+        return 1
+    if not traces:
+        print(f"⚠️  No sessions found in {args.path}")
+        return 1
+
+    if args.session:
+        selected = [trace for trace in traces.values() if trace[0]['attributes'].get('session_id') == args.session]
+        if not selected:
+            print(f"❌ Session {args.session} not found in {args.path}")
+            return 1
+    else:
+        selected = list(traces.values())[-args.sessions:]
+    for root, children in selected:
+        print_session(root, children)
+    print_hotspots(traces, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,254 @@
+"""
+Per-session trace capture for crew runs.
+
+Crew, task, agent, tool and LLM events from the crewai event bus are recorded
+into a bounded ring buffer for the session that emitted them, instead of
+being printed to stdout by ``verbose=True`` crews.  The event bus calls
+handlers in the emitting thread, so the session is tracked with a context
+variable set by the runner.  Events pushed out of a full buffer can be
+spilled to a gzip-compressed JSONL file, and the buffer is saved with the
+job at every task boundary so /trace/<session_id> works with dedicated
+worker processes too.
+
+Tunables:
+
+    CREW_VERBOSITY          crewai console output, 'quiet' (default) or 'verbose'
+    TRACE_MAX_EVENTS        events kept per session (default 500)
+    TRACE_MAX_FIELD_CHARS   longest text kept per event field (default 2000)
+    TRACE_MAX_SESSIONS      sessions kept in memory by each process (default 256)
+    TRACE_SPILL_DIR         when set, evicted events are appended to <dir>/<session_id>.jsonl.gz
+"""
+
+import contextvars
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from crewai.events.event_bus import crewai_event_bus
+from crewai.events.types.agent_events import (
+    AgentExecutionCompletedEvent,
+    AgentExecutionErrorEvent,
+    AgentExecutionStartedEvent,
+)
+from crewai.events.types.crew_events import (
+    CrewKickoffCompletedEvent,
+    CrewKickoffFailedEvent,
+    CrewKickoffStartedEvent,
+)
+from crewai.events.types.llm_events import LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent
+from crewai.events.types.task_events import TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent
+from crewai.events.types.tool_usage_events import (
+    ToolUsageErrorEvent,
+    ToolUsageFinishedEvent,
+    ToolUsageStartedEvent,
+)
+
+TRACED_EVENTS = (
+    CrewKickoffStartedEvent, CrewKickoffCompletedEvent, CrewKickoffFailedEvent,
+    TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+    AgentExecutionStartedEvent, AgentExecutionCompletedEvent, AgentExecutionErrorEvent,
+    ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+    LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent,
+)
+
+# Event attributes copied into the trace when present
+TRACE_FIELDS = ('model', 'tool_name', 'tool_args', 'from_cache', 'total_tokens', 'output', 'response', 'error')
+
+# Events after which the trace is saved with the job
+CHECKPOINT_EVENTS = ('task_completed', 'task_failed', 'crew_kickoff_completed', 'crew_kickoff_failed')
+
+SPILL_BATCH = 64
+
+_current_session = contextvars.ContextVar('trace_session', default=None)
+
+
+def crew_verbose():
+    """Whether crews should print their own step-by-step output to stdout"""
+    return os.getenv('CREW_VERBOSITY', 'quiet').strip().lower() in ('verbose', 'debug', 'true', '1')
+
+
+def _truncate(value, limit):
+    value = getattr(value, 'raw', value)
+    if not isinstance(value, (str, int, float, bool, type(None))):
+        value = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more characters]"
+    return value
+
+
+def summarize_event(event, field_limit):
+    """Compact, JSON-serializable record of a crewai event"""
+    record = {'ts': event.timestamp.timestamp(), 'type': event.type}
+    task = getattr(event, 'task', None)
+    task_name = getattr(task, 'name', None) if task is not None else getattr(event, 'task_name', None)
+    if task_name:
+        record['task'] = task_name
+    agent = getattr(event, 'agent', None)
+    agent_role = getattr(agent, 'role', None) if agent is not None else getattr(event, 'agent_role', None)
+    if agent_role:
+        record['agent'] = agent_role
+    for field in TRACE_FIELDS:
+        value = getattr(event, field, None)
+        if value is not None:
+            record[field] = _truncate(value, field_limit)
+    return record
+
+
+class TraceBuffer:
+    """Ring buffer of one session's trace events"""
+
+    def __init__(self, session_id, max_events, spill_dir=None):
+        self.session_id = session_id
+        self.events = deque()
+        self.max_events = max_events
+        self.spill_dir = spill_dir
+        self.dropped = 0
+        self.spilled = 0
+        self.persist = None
+        self._pending_spill = []
+        self._lock = threading.Lock()
+
+    @property
+    def spill_path(self):
+        return os.path.join(self.spill_dir, f"{self.session_id}.jsonl.gz") if self.spill_dir else None
+
+    def add(self, record):
+        with self._lock:
+            if len(self.events) >= self.max_events:
+                evicted = self.events.popleft()
+                if self.spill_dir:
+                    self._pending_spill.append(evicted)
+                else:
+                    self.dropped += 1
+            self.events.append(record)
+            spill = self._pending_spill if len(self._pending_spill) >= SPILL_BATCH else None
+            if spill:
+                self._pending_spill = []
+        if spill:
+            self._spill(spill)
+
+    def flush(self):
+        with self._lock:
+            spill, self._pending_spill = self._pending_spill, []
+        if spill:
+            self._spill(spill)
+
+    def _spill(self, records):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # Each append is a separate gzip member; gzip.open reads them back as one stream
+            with gzip.open(self.spill_path, 'at', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+            with self._lock:
+                self.spilled += len(records)
+        except OSError as e:
+            print(f"⚠️  Could not spill trace for {self.session_id}: {e}")
+            with self._lock:
+                self.dropped += len(records)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'session_id': self.session_id,
+                'events': list(self.events),
+                'dropped': self.dropped,
+                'spilled': self.spilled + len(self._pending_spill),
+            }
+
+
+def read_spilled_events(session_id, spill_dir=None):
+    """Events of a session that were spilled to disk, oldest first"""
+    spill_dir = spill_dir or os.getenv('TRACE_SPILL_DIR')
+    if not spill_dir:
+        return []
+    path = os.path.join(spill_dir, f"{session_id}.jsonl.gz")
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class TraceRecorder:
+    """Routes crewai events into the trace buffer of the session that emitted them"""
+
+    def __init__(self, max_events=None, field_limit=None, max_sessions=None, spill_dir=None):
+        self.max_events = max_events or int(os.getenv('TRACE_MAX_EVENTS', '500'))
+        self.field_limit = field_limit or int(os.getenv('TRACE_MAX_FIELD_CHARS', '2000'))
+        self.max_sessions = max_sessions or int(os.getenv('TRACE_MAX_SESSIONS', '256'))
+        self.spill_dir = spill_dir or os.getenv('TRACE_SPILL_DIR') or None
+        self._buffers = OrderedDict()
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def install(self):
+        """Register the event bus handlers once per process"""
+        if self._installed:
+            return self
+        with self._lock:
+            if not self._installed:
+                for event_type in TRACED_EVENTS:
+                    crewai_event_bus.register_handler(event_type, self._handle)
+                self._installed = True
+        return self
+
+    def _handle(self, source, event):
+        buffer = _current_session.get()
+        if buffer is None:
+            return
+        buffer.add(summarize_event(event, self.field_limit))
+        if buffer.persist and event.type in CHECKPOINT_EVENTS:
+            buffer.persist(buffer.snapshot())
+
+    def record(self, kind, **fields):
+        """Add an application event (not from crewai) to the current session's trace"""
+        buffer = _current_session.get()
+        if buffer is not None:
+            buffer.add({'ts': time.time(), 'type': kind,
+                        **{name: _truncate(value, self.field_limit) for name, value in fields.items()}})
+
+    @contextmanager
+    def session(self, session_id, persist=None):
+        """Attribute the events emitted inside the block to ``session_id``
+
+        ``persist`` is called with the trace snapshot at every task boundary and at the end.
+        """
+        self.install()
+        buffer = TraceBuffer(session_id, self.max_events, self.spill_dir)
+        buffer.persist = persist
+        with self._lock:
+            self._buffers[session_id] = buffer
+            while len(self._buffers) > self.max_sessions:
+                self._buffers.popitem(last=False)
+        token = _current_session.set(buffer)
+        try:
+            yield buffer
+        finally:
+            _current_session.reset(token)
+            buffer.flush()
+            if persist:
+                persist(buffer.snapshot())
+
+    def get(self, session_id):
+        """Trace snapshot of a session recorded by this process, or None"""
+        with self._lock:
+            buffer = self._buffers.get(session_id)
+        return buffer.snapshot() if buffer else None
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_trace_recorder():
+    """Return the process-wide trace recorder"""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = TraceRecorder()
+    return _recorder
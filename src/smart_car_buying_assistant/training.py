@@ -0,0 +1,280 @@
+"""
+Parallel crew training.
+
+``Crew.train`` runs its iterations one after another in one process, and a
+training run spends most of its time waiting on the LLM.  ``train_parallel``
+runs the iterations on a pool of processes instead, each iteration in its own
+working directory, since crewai keeps its training data in ``training_data.pkl``
+in the current directory.  The feedback of every iteration is then merged,
+keyed by agent role, evaluated once per agent and saved to the single output
+file, exactly as a serial run would.
+
+    train 8 trained_agents_data.pkl --processes 4 [--feedback feedback.yaml] [--stub-llm]
+
+Workers have no terminal, so their feedback prompts are relayed to this
+process and answered here one at a time while the other iterations keep
+running.  ``--feedback`` answers them from a YAML file instead (agent name or
+role to feedback, plus an optional ``default``), for unattended runs.
+``--stub-llm`` replaces every LLM call with a canned answer and gives canned
+feedback, so the whole pipeline can be dry-run without API keys or tokens.
+
+Unlike a serial run, an iteration does not see the feedback given in earlier
+iterations, since they run at the same time.
+
+Tunables:
+
+    TRAIN_PROCESSES      training processes (default 1, which runs the iterations serially)
+    TRAIN_WORK_DIR       where the per-iteration working directories are created (default: system temp dir)
+    TRAIN_STUB_LLM       set to 1 to dry-run with the stub LLM
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import yaml
+
+STUB_FEEDBACK = "Dry run: keep the answer short and state your assumptions."
+
+STUB_EVALUATION = (
+    '{"suggestions": ["Dry run: no real feedback was given."], "quality": 5.0, '
+    '"final_summary": "Dry run of the training pipeline with the stub LLM."}'
+)
+
+
+def _agent_key(name):
+    """agents.yaml name of an agent role ("Vehicle Valuation Expert" -> "vehicle_valuation_expert")"""
+    return '_'.join(name.lower().split())
+
+
+def stub_completion(**kwargs):
+    """Stand-in for ``litellm.completion`` that answers without calling a provider"""
+    from litellm import ModelResponse
+
+    prompt = str(kwargs.get('messages', ''))
+    message = {'role': 'assistant', 'content': "Thought: This is a dry run.\nFinal Answer: Stub answer for a dry training run."}
+    if kwargs.get('tools'):
+        # Structured output (the training evaluation) is requested as a function call
+        message = {'role': 'assistant', 'content': '', 'tool_calls': [{
+            'id': 'call_stub', 'type': 'function',
+            'function': {'name': kwargs['tools'][0]['function']['name'], 'arguments': STUB_EVALUATION},
+        }]}
+    elif 'valid JSON' in prompt:
+        message['content'] = STUB_EVALUATION
+    return ModelResponse(
+        model=kwargs.get('model'),
+        choices=[{'message': message}],
+        usage={'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(str(message)) // 4},
+    )
+
+
+@contextmanager
+def stub_llm(enabled=True):
+    """Serve every LLM call of this process from ``stub_completion`` while active"""
+    if not enabled:
+        yield
+        return
+    import litellm
+
+    original = litellm.completion
+    litellm.completion = stub_completion
+    try:
+        yield
+    finally:
+        litellm.completion = original
+
+
+class StaticFeedback:
+    """Feedback from a mapping of agent name or role to text, with an optional default"""
+
+    def __init__(self, by_agent=None, default=None):
+        self.by_agent = {_agent_key(name): text for name, text in (by_agent or {}).items()}
+        self.default = default
+
+    def __call__(self, iteration, role, output):
+        feedback = self.by_agent.get(_agent_key(role), self.default)
+        if not feedback:
+            raise ValueError(f"No training feedback configured for {role}")
+        return feedback
+
+
+class RelayedFeedback:
+    """Feedback asked of the person running the training, through the parent process"""
+
+    def __init__(self, requests, replies):
+        self.requests = requests
+        self.replies = replies
+
+    def __call__(self, iteration, role, output):
+        self.requests.put((iteration, role, output))
+        return self.replies.get()
+
+
+def load_feedback_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    default = data.pop('default', None)
+    return StaticFeedback(data, default)
+
+
+def _serve_feedback(requests, replies):
+    """Prompt for the feedback the workers ask for, one request at a time, until None arrives"""
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        iteration, role, output = request
+        print(f"\n===== Iteration {iteration + 1}: {role} =====\n{output}\n")
+        feedback = ''
+        while not feedback.strip():
+            # An iteration without feedback cannot be evaluated
+            feedback = input(f"Feedback for the {role} (required): ")
+        replies[iteration].put(feedback)
+
+
+def _train_iteration(iteration, filename, inputs, workdir, feedback, stub):
+    """Run one training iteration in its own working directory
+
+    Returns the iteration's training data keyed by agent role.
+    """
+    from crewai.agents.agent_builder.base_agent_executor_mixin import CrewAgentExecutorMixin
+    from crewai.utilities.constants import TRAINING_DATA_FILE
+    from crewai.utilities.training_handler import CrewTrainingHandler
+
+    from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
+
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    def ask_human_input(executor, final_answer):
+        return feedback(iteration, executor.agent.role, final_answer)
+
+    # Workers have no terminal: feedback comes from the parent process or a file
+    CrewAgentExecutorMixin._ask_human_input = ask_human_input
+
+    started = time.monotonic()
+    with stub_llm(stub):
+        train_crew = SmartCarBuyingAssistantCrew().crew().copy()
+        train_crew._setup_for_training(filename)
+        train_crew._train_iteration = iteration
+        train_crew.kickoff(inputs=inputs)
+
+    training_data = CrewTrainingHandler(TRAINING_DATA_FILE).load() or {}
+    roles = {str(agent.id): agent.role for agent in train_crew.agents}
+    by_role = {roles[agent_id]: data for agent_id, data in training_data.items() if agent_id in roles}
+    print(f"✅ Training iteration {iteration + 1} finished in {time.monotonic() - started:.1f}s")
+    return by_role
+
+
+def merge_training_data(results):
+    """Merge per-iteration training data ({role: {iteration: data}}) into one mapping per role"""
+    merged = {}
+    for by_role in results:
+        for role, iterations in by_role.items():
+            merged.setdefault(role, {}).update(iterations)
+    return {role: dict(sorted(iterations.items())) for role, iterations in merged.items()}
+
+
+def save_trained_data(merged, filename, stub=False):
+    """Evaluate the merged feedback of every agent and save the suggestions to ``filename``"""
+    from crewai.utilities.evaluators.task_evaluator import TaskEvaluator
+    from crewai.utilities.training_handler import CrewTrainingHandler
+
+    from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
+
+    agents = {agent.role: agent for agent in SmartCarBuyingAssistantCrew().crew().agents}
+    trained = [role for role in merged if role in agents]
+
+    def evaluate(role):
+        agent = agents[role]
+        return TaskEvaluator(agent).evaluate_training_data(
+            training_data={str(agent.id): merged[role]}, agent_id=str(agent.id)
+        )
+
+    handler = CrewTrainingHandler(filename)
+    handler.initialize_file()
+    with stub_llm(stub), ThreadPoolExecutor(max_workers=max(1, len(trained))) as executor:
+        evaluations = dict(zip(trained, executor.map(evaluate, trained)))
+    for role in trained:
+        handler.save_trained_data(agent_id=role, trained_data=evaluations[role].model_dump())
+    return evaluations
+
+
+def train_parallel(n_iterations, filename, inputs, processes=None, feedback=None, stub=False, work_dir=None):
+    """Run ``n_iterations`` training iterations on a process pool and save the merged result to ``filename``"""
+    processes = max(1, min(int(processes or os.getenv('TRAIN_PROCESSES', '1')), n_iterations))
+    if stub:
+        # The crew needs keys to build its tools; the stub never calls them
+        from smart_car_buying_assistant.tools.registry import BACKEND_ENV_VARS
+        for env_var in ('OPENAI_API_KEY', *BACKEND_ENV_VARS.values()):
+            os.environ.setdefault(env_var, 'stub-llm')
+        feedback = feedback or StaticFeedback(default=STUB_FEEDBACK)
+    root = tempfile.mkdtemp(prefix='train-', dir=work_dir or os.getenv('TRAIN_WORK_DIR') or None)
+    print(f"🏋️  Training {n_iterations} iterations on {processes} processes"
+          + (" with the stub LLM" if stub else '') + f" (working directories in {root})")
+
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager() if feedback is None else None
+    server = None
+    if manager is not None:
+        requests = manager.Queue()
+        replies = {iteration: manager.Queue() for iteration in range(n_iterations)}
+        server = threading.Thread(target=_serve_feedback, args=(requests, replies), daemon=True)
+        server.start()
+
+    started = time.monotonic()
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [
+                pool.submit(
+                    _train_iteration, iteration, os.path.basename(filename), inputs,
+                    os.path.join(root, f"iteration-{iteration}"),
+                    feedback if manager is None else RelayedFeedback(requests, replies[iteration]),
+                    stub,
+                )
+                for iteration in range(n_iterations)
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+    except Exception:
+        print(f"❌ Training failed, the iterations' working directories are kept in {root}")
+        raise
+    finally:
+        if manager is not None:
+            requests.put(None)
+            server.join(timeout=5)
+            manager.shutdown()
+
+    merged = merge_training_data(results)
+    save_trained_data(merged, filename, stub)
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"✅ Trained {len(merged)} agents over {n_iterations} iterations in "
+          f"{time.monotonic() - started:.1f}s, saved to {filename}")
+    return merged
+
+
+def main(argv, inputs):
+    parser = argparse.ArgumentParser(description="Train the Smart Car Buying Assistant crew")
+    parser.add_argument('n_iterations', type=int)
+    parser.add_argument('filename', help="file the trained agent data is saved to")
+    parser.add_argument('--processes', type=int, default=int(os.getenv('TRAIN_PROCESSES', '1')),
+                        help="iterations run at the same time, each in its own process")
+    parser.add_argument('--feedback', help="YAML file with the feedback to give each agent")
+    parser.add_argument('--stub-llm', action='store_true', default=os.getenv('TRAIN_STUB_LLM') == '1',
+                        help="dry run: answer every LLM call with a canned response")
+    args = parser.parse_args(argv)
+
+    if args.processes <= 1 and not args.feedback and not args.stub_llm:
+        from smart_car_buying_assistant.crew import SmartCarBuyingAssistantCrew
+        SmartCarBuyingAssistantCrew().crew().train(n_iterations=args.n_iterations, filename=args.filename, inputs=inputs)
+        return
+
+    feedback = load_feedback_file(args.feedback) if args.feedback else None
+    train_parallel(args.n_iterations, args.filename, inputs, args.processes, feedback, args.stub_llm)
@@ -0,0 +1,157 @@
+"""
+Token and cost accounting per task and session, with an optional budget cap.
+
+Every LLM call made by a routed agent LLM is recorded on the usage of the
+session that is running in the current context.  Before each call the
+session's budget is checked; once it is spent the call raises
+``BudgetExceededError`` and the runner stores a partial report built from the
+tasks that already finished.
+
+Tunables:
+
+    SESSION_TOKEN_BUDGET      prompt + completion tokens one session may use (default 0, unlimited)
+    SESSION_COST_BUDGET_USD   estimated dollars one session may spend (default 0, unlimited)
+
+Prices per million tokens are configured in the ``pricing`` section of
+config/models.yaml.
+"""
+
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+
+USAGE_COUNTERS = ('calls', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost_usd')
+
+_current_usage = contextvars.ContextVar('session_usage', default=None)
+
+
+class BudgetExceededError(Exception):
+    """Raised before an LLM call once the session's token or cost budget is spent"""
+
+
+def estimate_cost(pricing, model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Estimated USD cost of one call, or None when the model has no configured price"""
+    prices = (pricing or {}).get(model) or (pricing or {}).get(model.split('/')[-1])
+    if not prices:
+        return None
+    cached_tokens = min(cached_tokens or 0, prompt_tokens)
+    return (
+        (prompt_tokens - cached_tokens) * prices.get('input', 0)
+        + cached_tokens * prices.get('cached_input', prices.get('input', 0))
+        + completion_tokens * prices.get('output', 0)
+    ) / 1_000_000
+
+
+def _empty_counters():
+    return {counter: 0 for counter in USAGE_COUNTERS}
+
+
+def cached_ratio(counters):
+    """Share of the prompt tokens the provider served from its prompt cache"""
+    return round(counters['cached_tokens'] / counters['prompt_tokens'], 3) if counters['prompt_tokens'] else 0.0
+
+
+class SessionUsage:
+    """Token and cost counters of one session, per task and per model"""
+
+    def __init__(self, session_id, token_budget=None, cost_budget=None):
+        self.session_id = session_id
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv('SESSION_TOKEN_BUDGET', '0'))
+        self.cost_budget = cost_budget if cost_budget is not None else float(os.getenv('SESSION_COST_BUDGET_USD', '0'))
+        self.totals = _empty_counters()
+        self.by_task = {}
+        self.by_agent = {}
+        self.by_model = {}
+        self.unpriced_models = set()
+        self.exceeded = None
+        self._lock = threading.Lock()
+
+    def record(self, model, task, prompt_tokens, completion_tokens, cached_tokens=0, cost=None, agent=None):
+        prompt_tokens, completion_tokens, cached_tokens = prompt_tokens or 0, completion_tokens or 0, cached_tokens or 0
+        with self._lock:
+            if cost is None:
+                self.unpriced_models.add(model)
+            for counters in (self.totals,
+                             self.by_task.setdefault(task or 'unattributed', _empty_counters()),
+                             self.by_agent.setdefault(agent or 'unattributed', _empty_counters()),
+                             self.by_model.setdefault(model, _empty_counters())):
+                counters['calls'] += 1
+                counters['prompt_tokens'] += prompt_tokens
+                counters['completion_tokens'] += completion_tokens
+                counters['cached_tokens'] += cached_tokens
+                counters['cost_usd'] += cost or 0
+
+    @property
+    def total_tokens(self):
+        return self.totals['prompt_tokens'] + self.totals['completion_tokens']
+
+    def check(self):
+        """Raise BudgetExceededError if the session has spent its budget"""
+        with self._lock:
+            if self.exceeded is None:
+                if self.token_budget and self.total_tokens >= self.token_budget:
+                    self.exceeded = f"{self.total_tokens} tokens used of a {self.token_budget} token budget"
+                elif self.cost_budget and self.totals['cost_usd'] >= self.cost_budget:
+                    self.exceeded = f"${self.totals['cost_usd']:.4f} spent of a ${self.cost_budget:.2f} budget"
+            if self.exceeded is not None:
+                raise BudgetExceededError(f"Session budget exceeded: {self.exceeded}")
+
+    def snapshot(self):
+        def rounded(counters):
+            return {**counters, 'cost_usd': round(counters['cost_usd'], 6),
+                    'total_tokens': counters['prompt_tokens'] + counters['completion_tokens'],
+                    'cached_ratio': cached_ratio(counters)}
+
+        with self._lock:
+            return {
+                **rounded(self.totals),
+                'by_task': {task: rounded(counters) for task, counters in self.by_task.items()},
+                'by_agent': {agent: rounded(counters) for agent, counters in self.by_agent.items()},
+                'by_model': {model: rounded(counters) for model, counters in self.by_model.items()},
+                'unpriced_models': sorted(self.unpriced_models),
+                'budget': {
+                    'tokens': self.token_budget or None,
+                    'cost_usd': self.cost_budget or None,
+                    'exceeded': self.exceeded,
+                },
+            }
+
+
+@contextmanager
+def track_usage(session_id, **budgets):
+    """Record the LLM usage of calls made inside the block on a new SessionUsage"""
+    usage = SessionUsage(session_id, **budgets)
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def current_usage():
+    """Usage of the session running in this context, or None"""
+    return _current_usage.get()
+
+
+def usage_report(totals):
+    """Turn the flat store-wide usage totals into totals, per-model usage and averages"""
+    report = {'sessions': int(totals.get('sessions', 0)),
+              'budget_exceeded': int(totals.get('budget_exceeded', 0)),
+              'totals': {}, 'by_model': {}, 'by_agent': {}}
+    for name, amount in totals.items():
+        scope = name.split(':', 1)[0]
+        if scope in ('model', 'agent'):
+            key, counter = name[len(scope) + 1:].rsplit(':', 1)
+            report[f"by_{scope}"].setdefault(key, {})[counter] = amount
+        elif name in USAGE_COUNTERS:
+            report['totals'][name] = amount
+    for counters in [report['totals'], *report['by_model'].values(), *report['by_agent'].values()]:
+        for counter in USAGE_COUNTERS:
+            counters[counter] = round(counters.get(counter, 0), 6) if counter == 'cost_usd' else int(counters.get(counter, 0))
+        counters['cached_ratio'] = cached_ratio(counters)
+    sessions = report['sessions']
+    report['avg_tokens_per_session'] = round(
+        (report['totals']['prompt_tokens'] + report['totals']['completion_tokens']) / sessions) if sessions else 0
+    report['avg_cost_usd_per_session'] = round(report['totals']['cost_usd'] / sessions, 6) if sessions else 0
+    return report
@@ -0,0 +1,178 @@
+"""
+Crew worker: pulls jobs from the job store and runs them.
+
+Run one or more workers next to the web application:
+
+    worker --concurrency 2
+
+SIGTERM/SIGINT make the worker drain: it stops claiming new jobs and exits once
+the jobs it is running have finished.  A second signal exits immediately; the
+interrupted jobs are requeued by the next worker once their lease expires.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from smart_car_buying_assistant.job_store import DEFAULT_LEASE_TIMEOUT, get_job_store
+from smart_car_buying_assistant.runner import run_crew_job
+from smart_car_buying_assistant.scheduling import get_scheduling_policy
+
+
+class Worker:
+    """Claims queued jobs and runs them on a fixed number of threads"""
+
+    def __init__(self, store=None, concurrency=1, poll_interval=1.0,
+                 lease_timeout=DEFAULT_LEASE_TIMEOUT, worker_id=None, promote_after=None, promote_every=None):
+        self.store = store or get_job_store()
+        self.concurrency = max(1, int(concurrency))
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.promote_after = promote_after if promote_after is not None else get_scheduling_policy().promote_after
+        self.promote_every = promote_every if promote_every is not None else get_scheduling_policy().promote_every
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stopping = threading.Event()
+        self._active = {}
+        self._active_lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def active_jobs(self):
+        with self._active_lock:
+            return list(self._active)
+
+    def stop(self):
+        """Stop claiming new jobs; running jobs are allowed to finish"""
+        if not self._stopping.is_set():
+            print(f"🛑 Worker {self.worker_id} draining ({len(self.active_jobs)} job(s) in flight)")
+        self._stopping.set()
+
+    def _publish_capacity(self):
+        """Tell the job store how many slots this worker has and how many are busy"""
+        try:
+            # A draining worker advertises no free capacity
+            busy = len(self.active_jobs)
+            capacity = busy if self._stopping.is_set() else self.concurrency
+            self.store.record_worker(self.worker_id, capacity, busy)
+        except Exception as e:
+            print(f"⚠️  Could not record worker capacity: {e}")
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(self.worker_id, promote_after=self.promote_after,
+                                       promote_every=self.promote_every)
+            except Exception as e:
+                print(f"⚠️  Worker {self.worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._stopping.wait(self.poll_interval)
+                continue
+
+            with self._active_lock:
+                self._active[job['id']] = time.time()
+            self._publish_capacity()
+            print(f"🚗 Worker {self.worker_id} picked up {job.get('priority', 'interactive')} job {job['id']}")
+            try:
+                run_crew_job(job, store=self.store)
+            finally:
+                with self._active_lock:
+                    self._active.pop(job['id'], None)
+                self._publish_capacity()
+
+    def _heartbeat_loop(self):
+        interval = max(1.0, self.lease_timeout / 4)
+        while not self._stopping.is_set() or self.active_jobs:
+            self._publish_capacity()
+            for job_id in self.active_jobs:
+                try:
+                    self.store.heartbeat(job_id, self.worker_id)
+                except Exception as e:
+                    print(f"⚠️  Heartbeat failed for job {job_id}: {e}")
+            try:
+                self.store.requeue_stale(self.lease_timeout)
+            except Exception as e:
+                print(f"⚠️  Could not requeue stale jobs: {e}")
+            if self._stopping.is_set():
+                time.sleep(1.0)
+            else:
+                self._stopping.wait(interval)
+        try:
+            self.store.remove_worker(self.worker_id)
+        except Exception as e:
+            print(f"⚠️  Could not deregister worker: {e}")
+
+    def start(self):
+        """Start the worker threads in the background"""
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"crew-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="crew-worker-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        return self
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def run(self):
+        """Run in the foreground until a shutdown signal has drained the worker"""
+        signals_received = []
+
+        def handle_signal(signum, frame):
+            signals_received.append(signum)
+            if len(signals_received) > 1:
+                print("❌ Second shutdown signal received, exiting without draining")
+                os._exit(1)
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handle_signal)
+        signal.signal(signal.SIGINT, handle_signal)
+
+        print(f"👷 Worker {self.worker_id} started with {self.concurrency} slot(s)")
+        self.start()
+        while any(thread.is_alive() for thread in self._threads):
+            time.sleep(0.5)
+        print(f"✅ Worker {self.worker_id} drained and stopped")
+
+
+def start_embedded_worker(concurrency=1, store=None, prewarmer=None):
+    """Run a worker inside the current process (development convenience)
+
+    ``prewarmer`` is enabled once the worker runs, since crews run here share
+    its search cache.
+    """
+    worker = Worker(store=store, concurrency=concurrency)
+    print(f"👷 Embedded worker started with {worker.concurrency} slot(s)")
+    worker.start()
+    if prewarmer is not None:
+        prewarmer.enabled = True
+    return worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Smart Car Buying Assistant crew workers")
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('WORKER_CONCURRENCY', '1')),
+                        help="number of crews this worker runs at the same time")
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help="seconds to wait between polls when the queue is empty")
+    parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT,
+                        help="seconds without a heartbeat before a running job is requeued")
+    args = parser.parse_args(argv)
+
+    Worker(
+        concurrency=args.concurrency,
+        poll_interval=args.poll_interval,
+        lease_timeout=args.lease_timeout,
+    ).run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
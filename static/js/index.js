@@ -0,0 +1,139 @@
+const form = document.getElementById('carForm');
+const submitBtn = document.getElementById('submitBtn');
+const loading = document.getElementById('loading');
+const progressContainer = document.getElementById('progressContainer');
+const progressFill = document.getElementById('progressFill');
+const statusText = document.getElementById('statusText');
+const error = document.getElementById('error');
+const success = document.getElementById('success');
+
+let sessionId = null;
+let statusInterval = null;
+let lastPrewarm = null;
+
+// Start the state and market searches while the requirements are still being typed
+function prewarm() {
+    const data = {
+        car_type: document.getElementById('car_type').value,
+        budget_range: document.getElementById('budget_range').value.trim(),
+        current_state: document.getElementById('current_state').value
+    };
+    if (!data.car_type || !data.current_state) return;
+    const body = JSON.stringify(data);
+    if (body === lastPrewarm) return;
+    lastPrewarm = body;
+    fetch('/prewarm', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: body
+    }).catch(() => {});
+}
+
+['car_type', 'current_state', 'budget_range'].forEach((id) => {
+    document.getElementById(id).addEventListener('change', prewarm);
+});
+
+form.addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    // Reset UI
+    error.style.display = 'none';
+    success.style.display = 'none';
+
+    // Get form data
+    const formData = new FormData(form);
+    const data = {
+        user_requirements: formData.get('user_requirements'),
+        car_type: formData.get('car_type'),
+        budget_range: formData.get('budget_range'),
+        current_state: formData.get('current_state')
+    };
+    // Link to the last finished session so unchanged parts of the analysis are reused
+    const previousSessionId = localStorage.getItem('lastSessionId');
+    if (previousSessionId) {
+        data.previous_session_id = previousSessionId;
+    }
+
+    // Show loading
+    submitBtn.disabled = true;
+    loading.classList.add('show');
+    progressContainer.classList.add('show');
+
+    try {
+        // Submit form
+        const response = await fetch('/submit_requirements', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(data)
+        });
+
+        const result = await response.json();
+
+        if (response.ok) {
+            sessionId = result.session_id;
+            success.textContent = result.message;
+            success.style.display = 'block';
+
+            // Start polling for status
+            startStatusPolling();
+        } else {
+            throw new Error(result.error || 'Failed to submit requirements');
+        }
+    } catch (err) {
+        error.textContent = err.message;
+        error.style.display = 'block';
+        resetUI();
+    }
+});
+
+function startStatusPolling() {
+    if (statusInterval) {
+        clearInterval(statusInterval);
+    }
+
+    statusInterval = setInterval(async () => {
+        try {
+            const response = await fetch(`/status/${sessionId}`);
+            const status = await response.json();
+
+            if (response.ok) {
+                updateProgress(status);
+
+                if (status.status === 'running' || status.status === 'completed') {
+                    // The results page shows the report sections as they are written
+                    clearInterval(statusInterval);
+                    localStorage.setItem('lastSessionId', sessionId);
+                    window.location.href = `/results/${sessionId}/page`;
+                } else if (status.status === 'error') {
+                    clearInterval(statusInterval);
+                    error.textContent = status.error || 'An error occurred during processing';
+                    error.style.display = 'block';
+                    resetUI();
+                }
+            } else {
+                throw new Error(status.error || 'Failed to get status');
+            }
+        } catch (err) {
+            clearInterval(statusInterval);
+            error.textContent = err.message;
+            error.style.display = 'block';
+            resetUI();
+        }
+    }, 2000);
+}
+
+function updateProgress(status) {
+    progressFill.style.width = `${status.progress}%`;
+    statusText.textContent = status.current_task;
+}
+
+function resetUI() {
+    submitBtn.disabled = false;
+    loading.classList.remove('show');
+    progressContainer.classList.remove('show');
+    progressFill.style.width = '0%';
+}
@@ -0,0 +1,374 @@
+// The live page is the same for every session (/results/<session_id>/page), so it can be cached
+const sessionId = document.body.dataset.sessionId || window.location.pathname.split('/')[2];
+const loading = document.getElementById('loading');
+const error = document.getElementById('error');
+const results = document.getElementById('results');
+const resultsContent = document.getElementById('resultsContent');
+
+// Finished reports are rendered on the server; a running session is followed live
+window.addEventListener('load', () => {
+    if (!document.body.dataset.prerendered) followLiveResults();
+});
+
+const sectionTitles = {
+    profile: 'Customer Profile',
+    recommendations: 'Recommended Vehicles',
+    legal: 'Out-of-State Registration Requirements',
+    valuation: 'Vehicle Valuation',
+    negotiation: 'Negotiation Strategies',
+    inspection: 'Inspection Checklists'
+};
+
+async function loadResults() {
+    try {
+        const response = await fetch(`/results/${sessionId}?section=all`);
+        const data = await response.json();
+
+        if (response.ok) {
+            if (data.sections) {
+                displaySections(data.sections);
+            } else {
+                throw new Error('No results data found');
+            }
+        } else {
+            throw new Error(data.error || 'Failed to load results');
+        }
+    } catch (err) {
+        showError(err.message);
+    }
+}
+
+function followLiveResults() {
+    if (loading) loading.style.display = 'none';
+    if (results) results.style.display = 'block';
+
+    const status = document.createElement('p');
+    status.className = 'live-status';
+    status.innerHTML = '<i class="fas fa-spinner fa-spin"></i> <span>Waiting for an available worker...</span>';
+    resultsContent.appendChild(status);
+
+    // One card per report section, in report order, shown once it has text
+    const cards = {};
+    Object.entries(sectionTitles).forEach(([name, title]) => {
+        const card = document.createElement('div');
+        card.className = 'section writing';
+        card.style.display = 'none';
+        card.innerHTML = `
+            <h2><i class="${getIconForSection(title)}"></i>${title}</h2>
+            <div class="section-content"><pre></pre></div>
+        `;
+        resultsContent.appendChild(card);
+        cards[name] = card;
+    });
+
+    const source = new EventSource(`/stream/${sessionId}`);
+    source.addEventListener('status', event => {
+        const data = JSON.parse(event.data);
+        status.querySelector('span').textContent = `${data.current_task} (${data.progress}%)`;
+    });
+    source.addEventListener('section', event => {
+        const data = JSON.parse(event.data);
+        const card = cards[data.section];
+        if (!card) return;
+        const pre = card.querySelector('pre');
+        if (data.text !== undefined) {
+            pre.textContent = data.text;
+        } else {
+            pre.textContent += data.append;
+        }
+        card.style.display = 'block';
+        card.classList.toggle('writing', !data.done);
+    });
+    source.addEventListener('end', event => {
+        source.close();
+        const data = JSON.parse(event.data);
+        if (data.status === 'completed') {
+            // Replace the live text with the formatted report
+            resultsContent.innerHTML = '';
+            loadResults();
+        } else {
+            showError(data.error || 'An error occurred during processing');
+        }
+    });
+}
+
+function displayResults(resultsData) {
+    if (loading) loading.style.display = 'none';
+    if (results) results.style.display = 'block';
+
+    // Parse the results and display them in sections
+    const sections = parseResults(resultsData);
+
+    if (resultsContent) {
+        sections.forEach(section => {
+            const sectionElement = createSection(section);
+            resultsContent.appendChild(sectionElement);
+        });
+    }
+}
+
+function displaySections(reportSections) {
+    if (loading) loading.style.display = 'none';
+    if (results) results.style.display = 'block';
+
+    Object.entries(reportSections).forEach(([name, content]) => {
+        if (!content || !resultsContent) return;
+
+        // Sections may contain several sub-headings; fall back to one card per section
+        const parsed = parseResults(content);
+        if (parsed.length === 1 && parsed[0].title === 'Complete Analysis') {
+            parsed[0].title = sectionTitles[name] || name;
+            parsed[0].icon = getIconForSection(parsed[0].title);
+        }
+        parsed.forEach(section => {
+            resultsContent.appendChild(createSection(section));
+        });
+    });
+}
+
+function parseResults(resultsData) {
+    const sections = [];
+
+    // Try to parse the results based on the expected structure
+    if (typeof resultsData === 'string') {
+        // If it's a string, try to extract meaningful sections
+        const lines = resultsData.split('\n');
+        let currentSection = null;
+        let currentContent = [];
+        let inTable = false;
+        let tableContent = [];
+
+        lines.forEach(line => {
+            const trimmedLine = line.trim();
+
+            // Check for main section headers (lines that end with colon and are not table headers)
+            if (trimmedLine.includes(':') && trimmedLine.length < 100 && 
+                !trimmedLine.startsWith('-') && !trimmedLine.includes('|') &&
+                !trimmedLine.includes('Rank') && !trimmedLine.includes('Vehicle Model')) {
+
+                // Save previous section if exists
+                if (currentSection) {
+                    if (inTable) {
+                        // Add table content to previous section
+                        sections[sections.length - 1].content += '\n' + tableContent.join('\n');
+                        inTable = false;
+                        tableContent = [];
+                    } else {
+                        sections.push({
+                            title: currentSection,
+                            content: currentContent.join('\n').trim(),
+                            icon: getIconForSection(currentSection)
+                        });
+                    }
+                }
+
+                currentSection = trimmedLine;
+                currentContent = [];
+            } else if (!inTable && trimmedLine.includes('|') && 
+                     (trimmedLine.includes('Rank') || trimmedLine.includes('Vehicle Model') || 
+                      trimmedLine.includes('------') || trimmedLine.includes('Negotiation'))) {
+                // Start of a table (a separator row inside a table continues it)
+                inTable = true;
+                tableContent = [line];
+            } else if (inTable && trimmedLine.includes('|')) {
+                // Continue table
+                tableContent.push(line);
+            } else if (inTable && !trimmedLine.includes('|')) {
+                // End of table
+                inTable = false;
+                if (currentSection) {
+                    sections.push({
+                        title: currentSection,
+                        content: currentContent.join('\n').trim() + '\n' + tableContent.join('\n'),
+                        icon: getIconForSection(currentSection)
+                    });
+                }
+                currentSection = null;
+                currentContent = [];
+                tableContent = [];
+            } else if (trimmedLine && !inTable) {
+                currentContent.push(line);
+            }
+        });
+
+        // Add the last section
+        if (currentSection) {
+            if (inTable) {
+                sections.push({
+                    title: currentSection,
+                    content: currentContent.join('\n').trim() + '\n' + tableContent.join('\n'),
+                    icon: getIconForSection(currentSection)
+                });
+            } else {
+                sections.push({
+                    title: currentSection,
+                    content: currentContent.join('\n').trim(),
+                    icon: getIconForSection(currentSection)
+                });
+            }
+        }
+
+        // If no sections found, create a single section
+        if (sections.length === 0) {
+            sections.push({
+                title: 'Complete Analysis',
+                content: resultsData,
+                icon: 'fas fa-file-alt'
+            });
+        }
+    } else {
+        // If it's an object, try to extract sections
+        sections.push({
+            title: 'Analysis Results',
+            content: JSON.stringify(resultsData, null, 2),
+            icon: 'fas fa-chart-bar'
+        });
+    }
+
+    return sections;
+}
+
+function getIconForSection(title) {
+    const lowerTitle = title.toLowerCase();
+
+    if (lowerTitle.includes('customer profile') || lowerTitle.includes('profile')) {
+        return 'fas fa-user';
+    } else if (lowerTitle.includes('top') && lowerTitle.includes('recommended')) {
+        return 'fas fa-car';
+    } else if (lowerTitle.includes('detailed reasons')) {
+        return 'fas fa-list-check';
+    } else if (lowerTitle.includes('out-of-state registration') || lowerTitle.includes('registration')) {
+        return 'fas fa-id-card';
+    } else if (lowerTitle.includes('negotiation strategies') || lowerTitle.includes('negotiation')) {
+        return 'fas fa-handshake';
+    } else if (lowerTitle.includes('inspection checklists') || lowerTitle.includes('inspection')) {
+        return 'fas fa-tools';
+    } else if (lowerTitle.includes('final recommendations') || lowerTitle.includes('recommendations')) {
+        return 'fas fa-lightbulb';
+    } else if (lowerTitle.includes('requirement') || lowerTitle.includes('need')) {
+        return 'fas fa-clipboard-list';
+    } else if (lowerTitle.includes('market') || lowerTitle.includes('research')) {
+        return 'fas fa-search';
+    } else if (lowerTitle.includes('legal') || lowerTitle.includes('law')) {
+        return 'fas fa-gavel';
+    } else if (lowerTitle.includes('value') || lowerTitle.includes('price')) {
+        return 'fas fa-dollar-sign';
+    } else if (lowerTitle.includes('deal')) {
+        return 'fas fa-handshake';
+    } else if (lowerTitle.includes('test')) {
+        return 'fas fa-tools';
+    } else {
+        return 'fas fa-file-alt';
+    }
+}
+
+function createSection(section) {
+    const sectionDiv = document.createElement('div');
+    sectionDiv.className = 'section';
+
+    // Check if content contains tables
+    const hasTable = section.content.includes('|') && section.content.includes('Rank');
+
+    if (hasTable) {
+        // Format as table
+        const lines = section.content.split('\n');
+        let tableHtml = '';
+        let inTable = false;
+        let tableRows = [];
+
+        lines.forEach(line => {
+            const trimmedLine = line.trim();
+            if (trimmedLine.includes('|') && (trimmedLine.includes('Rank') || trimmedLine.includes('Vehicle Model') || trimmedLine.includes('------'))) {
+                inTable = true;
+                tableRows.push(trimmedLine);
+            } else if (inTable && trimmedLine.includes('|')) {
+                tableRows.push(trimmedLine);
+            } else if (inTable && !trimmedLine.includes('|')) {
+                inTable = false;
+                // Convert table rows to HTML
+                tableHtml = convertTableToHtml(tableRows);
+            }
+        });
+
+        if (inTable) {
+            tableHtml = convertTableToHtml(tableRows);
+        }
+
+        sectionDiv.innerHTML = `
+            <h2><i class="${section.icon}"></i>${section.title}</h2>
+            <div class="section-content">
+                ${tableHtml}
+            </div>
+        `;
+    } else {
+        // Format as regular text
+        sectionDiv.innerHTML = `
+            <h2><i class="${section.icon}"></i>${section.title}</h2>
+            <div class="section-content">
+                <pre>${escapeHtml(section.content)}</pre>
+            </div>
+        `;
+    }
+
+    return sectionDiv;
+}
+
+function convertTableToHtml(tableRows) {
+    if (tableRows.length === 0) return '';
+
+    let html = '<div class="table-container"><table class="results-table">';
+
+    tableRows.forEach((row, index) => {
+        const cells = row.split('|').map(cell => cell.trim()).filter(cell => cell);
+
+        if (index === 0) {
+            // Header row
+            html += '<thead><tr>';
+            cells.forEach(cell => {
+                html += `<th>${escapeHtml(cell)}</th>`;
+            });
+            html += '</tr></thead><tbody>';
+        } else if (row.includes('------')) {
+            // Skip separator row
+            return;
+        } else {
+            // Data row
+            html += '<tr>';
+            cells.forEach(cell => {
+                html += `<td>${escapeHtml(cell)}</td>`;
+            });
+            html += '</tr>';
+        }
+    });
+
+    html += '</tbody></table></div>';
+    return html;
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function showError(message) {
+    if (loading) loading.style.display = 'none';
+    if (error) {
+        error.style.display = 'block';
+        error.textContent = message;
+    }
+}
+
+function downloadResults() {
+    // Create a text file with the results
+    const content = resultsContent.innerText;
+    const blob = new Blob([content], { type: 'text/plain' });
+    const url = window.URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.href = url;
+    a.download = `car_buying_analysis_${sessionId}.txt`;
+    document.body.appendChild(a);
+    a.click();
+    document.body.removeChild(a);
+    window.URL.revokeObjectURL(url);
+}
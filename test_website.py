@@ -94,6 +94,1068 @@ def test_file_structure():
     
     return True
 
+def test_job_store():
+    """Test that jobs can be queued, claimed and completed through the job store"""
+    print("\n🗄️  Testing job store...")
+    
+    try:
+        import tempfile
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.job_store import SQLiteJobStore
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SQLiteJobStore(os.path.join(tmp, 'jobs.db'))
+            store.enqueue('job-1', {'car_type': 'SUV'})
+            
+            if store.depth() != 1 or store.get_status('job-1')['status'] != 'queued':
+                print("❌ Queued job not found in the store")
+                return False
+            
+            job = store.claim('worker-1')
+            if job is None or job['payload'] != {'car_type': 'SUV'} or store.claim('worker-2') is not None:
+                print("❌ Job was not claimed exactly once")
+                return False
+            
+            store.complete('job-1', 'report')
+            status = store.get_status('job-1')
+            if status['status'] != 'completed' or status['results'] != 'report':
+                print("❌ Completed job status not stored")
+                return False
+        
+        print("✅ Job store queues, claims and completes jobs")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Job store test failed: {e}")
+        return False
+
+def test_redis_job_store():
+    """Test the Redis job store against an in-memory Redis stand-in"""
+    print("\n🗄️  Testing Redis job store...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import threading
+        try:
+            import fakeredis
+        except ImportError:
+            print("⚠️  fakeredis is not installed, skipping the Redis job store test")
+            return True
+        from smart_car_buying_assistant.job_store import JobStoreError, RedisJobStore
+        
+        store = RedisJobStore(client=fakeredis.FakeRedis())
+        store.enqueue('batch-1', {'car_type': 'SUV'}, priority='batch', client='key:partner')
+        store.enqueue('web-1', {'car_type': 'Sedan'})
+        try:
+            store.enqueue('web-1', {})
+            print("❌ A job id was queued twice")
+            return False
+        except JobStoreError:
+            pass
+        
+        job = store.claim('worker-1')
+        if job['id'] != 'web-1' or job['status'] != 'running' or job['attempts'] != 1:
+            print(f"❌ The interactive job was not claimed first: {job}")
+            return False
+        if store.client.lrange('scba:processing:worker-1', 0, -1) != [b'web-1'] or store.depth() != 1:
+            print("❌ A claimed job is not on exactly one of its queue and the processing list")
+            return False
+        try:
+            store.update('web-1', worker_id='worker-2')
+            print("❌ A job's owner could be changed through update")
+            return False
+        except JobStoreError:
+            pass
+        
+        # A worker that lost its job (requeued, then claimed by another) cannot extend the lease
+        store.client.hset('scba:job:web-1', 'heartbeat_at', 0)
+        if store.requeue_stale(lease_timeout=60) != 1 or store.get('web-1')['status'] != 'queued':
+            print("❌ A job with an expired lease was not requeued")
+            return False
+        if store.claim('worker-2')['id'] != 'web-1':
+            print("❌ The requeued job was not claimed again")
+            return False
+        before = store.get('web-1')['heartbeat_at']
+        store.heartbeat('web-1', 'worker-1')
+        if store.get('web-1')['heartbeat_at'] != before:
+            print("❌ A worker extended the lease of a job it no longer owns")
+            return False
+        store.release('web-1')
+        if store.client.llen('scba:processing:worker-2') != 0 or store.depth() != 2:
+            print("❌ A released job did not go back to the queue")
+            return False
+        
+        # Workers claiming at the same time take every job exactly once
+        for index in range(20):
+            store.enqueue(f'web-{index + 2}', {})
+        claimed = []
+        
+        def drain(worker_id):
+            while True:
+                job = store.claim(worker_id)
+                if job is None:
+                    return
+                claimed.append(job['id'])
+        
+        threads = [threading.Thread(target=drain, args=(f'worker-{index}',)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        processing = [job_id for key in store.client.scan_iter(match='scba:processing:*')
+                      for job_id in store.client.lrange(key, 0, -1)]
+        if sorted(claimed) != sorted(set(claimed)) or len(claimed) != 22 or len(processing) != 22:
+            print(f"❌ Concurrent claims lost or repeated jobs: {len(claimed)} claimed, {len(processing)} processing")
+            return False
+        
+        print("✅ Redis job store claims, requeues and releases jobs atomically")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Redis job store test failed: {e}")
+        return False
+
+def test_session_registry():
+    """Test that session IDs are unique and concurrent updates are never lost"""
+    print("\n🔐 Testing session registry...")
+    
+    try:
+        import threading
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.sessions import SessionRegistry, is_valid_session_id, new_session_id
+        
+        session_ids = {new_session_id() for _ in range(1000)}
+        if len(session_ids) != 1000 or not all(is_valid_session_id(sid) for sid in session_ids):
+            print("❌ Session IDs are not unique")
+            return False
+        
+        registry = SessionRegistry()
+        registry.create('session-1', {'progress': 0, 'events': []})
+        
+        def worker():
+            for _ in range(200):
+                registry.mutate('session-1', lambda record: record.update(
+                    progress=record['progress'] + 1, events=record['events'] + ['tick']))
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        snapshot = registry.snapshot('session-1')
+        if snapshot['progress'] != 1600 or len(snapshot['events']) != 1600:
+            print("❌ Concurrent session updates were lost")
+            return False
+        
+        print("✅ Session IDs are unique and registry updates are atomic")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Session registry test failed: {e}")
+        return False
+
+def test_incremental_rerun():
+    """Test that a follow-up submission only reruns the tasks its edits invalidate"""
+    print("\n♻️  Testing incremental re-run planning...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.incremental import load_task_dependencies, plan_rerun
+        
+        dependencies = load_task_dependencies()
+        payload = {'user_requirements': 'Reliable commuter', 'car_type': 'sedan',
+                   'budget_range': '$15,000 - $20,000', 'current_state': 'CA'}
+        previous_job = {
+            'status': 'completed',
+            'payload': payload,
+            'task_outputs': {name: f"{name} output" for name in dependencies},
+        }
+        
+        reused, stale = plan_rerun(previous_job, {**payload, 'budget_range': '$25,000 max'}, dependencies)
+        if 'collect_car_buying_requirements' not in reused or 'research_vehicle_market' not in stale:
+            print(f"❌ Budget change reran the wrong tasks: {stale}")
+            return False
+        
+        reused, stale = plan_rerun(previous_job, dict(payload), dependencies)
+        if stale or len(reused) != len(dependencies):
+            print(f"❌ Unchanged inputs should reuse every task, reran: {stale}")
+            return False
+        
+        reused, stale = plan_rerun(None, payload, dependencies)
+        if reused or stale != list(dependencies):
+            print("❌ A submission without a previous session should run every task")
+            return False
+        
+        print("✅ Only invalidated tasks are rerun")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Incremental re-run test failed: {e}")
+        return False
+
+def test_usage_budget():
+    """Test per-session token accounting and the budget cap"""
+    print("\n💰 Testing token usage accounting...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.job_store import MemoryJobStore
+        from smart_car_buying_assistant.usage import BudgetExceededError, SessionUsage, estimate_cost, usage_report
+        
+        pricing = {'gpt-4.1-mini': {'input': 0.40, 'cached_input': 0.10, 'output': 1.60}}
+        cost = estimate_cost(pricing, 'openai/gpt-4.1-mini', 1000, 500, cached_tokens=400)
+        if abs(cost - (600 * 0.40 + 400 * 0.10 + 500 * 1.60) / 1_000_000) > 1e-12:
+            print(f"❌ Unexpected cost estimate: {cost}")
+            return False
+        
+        usage = SessionUsage('test-session', token_budget=2000, cost_budget=0)
+        usage.record('openai/gpt-4.1-mini', 'research_vehicle_market', 1000, 500, 400, cost)
+        usage.check()
+        usage.record('openai/gpt-4.1-mini', 'analyze_legal_requirements', 400, 200, 0, cost)
+        try:
+            usage.check()
+            print("❌ Budget check did not stop a session over its token budget")
+            return False
+        except BudgetExceededError:
+            pass
+        
+        snapshot = usage.snapshot()
+        if snapshot['total_tokens'] != 2100 or set(snapshot['by_task']) != {'research_vehicle_market', 'analyze_legal_requirements'}:
+            print(f"❌ Unexpected usage snapshot: {snapshot}")
+            return False
+        
+        store = MemoryJobStore()
+        store.record_session_usage(snapshot)
+        report = usage_report(store.usage_totals())
+        if report['sessions'] != 1 or report['budget_exceeded'] != 1 or report['totals']['calls'] != 2:
+            print(f"❌ Unexpected usage totals: {report}")
+            return False
+        
+        print("✅ Usage is counted per task and the budget is enforced")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Usage accounting test failed: {e}")
+        return False
+
+def test_live_report_stream():
+    """Test live report sections and the server-sent events built from them"""
+    print("\n📡 Testing live report streaming...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import json
+        from smart_car_buying_assistant.job_store import MemoryJobStore
+        from smart_car_buying_assistant.streaming import ReportStream, live_events
+        
+        store = MemoryJobStore()
+        store.enqueue('stream-session', {})
+        stream = ReportStream(lambda snapshot: store.update('stream-session', stream=snapshot),
+                              sections={'valuation'}, flush_interval=0)
+        stream.call_started('task-1')
+        for chunk in ["Thought: I know the prices\nFinal Ans", "wer: Fair price is ", "$18,500."]:
+            stream.add_chunk('evaluate_vehicle_values', 'task-1', chunk)
+        if store.get_live('stream-session')['stream']['sections'] != {'valuation': 'Fair price is $18,500.'}:
+            print(f"❌ Unexpected live sections: {store.get_live('stream-session')['stream']}")
+            return False
+        
+        stream.task_completed('evaluate_vehicle_values', 'task-1', 'Fair price is $18,500. Offer $17,000.')
+        store.complete('stream-session', 'report')
+        events = ''.join(live_events(store, 'stream-session', poll_interval=0))
+        if 'event: end' not in events or '"status": "completed"' not in events:
+            print(f"❌ Unexpected events: {events}")
+            return False
+        
+        store.enqueue('running-session', {})
+        store.update('running-session', status='running', stream=stream.snapshot())
+        first = next(event for event in live_events(store, 'running-session', poll_interval=0, max_seconds=0)
+                     if event.startswith('event:'))
+        section = json.loads(first.split('event: section\ndata: ', 1)[1].split('\n', 1)[0])
+        if section != {'section': 'valuation', 'text': 'Fair price is $18,500. Offer $17,000.', 'done': True}:
+            print(f"❌ Unexpected section event: {first}")
+            return False
+        
+        # Streamed chunks reach the live report but not the console, and only inside quiet_console
+        import contextlib
+        import io
+        from crewai.events.event_bus import crewai_event_bus
+        from crewai.events.types.llm_events import LLMStreamChunkEvent
+        from smart_car_buying_assistant.streaming import quiet_console, stream_report
+        
+        store.enqueue('quiet-session', {})
+        console = io.StringIO()
+        with contextlib.redirect_stdout(console), stream_report(store, 'quiet-session') as live:
+            live.flush_interval = 0
+            live.call_started('task-2')
+            with quiet_console():
+                crewai_event_bus.emit(None, LLMStreamChunkEvent(chunk='Final Answer: Offer $16,500.', task_id='task-2',
+                                                                task_name='develop_negotiation_strategies'))
+            print('Session finished')
+        sections = store.get_live('quiet-session')['stream']['sections']
+        if sections.get('negotiation') != 'Offer $16,500.' or 'Offer' in console.getvalue():
+            print(f"❌ A streamed chunk was printed or lost: {sections}, {console.getvalue()!r}")
+            return False
+        if 'Session finished' not in console.getvalue():
+            print("❌ Console output outside quiet_console was dropped")
+            return False
+        
+        print("✅ Final answers stream into their report sections")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Live report stream test failed: {e}")
+        return False
+
+def test_prerendered_results_page():
+    """Test that a finished report is rendered to a complete, escaped results page"""
+    print("\n🖨️  Testing prerendered results pages...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.prerender import is_current, render_results_page
+        
+        sections = {
+            'recommendations': "Top 10 Recommended Vehicles:\n| Rank | Vehicle Model | Price |\n"
+                               "|------|------|------|\n| 1 | Toyota <RAV4> | $20,000 |",
+            'inspection': "Check the tires and brakes",
+        }
+        page = render_results_page('test-session', sections)
+        html = page['html']
+        for expected in ('data-prerendered="true"', '<th>Rank</th>', '<th>Vehicle Model</th>',
+                         '<td>Toyota &lt;RAV4&gt;</td>',
+                         'Inspection Checklists', '/assets/css/results.'):
+            if expected not in html:
+                print(f"❌ Prerendered page is missing {expected!r}")
+                return False
+        if '------' in html or '| Rank |' in html:
+            print("❌ The table separator row was shown instead of parsed")
+            return False
+        if 'id="loading"' in html or not is_current(page) or is_current({'html': html, 'assets': 'old'}):
+            print("❌ Prerendered page is not a finished page for the current assets")
+            return False
+        
+        print("✅ Finished reports render to static HTML")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Prerendered results page test failed: {e}")
+        return False
+
+def test_rate_limits():
+    """Test that rate-limited calls are shared round-robin between sessions"""
+    print("\n🚦 Testing outbound rate limits...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import threading
+        import time
+        from smart_car_buying_assistant.rate_limits import ProviderLimiter, is_rate_limited
+        
+        # 20 calls a second with room for one at a time
+        limiter = ProviderLimiter('openai', requests_per_minute=1200, tokens_per_minute=600000, burst_seconds=0.05)
+        order = []
+        
+        def call(session_id):
+            limiter.acquire(session_id, tokens=10, max_wait=10)
+            order.append(session_id)
+        
+        threads = [threading.Thread(target=call, args=('busy-session',)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.02)
+        threads.append(threading.Thread(target=call, args=('new-session',)))
+        threads[-1].start()
+        for thread in threads:
+            thread.join()
+        if order.index('new-session') > 3:
+            print(f"❌ A new session waited behind a busy one: {order}")
+            return False
+        
+        limiter.settle(10, 500)
+        if limiter.buckets['tokens'].level >= limiter.buckets['tokens'].capacity:
+            print("❌ Actual token usage was not charged to the bucket")
+            return False
+        
+        # 1,000 tokens a second with a 50-token burst: calls four times the burst are paid in full
+        limiter = ProviderLimiter('openai', tokens_per_minute=60000, burst_seconds=0.05)
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.acquire('big-prompts', tokens=200, max_wait=10)
+        elapsed = time.monotonic() - started
+        if elapsed < (4 * 200 - 200 - 50) / 1000:
+            print(f"❌ Calls above the burst capacity ran at {800 / elapsed:,.0f} tokens/s against 1,000")
+            return False
+        
+        class RateLimitError(Exception):
+            status_code = 429
+        try:
+            try:
+                raise RateLimitError('Too many requests')
+            except RateLimitError as e:
+                raise Exception('Failed to get streaming response') from e
+        except Exception as e:
+            if not is_rate_limited(e):
+                print("❌ A wrapped 429 was not recognised")
+                return False
+        
+        print("✅ Sessions take turns at the rate limit")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Rate limit test failed: {e}")
+        return False
+
+def test_hedged_llm_calls():
+    """Test that a slow LLM call is hedged and the first answer wins"""
+    print("\n🏁 Testing hedged LLM calls...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import threading
+        import time
+        from unittest import mock
+        import litellm
+        from smart_car_buying_assistant.routing import ModelRouter, RoutedLLM
+        
+        router = ModelRouter({'routing': {'min_samples': 2},
+                              'calls': {'timeout_seconds': 5, 'hedge_min_delay_seconds': 0.1},
+                              'agents': {'test_agent': {'model': 'gpt-4o-mini'}}})
+        for _ in range(3):
+            router.record('gpt-4o-mini', 0.05, ok=True)
+        requests = []
+        lock = threading.Lock()
+        
+        def completion(**kwargs):
+            with lock:
+                requests.append(kwargs['model'])
+                first = len(requests) == 1
+            if first:
+                time.sleep(2)
+            return litellm.ModelResponse(choices=[{'message': {'role': 'assistant', 'content': 'slow' if first else 'fast'}}],
+                                         usage={'prompt_tokens': 10, 'completion_tokens': 1, 'total_tokens': 11})
+        
+        with mock.patch('litellm.completion', completion):
+            started = time.monotonic()
+            reply = RoutedLLM('test_agent', router).call([{'role': 'user', 'content': 'Hello'}])
+        stats = router.snapshot()['gpt-4o-mini']
+        if reply != 'fast' or time.monotonic() - started > 1.5:
+            print(f"❌ The hedged request did not win: {reply!r}")
+            return False
+        if stats['hedged'] != 1 or stats['hedge_wins'] != 1:
+            print(f"❌ Unexpected hedge stats: {stats}")
+            return False
+        
+        # A hedge that starts after the retry loop moved on still goes to the model it was sent for
+        llm = RoutedLLM('test_agent', router)
+        llm._use_model('gpt-4o')
+        call_kwargs = {'tools': None, 'callbacks': None, 'available_functions': None,
+                       'from_task': None, 'from_agent': None}
+        requests.clear()
+        requests.append('primary')
+        with mock.patch('litellm.completion', completion):
+            llm._attempt('gpt-4o-mini', False, [{'role': 'user', 'content': 'Hello'}], None, call_kwargs, 1, True, 0.0)
+        if requests[-1] != 'gpt-4o-mini' or llm.model != 'gpt-4o':
+            print(f"❌ A hedge was sent to {requests[-1]} instead of the model it was started for")
+            return False
+        
+        print("✅ Slow calls are hedged and hedge wins are counted")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Hedged LLM call test failed: {e}")
+        return False
+
+def test_fair_scheduling():
+    """Test that interactive jobs go first and batch clients share the workers by weight"""
+    print("\n⚖️  Testing priority and fair-share scheduling...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import tempfile
+        from smart_car_buying_assistant.job_store import MemoryJobStore, SQLiteJobStore
+        from smart_car_buying_assistant.scheduling import SchedulingPolicy, client_id
+        
+        policy = SchedulingPolicy({'clients': {client_id('partner-b'): {'weight': 2}}})
+        partner_a, partner_b = client_id('partner-a'), client_id('partner-b')
+        if policy.priority(partner_a) != 'batch' or policy.priority(client_id(None, '10.0.0.1')) != 'interactive':
+            print("❌ API clients should queue as batch and form users as interactive")
+            return False
+        
+        store = MemoryJobStore()
+        for index in range(4):
+            store.enqueue(f'a-{index}', {}, priority='batch', client=partner_a, weight=policy.weight(partner_a))
+            store.enqueue(f'b-{index}', {}, priority='batch', client=partner_b, weight=policy.weight(partner_b))
+        store.enqueue('user', {}, priority='interactive', client=client_id(None, '10.0.0.1'))
+        order = [store.claim('worker-1')['id'] for _ in range(7)]
+        batch_clients = [job_id[0] for job_id in order[1:]]
+        if order[0] != 'user' or batch_clients.count('b') != 4 or batch_clients.count('a') != 2:
+            print(f"❌ Unexpected claim order: {order}")
+            return False
+        
+        stats = store.queue_stats()
+        if stats['interactive']['started'] != 1 or stats['batch']['queued'] != 2:
+            print(f"❌ Unexpected queue stats: {stats}")
+            return False
+        
+        # A batch backlog that has waited past promote_after must not starve interactive jobs
+        with tempfile.TemporaryDirectory() as tmp:
+            for backlog in (MemoryJobStore(), SQLiteJobStore(os.path.join(tmp, 'jobs.db'))):
+                for index in range(20):
+                    backlog.enqueue(f'partner-{index}', {}, priority='batch', client=partner_a)
+                for index in range(3):
+                    backlog.enqueue(f'other-{index}', {}, priority='batch', client=partner_b)
+                for index in range(3):
+                    backlog.enqueue(f'user-{index}', {}, priority='interactive', client=client_id(None, f'10.0.0.{index}'))
+                order = [backlog.claim('worker-1', promote_after=0, promote_every=4)['id'] for _ in range(10)]
+                if ([job_id for job_id in order[:4] if job_id.startswith('user')] != ['user-0', 'user-1', 'user-2']
+                        or sum(job_id.startswith('other') for job_id in order) != 3):
+                    print(f"❌ Long-waiting batch jobs starved the queue on {type(backlog).__name__}: {order}")
+                    return False
+        
+        print("✅ Interactive jobs go first and batch clients share by weight")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fair scheduling test failed: {e}")
+        return False
+
+def test_listing_dedup():
+    """Test that the same listing from Serper and Brave is kept once"""
+    print("\n🧹 Testing listing deduplication...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.listings import unique_listings
+        from smart_car_buying_assistant.search_planner import SearchResultPool
+        
+        pool = SearchResultPool()
+        pool.add('market', [
+            {'title': '2019 Honda CR-V EX for sale in Sacramento, CA - $21,995', 'link': 'https://www.cars.com/vehicledetail/1/',
+             'snippet': 'Great condition', 'source': 'serper'},
+            {'title': '2019 Honda CR-V LX', 'link': 'https://www.cargurus.com/listing/2', 'snippet': '61,000 miles, $19,500',
+             'source': 'serper'},
+        ])
+        pool.add('market', [
+            {'title': 'Used 2019 Honda CR-V EX', 'link': 'https://www.autotrader.com/cars-for-sale/3',
+             'snippet': '45,210 miles · $21,995 · Sacramento, CA', 'source': 'brave'},
+            {'title': '2019 Honda CR-V LX', 'link': 'https://cargurus.com/listing/2', 'snippet': 'Clean title',
+             'source': 'brave'},
+        ])
+        stats = pool.stats()
+        if stats['results']['market'] != 2 or stats['listing_duplicates_removed'] != 1 or stats['duplicates_removed'] != 1:
+            print(f"❌ Unexpected dedup stats: {stats}")
+            return False
+        if stats['duplicate_tokens_removed'] <= 0:
+            print("❌ Removed tokens were not counted")
+            return False
+        
+        candidates, duplicates = unique_listings([
+            '2020 Toyota RAV4 XLE, $24,000, 30,000 miles',
+            '2020 Toyota RAV4 XLE - $24k, 30,400 mi',
+            '2020 Toyota RAV4 LE, $22,500, 52,000 miles',
+        ])
+        if len(candidates) != 2 or duplicates != ['2020 Toyota RAV4 XLE - $24k, 30,400 mi']:
+            print(f"❌ Unexpected candidates: {candidates}")
+            return False
+        
+        # Same year, make, model and a common price are not enough, and different trims never match
+        civics = [
+            '2020 Honda Civic EX $19,995 at Round Rock Honda',
+            '2020 Honda Civic LX $19,995 - 32,000 miles, Austin, TX',
+            '2020 Honda Civic Sport $19,995 12,000 miles Houston dealer',
+            '2020 Honda Civic $19,995, call today',
+            '2020 Honda Civic Touring, $19,995, 32,000 miles',
+        ]
+        candidates, duplicates = unique_listings(civics)
+        if candidates != civics or duplicates:
+            print(f"❌ Different cars were merged: {duplicates}")
+            return False
+        
+        print("✅ Repeated listings are removed before valuation")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Listing dedup test failed: {e}")
+        return False
+
+def test_parallel_training():
+    """Test that parallel training merges every iteration's feedback into one file"""
+    print("\n🏋️ Testing parallel training...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import pickle
+        import tempfile
+        from smart_car_buying_assistant.search_planner import empty_search_context
+        from smart_car_buying_assistant.training import StaticFeedback, merge_training_data, train_parallel
+        
+        feedback = StaticFeedback({'vehicle_valuation_expert': 'Cite the pricing source'}, default='Be concise')
+        if feedback(0, 'Vehicle Valuation Expert', '') != 'Cite the pricing source' or feedback(0, 'Other', '') != 'Be concise':
+            print("❌ Feedback file entries were not matched to agent roles")
+            return False
+        
+        merged = merge_training_data([{'Analyst': {1: 'second'}}, {'Analyst': {0: 'first'}, 'Advisor': {0: 'only'}}])
+        if list(merged['Analyst'].items()) != [(0, 'first'), (1, 'second')] or merged['Advisor'] != {0: 'only'}:
+            print(f"❌ Unexpected merged training data: {merged}")
+            return False
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'trained.pkl')
+            inputs = {'user_requirements': 'Reliable commuter', 'car_type': 'sedan', 'budget_range': '$15k',
+                      'current_state': 'CA', **empty_search_context()}
+            merged = train_parallel(2, filename, inputs, processes=2, stub=True, work_dir=tmp)
+            with open(filename, 'rb') as f:
+                trained = pickle.load(f)
+            if any(len(iterations) != 2 for iterations in merged.values()) or set(trained) != set(merged):
+                print(f"❌ Iterations were not merged: {sorted(trained)}")
+                return False
+        
+        print("✅ Training iterations run in parallel and are merged into one file")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Parallel training test failed: {e}")
+        return False
+
+def test_feasibility_check():
+    """Test that the local feasibility check only rejects budgets it can read"""
+    print("\n🧮 Testing feasibility check...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.feasibility import check_locally, parse_budget
+        
+        def request(car_type, budget_range, user_requirements=''):
+            return {'current_state': 'CA', 'car_type': car_type, 'budget_range': budget_range,
+                    'user_requirements': user_requirements}
+        
+        for budget_range in ('$500/month', '$3,000 down, $400 a month', '$350 monthly payment', '$400/mo'):
+            feasible, message, _ = check_locally(request('SUV', budget_range))
+            if feasible is not None:
+                print(f"❌ Financing budget {budget_range!r} was decided locally: {message}")
+                return False
+        if parse_budget('$15,000 - $20,000') != 20000 or parse_budget('under 15k') != 15000:
+            print("❌ Price budgets are no longer read")
+            return False
+        
+        feasible, message, _ = check_locally(request('Truck', '$1,500'))
+        if feasible is not False or 'Please raise the budget' not in message:
+            print(f"❌ A truck on $1,500 should be rejected: {message}")
+            return False
+        
+        feasible, message, payload = check_locally(request('Sedan', '$10,000', 'I am new to car buying'))
+        if feasible is not True or message or payload['user_requirements'] != 'I am new to car buying':
+            print(f"❌ A new buyer was treated as wanting a new car: {message}")
+            return False
+        for requirements in ('I want a brand new Civic', 'a new car for commuting', 'new sedan only'):
+            feasible, message, payload = check_locally(request('Sedan', '$10,000', requirements))
+            if not message.startswith('A new Sedan starts at') or 'Note:' not in payload['user_requirements']:
+                print(f"❌ {requirements!r} was not reshaped into a used-car search")
+                return False
+        
+        print("✅ Financing budgets go to the LLM check and only new vehicles are reshaped")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Feasibility check test failed: {e}")
+        return False
+
+def test_map_tasks():
+    """Test that a MapTask runs once per candidate and keeps going when one candidate fails"""
+    print("\n🔀 Testing per-candidate map tasks...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        os.environ.setdefault('OPENAI_API_KEY', 'stub-llm')
+        from unittest import mock
+        from crewai import Agent
+        from smart_car_buying_assistant.map_tasks import MapTask, candidate_items, item_context, merge_item_outputs
+        from smart_car_buying_assistant.training import stub_completion, stub_llm
+        from smart_car_buying_assistant.usage import BudgetExceededError
+        
+        valuation = ("Ranked by value:\n**Candidate 1:** 2020 Toyota RAV4 XLE, $24,000, 30,000 miles\n"
+                     "- Candidate - 2019 Honda CR-V EX, $21,995, 45,000 miles\n"
+                     "Candidate: 2018 Mazda CX-5 Touring, $19,000, 52,000 miles\n"
+                     "Candidate - 2019 Honda CR-V EX, $21,995, 45,000 miles")
+        items = candidate_items(valuation)
+        if items != ['2020 Toyota RAV4 XLE, $24,000, 30,000 miles', '2019 Honda CR-V EX, $21,995, 45,000 miles',
+                     '2018 Mazda CX-5 Touring, $19,000, 52,000 miles']:
+            print(f"❌ Unexpected candidates: {items}")
+            return False
+        
+        merged = merge_item_outputs([(item, f"Offer for {item[:9]}") for item in items])
+        if candidate_items(merged) != items:
+            print("❌ Merged output does not list the same candidates for the next map task")
+            return False
+        section = item_context(merged, items[1])
+        if not section.endswith('Offer for 2019 Hond') or 'RAV4' in section or 'Mazda' in section:
+            print(f"❌ A candidate's context holds other candidates: {section!r}")
+            return False
+        if item_context(valuation, 'Unknown car') != valuation:
+            print("❌ A candidate without a section should get the whole context")
+            return False
+        
+        agent = Agent(role='Vehicle Valuation Expert', goal='Value used cars', backstory='Appraiser',
+                      llm='gpt-4o-mini', max_retry_limit=0)
+        
+        def task():
+            return MapTask(name='evaluate_vehicle_values', description='Value the vehicle',
+                           expected_output='A valuation', agent=agent)
+        
+        with stub_llm():
+            single = task().execute_sync(context=f"Candidate - {items[0]}")
+        if '### Candidate' in single.raw or not single.raw:
+            print(f"❌ A single candidate should run as a normal task: {single.raw!r}")
+            return False
+        
+        def completion_failing_with(error):
+            def completion(**kwargs):
+                if 'this vehicle: 2018 Mazda' in str(kwargs['messages']):
+                    raise error
+                return stub_completion(**kwargs)
+            return completion
+        
+        with mock.patch('litellm.completion', completion_failing_with(RuntimeError('provider down'))):
+            output = task().execute_sync(context=valuation)
+        if (candidate_items(output.raw) != items
+                or 'Could not be generated for this vehicle: provider down' not in item_context(output.raw, items[2])
+                or 'Could not be generated' in item_context(output.raw, items[0])):
+            print(f"❌ Unexpected merged output with one failed candidate: {output.raw!r}")
+            return False
+        
+        try:
+            with mock.patch('litellm.completion', completion_failing_with(BudgetExceededError('budget spent'))):
+                task().execute_sync(context=valuation)
+            print("❌ A spent budget in one candidate should stop the task")
+            return False
+        except BudgetExceededError:
+            pass
+        
+        print("✅ Map tasks run per candidate, merge in order and survive a failed candidate")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Map task test failed: {e}")
+        return False
+
+def test_conditional_tasks():
+    """Test that the legal review is skipped only when the research reports no out-of-state vehicles"""
+    print("\n⏭️  Testing conditional tasks...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        os.environ.setdefault('OPENAI_API_KEY', 'stub-llm')
+        from crewai import Agent, Task
+        from crewai.tasks.task_output import TaskOutput
+        from smart_car_buying_assistant.conditions import (
+            NO_LEGAL_REVIEW_NOTE, OUT_OF_STATE_SUMMARY, SkippableTask, has_out_of_state_vehicles,
+            summary_count, tasks_to_run,
+        )
+        
+        research = "1. 2019 Honda CR-V EX - Austin, TX\n2. 2020 Toyota RAV4 XLE - Dallas, TX\n\n"
+        counts = {
+            research + "Out-of-state vehicles - 0": 0,
+            research + "**Out-of-state vehicles:** 2": 2,
+            research + "Out of state vehicles = none": 0,
+            research + "Total vehicles - 2": None,
+        }
+        for text, expected in counts.items():
+            if summary_count(text, OUT_OF_STATE_SUMMARY) != expected:
+                print(f"❌ Wrong out-of-state count for {text.splitlines()[-1]!r}")
+                return False
+        if has_out_of_state_vehicles(research + "Out-of-state vehicles - 0"):
+            print("❌ The legal review should be skipped when no out-of-state vehicle was found")
+            return False
+        if not has_out_of_state_vehicles(research) or not has_out_of_state_vehicles(research + "Out-of-state vehicles - 1"):
+            print("❌ The legal review should run when the summary line is missing or reports vehicles")
+            return False
+        
+        agent = Agent(role='Car Buying Legal Advisor', goal='Explain purchase rules', backstory='Lawyer',
+                      llm='gpt-4o-mini')
+        
+        def crew_tasks(summary):
+            market = Task(name='research_vehicle_market', description='Research the market',
+                          expected_output='Listings', agent=agent)
+            legal = SkippableTask(name='analyze_legal_requirements', description='Review the legal steps',
+                                  expected_output='Legal steps', agent=agent, condition=has_out_of_state_vehicles,
+                                  skipped_note=NO_LEGAL_REVIEW_NOTE)
+            report = Task(name='generate_final_report', description='Write the report',
+                          expected_output='A report', agent=agent)
+            # As apply_reuse does for a research output stored by an earlier session
+            market.output = TaskOutput(description=market.description, name=market.name,
+                                       expected_output=market.expected_output, raw=research + summary,
+                                       agent=agent.role)
+            return [market, legal, report]
+        
+        tasks = crew_tasks("Out-of-state vehicles - 0")
+        remaining = tasks_to_run(tasks, {'research_vehicle_market': research})
+        if [task.name for task in remaining] != ['generate_final_report']:
+            print(f"❌ Unexpected tasks to run: {[task.name for task in remaining]}")
+            return False
+        if tasks[1].output is None or tasks[1].output.raw != NO_LEGAL_REVIEW_NOTE:
+            print("❌ A skipped legal review should leave its note as its output")
+            return False
+        
+        for summary in ("Out-of-state vehicles - 3", ""):
+            tasks = crew_tasks(summary)
+            remaining = tasks_to_run(tasks, {'research_vehicle_market': research})
+            if [task.name for task in remaining] != ['analyze_legal_requirements', 'generate_final_report']:
+                print(f"❌ The legal review should run for research ending {summary or 'without a summary'!r}")
+                return False
+            if tasks[1].output is not None:
+                print("❌ A legal review that runs should not have an output yet")
+                return False
+        
+        print("✅ Legal review skipped with its note only when no out-of-state vehicle was found")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Conditional task test failed: {e}")
+        return False
+
+def test_prewarm_with_embedded_worker():
+    """Test that /prewarm only starts searches once the web process runs an embedded worker"""
+    print("\n🔥 Testing search prewarming...")
+    
+    try:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        import app as web
+        from smart_car_buying_assistant.job_store import MemoryJobStore
+        
+        class FakeRegistry:
+            backends = {'fake': None}
+            
+            def __init__(self):
+                self.queries = []
+            
+            def search_backend(self, name, query):
+                self.queries.append(query)
+            
+            def evict(self, queries):
+                pass
+        
+        registry = FakeRegistry()
+        web.prewarmer._registry = registry
+        client = web.app.test_client()
+        form = {'current_state': 'TX', 'car_type': 'SUV', 'budget_range': '$20,000'}
+        worker = None
+        try:
+            status = client.post('/prewarm', json=form).get_json()['status']
+            if status != 'disabled':
+                print(f"❌ Prewarming without an embedded worker returned {status!r}")
+                return False
+            worker = web.start_embedded_workers(store=MemoryJobStore())
+            status = client.post('/prewarm', json=form).get_json()['status']
+            if worker is None or status != 'started':
+                print(f"❌ Prewarming with an embedded worker returned {status!r}")
+                return False
+        finally:
+            if worker is not None:
+                worker.stop()
+            web.prewarmer.enabled = False
+            web.prewarmer._registry = None
+        
+        print("✅ Prewarming starts once an embedded worker runs")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Prewarm test failed: {e}")
+        return False
+
+def test_cassette_replay():
+    """Test that a recorded session's searches and LLM calls replay from its cassette"""
+    print("\n📼 Testing cassette record and replay...")
+    
+    try:
+        import tempfile
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.cassettes import Cassette, CassetteMissError, use_cassette
+        from smart_car_buying_assistant.tools.registry import CircuitBreaker, ToolRegistry
+        
+        class FakeBackend:
+            def __init__(self):
+                self.queries = []
+            
+            def _run(self, search_query):
+                self.queries.append(search_query)
+                return f"Listings for {search_query}"
+        
+        backend = FakeBackend()
+        registry = ToolRegistry()
+        registry.backends = {'fake': backend}
+        registry.breakers = {'fake': CircuitBreaker('fake')}
+        # A warm process: the planner's search is already cached when the session starts
+        registry.search_backend('fake', 'used SUV Texas')
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            recording = Cassette.record_to(os.path.join(tmp, 'session.cassette.gz'), session_id='session')
+            messages = [{'role': 'user', 'content': 'Value the 2020 RAV4 as of 2025-01-02'}]
+            with use_cassette(recording):
+                registry.search_backend('fake', 'used SUV Texas')
+                registry.search_backend('fake', 'Texas title transfer')
+                recording.record_llm('Valuer', 'value', messages, 'Worth $24,000', 'gpt-4o-mini', 0.5)
+            recording.save()
+            if recording.stats()['searches'] != 2 or len(backend.queries) != 2:
+                print(f"❌ Cache hits were not recorded: {recording.stats()}")
+                return False
+            
+            replay = Cassette.load(recording.path, latency_scale=0, strict=True)
+            with use_cassette(replay):
+                results = [registry.search_backend('fake', query) for query in ('used SUV Texas', 'Texas title transfer')]
+                # The date in a prompt does not change its hash
+                entry = replay.replay_llm('Valuer', 'value', [{'role': 'user', 'content': 'Value the 2020 RAV4 as of 2026-03-04'}])
+                try:
+                    registry.search_backend('fake', 'never searched')
+                    print("❌ A strict replay served a search that was never recorded")
+                    return False
+                except CassetteMissError:
+                    pass
+            if (results != ['Listings for used SUV Texas', 'Listings for Texas title transfer']
+                    or entry['response'] != 'Worth $24,000' or len(backend.queries) != 2):
+                print(f"❌ Replay did not serve the recorded calls: {results}, {backend.queries}")
+                return False
+            
+            # A changed prompt gets the task's next recorded response and counts as a miss
+            lenient = Cassette.load(recording.path, latency_scale=0)
+            entry = lenient.replay_llm('Valuer', 'value', [{'role': 'user', 'content': 'Value the 2021 RAV4'}])
+            if entry['response'] != 'Worth $24,000' or lenient.stats()['misses'] != 1:
+                print("❌ A changed prompt was not served the recorded response")
+                return False
+        
+        print("✅ Sessions replay every recorded search and LLM call, including cache hits")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Cassette replay test failed: {e}")
+        return False
+
+def test_span_export():
+    """Test that exported spans reload into the same tree and critical path"""
+    print("\n⏱️  Testing span export and critical paths...")
+    
+    try:
+        import tempfile
+        import time
+        from types import SimpleNamespace
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.spans import FileSpanExporter, Tracer, load_spans
+        from smart_car_buying_assistant.trace_report import critical_path, group_traces
+        
+        def task_event(kind, name):
+            return SimpleNamespace(type=f"task_{kind}", task=SimpleNamespace(name=name, agent=SimpleNamespace(role='Expert')))
+        
+        def run_session(tracer, session_id):
+            with tracer.session(session_id) as root:
+                for task, steps in (('research', [('llm', 'gpt-4o-mini')]),
+                                    ('value', [('search', 'serper'), ('llm', 'gpt-4o')])):
+                    # Task spans come from the crewai event bus
+                    tracer._on_started(None, task_event('started', task))
+                    for kind, name in steps:
+                        with tracer.span('llm_call' if kind == 'llm' else name, kind,
+                                         model=name if kind == 'llm' else None, prompt_tokens=100):
+                            time.sleep(0.01)
+                    tracer._on_finished(None, task_event('completed', task))
+            return root
+        
+        expected = ['session:session', 'task:research', 'llm:gpt-4o-mini', 'task:value', 'search:serper', 'llm:gpt-4o']
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'spans.jsonl')
+            tracer = Tracer(FileSpanExporter(path, 'otlp', max_bytes=1))
+            # Events are fed in directly; the process-wide tracer already listens on the event bus
+            tracer._installed = True
+            run_session(tracer, 'first-session')
+            second = run_session(tracer, 'second-session')
+            FileSpanExporter(os.path.join(tmp, 'plain.jsonl')).export(second.collected)
+            
+            # The second export went past the size limit and rolled the first session over
+            for file_name, session_id in (('spans.jsonl.1', 'first-session'), ('spans.jsonl', 'second-session'),
+                                          ('plain.jsonl', 'second-session')):
+                traces = group_traces(load_spans(os.path.join(tmp, file_name)))
+                if len(traces) != 1:
+                    print(f"❌ {file_name} holds {len(traces)} sessions instead of one")
+                    return False
+                root, children = next(iter(traces.values()))
+                labels = [f"{span['kind']}:{span['attributes'].get('model') or span['name']}"
+                          for _, span in critical_path(root, children)]
+                if root['attributes']['session_id'] != session_id or labels != expected:
+                    print(f"❌ Unexpected critical path in {file_name}: {labels}")
+                    return False
+            llm = next(span for span in load_spans(path) if span['kind'] == 'llm')
+            if llm['attributes']['prompt_tokens'] != 100 or llm['parent_id'] is None:
+                print(f"❌ Span attributes did not survive the OTLP round trip: {llm}")
+                return False
+        
+        print("✅ Spans export, roll over and reload into the same critical path")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Span export test failed: {e}")
+        return False
+
+def test_search_circuit_breaker():
+    """Test that a failing search backend opens its breaker and searches fall back to the next one"""
+    print("\n🔌 Testing search circuit breakers...")
+    
+    try:
+        import time
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+        from smart_car_buying_assistant.tools.registry import LOCAL_FALLBACK_RESULT, CircuitBreaker, ToolRegistry
+        
+        class FakeBackend:
+            def __init__(self, name, failing=False):
+                self.name = name
+                self.failing = failing
+                self.calls = 0
+            
+            def _run(self, search_query):
+                self.calls += 1
+                if self.failing:
+                    raise ConnectionError(f"{self.name} is down")
+                return f"{self.name}: {search_query}"
+        
+        broken, healthy = FakeBackend('broken', failing=True), FakeBackend('healthy')
+        registry = ToolRegistry(timeout=5)
+        registry.backends = {'broken': broken, 'healthy': healthy}
+        registry.breakers = {name: CircuitBreaker(name, failure_threshold=2, reset_timeout=0.2)
+                             for name in registry.backends}
+        breaker = registry.breakers['broken']
+        
+        results = [registry.search(f"query {index}", ('broken', 'healthy')) for index in range(4)]
+        if results != [f"healthy: query {index}" for index in range(4)]:
+            print(f"❌ Searches did not fall back to the next backend: {results}")
+            return False
+        if breaker.state != 'open' or broken.calls != 2:
+            print(f"❌ The breaker did not open after 2 failures ({breaker.state}, {broken.calls} calls)")
+            return False
+        
+        time.sleep(0.25)
+        if not breaker.allow() or breaker.state != 'half_open' or breaker.allow():
+            print("❌ A half-open breaker should let exactly one trial call through")
+            return False
+        breaker.record_failure(0.1)
+        if breaker.state != 'open' or breaker.allow():
+            print("❌ A failed trial call should open the breaker again")
+            return False
+        
+        time.sleep(0.25)
+        broken.failing = False
+        if registry.search('query 5', ('broken', 'healthy')) != 'broken: query 5' or breaker.state != 'closed':
+            print(f"❌ A successful trial call should close the breaker ({breaker.state})")
+            return False
+        
+        broken.failing = healthy.failing = True
+        if registry.search('query 6', ('broken', 'healthy')) != LOCAL_FALLBACK_RESULT:
+            print("❌ With every backend failing the search should return the local fallback")
+            return False
+        
+        print("✅ Breakers open, trial once when half-open, and searches fall back in order")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Search circuit breaker test failed: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("🧪 Testing Smart Car Buying Assistant Website")
@@ -104,6 +1166,25 @@ def main():
         ("Template Files", test_templates),
         ("Module Imports", test_imports),
         ("Flask App Creation", test_app_creation),
+        ("Job Store", test_job_store),
+        ("Redis Job Store", test_redis_job_store),
+        ("Session Registry", test_session_registry),
+        ("Incremental Re-run", test_incremental_rerun),
+        ("Usage Budget", test_usage_budget),
+        ("Live Report Stream", test_live_report_stream),
+        ("Prerendered Results Page", test_prerendered_results_page),
+        ("Rate Limits", test_rate_limits),
+        ("Hedged LLM Calls", test_hedged_llm_calls),
+        ("Fair Scheduling", test_fair_scheduling),
+        ("Listing Dedup", test_listing_dedup),
+        ("Parallel Training", test_parallel_training),
+        ("Feasibility Check", test_feasibility_check),
+        ("Map Tasks", test_map_tasks),
+        ("Conditional Tasks", test_conditional_tasks),
+        ("Prewarm With Embedded Worker", test_prewarm_with_embedded_worker),
+        ("Cassette Replay", test_cassette_replay),
+        ("Span Export", test_span_export),
+        ("Search Circuit Breaker", test_search_circuit_breaker),
     ]
     
     passed = 0